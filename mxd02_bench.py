@@ -0,0 +1,521 @@
+"""
+Benchmark reproducible de la instalación del MXD02 Modpack Manager.
+
+Genera packs sintéticos (Full Pack y parche) con la forma indicada, los sirve
+desde un servidor HTTP local (con límite de ancho de banda y latencia
+opcionales) y mide con el motor real (mxd02_engine) cada fase por separado:
+
+    download  descarga del Full Pack (sin caché)
+    extract   extracción del Full Pack ya descargado en carpetas vacías
+    hash      verificación completa (hash de todos los archivos instalados)
+    install   instalación completa desde cero (manifest + plan + descarga + extracción)
+    patch     actualización con el parche sobre una instalación completa
+    noop      comprobación cuando ya está todo actualizado
+
+    python mxd02_bench.py --shape mixed --runs 3 --output resultado.json
+    python mxd02_bench.py --shape configs --bandwidth 20 --latency 30 --compare anterior.json
+
+El resultado es un JSON con los tiempos de cada ejecución, la mediana y el
+rendimiento (MB/s y archivos/s), para comparar entre versiones del código.
+Los datos se generan con una semilla fija: dos ejecuciones con las mismas
+opciones instalan exactamente los mismos archivos.
+"""
+import argparse
+import functools
+import hashlib
+import http.server
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+# El motor calcula sus rutas por defecto con APPDATA (solo existe en Windows);
+# el benchmark usa siempre carpetas temporales propias
+os.environ.setdefault("APPDATA", os.path.expanduser("~"))
+
+from mxd02_engine import (
+    DOWNLOAD_CONNECTIONS, EXTRACT_THREADS, PACK_ROOT_LIBRARIES, PACK_ROOT_MODPACK,
+    EventSink, ModpackUpdater, calc_file_hash, write_installed_version, zstandard,
+)
+
+# Formas de pack predefinidas: archivos grandes (jars) y pequeños (configs)
+SHAPES = {
+    "jars":    {"large": 40,  "large_kb": 8192, "small": 100,  "small_kb": 2},
+    "configs": {"large": 4,   "large_kb": 4096, "small": 6000, "small_kb": 2},
+    "mixed":   {"large": 150, "large_kb": 1024, "small": 2000, "small_kb": 4},
+}
+
+SCENARIOS = ["download", "extract", "hash", "install", "patch", "noop"]
+
+# Proporción de archivos que cambian o desaparecen en el parche
+PATCH_CHANGED = 0.1
+PATCH_REMOVED = 0.02
+
+
+# ---------------------------------------------------------
+# PACKS SINTÉTICOS
+# ---------------------------------------------------------
+def pack_contents(shape, seed, version):
+    """
+    Devuelve {ruta_en_el_pack: bytes} para una versión del pack.
+    Los jars son bytes aleatorios (incompresibles, como un jar real) y los
+    configs texto. La versión "1.1" cambia y elimina una parte de los archivos.
+    """
+    rng = random.Random(seed)
+    files = {}
+    for i in range(shape["large"]):
+        # Una parte de los jars grandes son librerías de Forge
+        root = PACK_ROOT_LIBRARIES + "/net/mxd02/bench" if i % 10 == 9 else PACK_ROOT_MODPACK + "/mods"
+        files[f"{root}/mod_{i:05d}.jar"] = rng.randbytes(shape["large_kb"] * 1024)
+    words = ["enabled", "true", "false", "speed", "range", "spawn", "biome", "ore", "limit"]
+    for i in range(shape["small"]):
+        lines = []
+        while sum(len(line) for line in lines) < shape["small_kb"] * 1024:
+            lines.append(f"{rng.choice(words)}_{rng.randrange(1000)} = {rng.randrange(100000)}\n")
+        files[f"{PACK_ROOT_MODPACK}/config/group_{i % 50:02d}/cfg_{i:05d}.toml"] = "".join(lines).encode()
+
+    if version != "1.0":
+        rng = random.Random(f"{seed}-{version}")
+        paths = sorted(files)
+        for path in rng.sample(paths, int(len(paths) * PATCH_REMOVED)):
+            del files[path]
+        for path in rng.sample(sorted(files), int(len(files) * PATCH_CHANGED)):
+            files[path] = rng.randbytes(len(files[path])) if path.endswith(".jar") else files[path] + b"# v2\n"
+    return files
+
+def write_zip(path, files):
+    """Escribe un .zip: los jars sin comprimir (ya lo están) y el resto con deflate."""
+    with zipfile.ZipFile(path, "w") as zf:
+        for name in sorted(files):
+            method = zipfile.ZIP_STORED if name.endswith(".jar") else zipfile.ZIP_DEFLATED
+            zf.writestr(zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0)), files[name], compress_type=method)
+
+def write_tar_zst(path, files):
+    """Escribe un .tar.zst (compresión zstd en varios hilos)."""
+    with open(path, "wb") as f:
+        with zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(f) as writer:
+            with tarfile.open(fileobj=writer, mode="w|") as tf:
+                for name in sorted(files):
+                    info = tarfile.TarInfo(name)
+                    info.size = len(files[name])
+                    info.mtime = 1704067200
+                    tf.addfile(info, io.BytesIO(files[name]))
+
+PACK_WRITERS = {"zip": write_zip, "tar.zst": write_tar_zst}
+
+def build_packs(shape, seed, serve_dir, base_url, fmt="zip"):
+    """
+    Genera el Full Pack 1.0, el parche 1.0 -> 1.1 (en formato 'fmt') y los
+    manifests en 'serve_dir'. Devuelve los manifests y un resumen del tamaño de los packs.
+    """
+    v1 = pack_contents(shape, seed, "1.0")
+    v2 = pack_contents(shape, seed, "1.1")
+    full_path = os.path.join(serve_dir, f"full_1.0.{fmt}")
+    patch_path = os.path.join(serve_dir, f"patch_1.1.{fmt}")
+    PACK_WRITERS[fmt](full_path, v1)
+    PACK_WRITERS[fmt](patch_path, {name: data for name, data in v2.items() if v1.get(name) != data})
+
+    def pack_entry(path, version):
+        return {
+            "version": version,
+            "url": f"{base_url}/{os.path.basename(path)}",
+            "filename": os.path.basename(path),
+            "hash": calc_file_hash(path),
+            "size": os.path.getsize(path),
+        }
+
+    full = pack_entry(full_path, "1.0")
+    patch = pack_entry(patch_path, "1.1")
+    # Las eliminaciones del parche son relativas a .mxd02modpack
+    prefix = PACK_ROOT_MODPACK + "/"
+    patch["filesToRemove"] = sorted(name[len(prefix):] for name in v1
+                                    if name not in v2 and name.startswith(prefix))
+    manifests = {
+        "v1": {"latestVersion": "1.0", "full": full},
+        "v2": {"latestVersion": "1.1", "full": full, "patch_1.1": patch},
+        # Solo para 'hash': la misma versión 1.0 con su lista de archivos
+        "verify": {"latestVersion": "1.0", "full": dict(full, files=[
+            {"path": name, "size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+            for name, data in sorted(v1.items())])},
+    }
+    for name, data in manifests.items():
+        with open(os.path.join(serve_dir, f"manifest_{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return manifests, {
+        "files": len(v1),
+        "bytes": sum(len(data) for data in v1.values()),
+        "fullArchiveBytes": full["size"],
+        "patchFiles": sum(1 for name, data in v2.items() if v1.get(name) != data),
+        "patchArchiveBytes": patch["size"],
+        "patchRemovedFiles": len(patch["filesToRemove"]),
+    }
+
+
+# ---------------------------------------------------------
+# SERVIDOR LOCAL CON LÍMITE DE ANCHO DE BANDA
+# ---------------------------------------------------------
+class TokenBucket:
+    """Limita los bytes por segundo enviados entre todas las conexiones."""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.lock = threading.Lock()
+        self.available = 0.0
+        self.last = time.monotonic()
+
+    def take(self, amount):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                # Como mucho 0.25 s de ráfaga acumulada
+                self.available = min(self.rate / 4, self.available + (now - self.last) * self.rate)
+                self.last = now
+                if self.available >= amount or self.available >= self.rate / 4:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(min(wait, 0.05))
+
+class ShapedHandler(http.server.SimpleHTTPRequestHandler):
+    """Sirve archivos con soporte de Range, ETag, latencia y límite de ancho de banda."""
+    bucket = None
+    latency = 0
+    stats = None
+    ranges = True  # Sin Range, siempre se envía el archivo completo (como algunos servidores)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        f = open(path, "rb")
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        etag = f'"{size}-{st.st_mtime_ns}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            f.close()
+            return None
+        start, end = 0, size - 1
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if self.ranges and match and int(match.group(1)) < size:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        if self.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        f.seek(start)
+        self.remaining = end - start + 1
+        with self.stats["lock"]:
+            self.stats["requests"] += 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        while self.remaining > 0:
+            data = source.read(min(64 * 1024, self.remaining))
+            if not data:
+                break
+            if self.bucket:
+                self.bucket.take(len(data))
+            outputfile.write(data)
+            self.remaining -= len(data)
+            with self.stats["lock"]:
+                self.stats["bytes"] += len(data)
+
+def start_server(serve_dir, bandwidth_mb=0, latency_ms=0, ranges=True):
+    """
+    Arranca el servidor en un puerto libre de 127.0.0.1. Devuelve (servidor, url, stats).
+    Con ranges=False ignora las cabeceras Range.
+    """
+    stats = {"lock": threading.Lock(), "requests": 0, "bytes": 0}
+    handler = type("Handler", (ShapedHandler,), {
+        "bucket": TokenBucket(bandwidth_mb * 1024 * 1024) if bandwidth_mb else None,
+        "latency": latency_ms / 1000,
+        "stats": stats,
+        "ranges": ranges,
+    })
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=serve_dir))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", stats
+
+
+# ---------------------------------------------------------
+# ESCENARIOS
+# ---------------------------------------------------------
+class Bench:
+    """Ejecuta los escenarios contra el servidor local y recoge sus tiempos."""
+
+    def __init__(self, args, work_dir, base_url, manifests, pack, stats):
+        self.args = args
+        self.work_dir = work_dir
+        self.base_url = base_url
+        self.manifests = manifests
+        self.pack = pack  # Resumen de build_packs (archivos y bytes)
+        self.stats = stats  # Contadores del servidor
+        self.counter = 0
+
+    def new_instance(self, manifest="v1"):
+        """Crea carpetas vacías (.mxd02modpack, versions y .minecraft) y su ModpackUpdater."""
+        self.counter += 1
+        base = os.path.join(self.work_dir, f"run_{self.counter:03d}")
+        dirs = [os.path.join(base, d) for d in ("mxd02modpack", "minecraft/versions", "minecraft")]
+        for d in dirs:
+            os.makedirs(d, exist_ok=True)
+        return self.updater(manifest, *dirs)
+
+    def updater(self, manifest, modpack_dir, versions_dir, minecraft_dir):
+        return ModpackUpdater(f"{self.base_url}/manifest_{manifest}.json", modpack_dir, versions_dir, minecraft_dir,
+                              "4", connections=self.args.connections, cache=None, events=EventSink(),
+                              extract_threads=self.args.extract_threads)
+
+    def measure(self, prepare, action):
+        """
+        Ejecuta 'prepare' (sin medir) y luego 'action', midiendo su tiempo y
+        los bytes servidos por el servidor. Devuelve (segundos, bytes, resultado).
+        Cada 'action' devuelve el tiempo por fase de su ModpackUpdater.
+        """
+        context = prepare()
+        with self.stats["lock"]:
+            served = self.stats["bytes"]
+        start = time.perf_counter()
+        result = action(context)
+        seconds = time.perf_counter() - start
+        with self.stats["lock"]:
+            served = self.stats["bytes"] - served
+        return seconds, served, result
+
+    def installed(self, manifest="v1"):
+        """Instancia con la versión 1.0 ya instalada (preparación de otros escenarios)."""
+        updater = self.new_instance(manifest)
+        error, info = updater.update()
+        if error:
+            raise Exception(f"No se pudo preparar la instalación: {info}")
+        return updater
+
+    # Cada escenario devuelve (preparar, acción, bytes_de_datos, archivos)
+    def scenario_download(self):
+        full = self.manifests["v1"]["full"]
+
+        def action(updater):
+            try:
+                updater.fetch_pack(full, "Full Pack")
+            finally:
+                updater.close()
+            return updater.report.totals()
+        return self.new_instance, action, full["size"], 1
+
+    def scenario_extract(self):
+        full = self.manifests["v1"]["full"]
+        archive = os.path.join(self.work_dir, full["filename"])
+        if not os.path.isfile(archive):
+            shutil.copy(os.path.join(self.work_dir, "serve", full["filename"]), archive)
+
+        def action(updater):
+            try:
+                updater.install_archive(archive, "_temp_full_", "Full Pack")
+                updater.open_index().commit()
+            finally:
+                updater.close()
+            return updater.report.totals()
+        return self.new_instance, action, self.pack["bytes"], self.pack["files"]
+
+    def scenario_hash(self):
+        def action(updater):
+            try:
+                result = updater.verify(self.manifests["verify"], full=True)
+            finally:
+                updater.close()
+            if result["mismatched"]:
+                raise Exception(f"{len(result['mismatched'])} archivos no coinciden tras instalar.")
+            return updater.report.totals()
+        def prepare():
+            done = self.installed()
+            return self.updater("v1", done.modpack_dir, done.forge_versions_dir, done.minecraft_dir)
+        return prepare, action, self.pack["bytes"], self.pack["files"]
+
+    def scenario_install(self):
+        def action(updater):
+            error, info = updater.update()
+            if error:
+                raise Exception(info)
+            return updater.report.totals()
+        return self.new_instance, action, self.pack["bytes"], self.pack["files"]
+
+    def scenario_patch(self):
+        def prepare():
+            done = self.installed()
+            return self.updater("v2", done.modpack_dir, done.forge_versions_dir, done.minecraft_dir)
+
+        def action(updater):
+            error, info = updater.update()
+            if error or info != "1.1":
+                raise Exception(info)
+            return updater.report.totals()
+        return prepare, action, self.pack["patchArchiveBytes"], self.pack["patchFiles"]
+
+    def scenario_noop(self):
+        def prepare():
+            updater = self.new_instance("v2")
+            write_installed_version(updater.modpack_dir, "1.1")
+            return updater
+
+        def action(updater):
+            error, info = updater.update()
+            if error:
+                raise Exception(info)
+            return updater.report.totals()
+        return prepare, action, 0, 0
+
+    def run(self, name):
+        prepare, action, data_bytes, files = getattr(self, f"scenario_{name}")()
+        runs = []
+        served = 0
+        for _ in range(self.args.runs):
+            # Además del tiempo total, el desglose por fase del motor (RunReport) de la última ejecución
+            seconds, served, phases = self.measure(prepare, action)
+            runs.append(seconds)
+            if not self.args.keep:
+                self.cleanup()
+        median = statistics.median(runs)
+        return {
+            "runs": [round(s, 4) for s in runs],
+            "median": round(median, 4),
+            "min": round(min(runs), 4),
+            "mean": round(statistics.mean(runs), 4),
+            "bytes": data_bytes,
+            "files": files,
+            "servedBytes": served,
+            "mbPerSecond": round(data_bytes / median / (1024 * 1024), 2) if data_bytes and median else None,
+            "filesPerSecond": round(files / median, 1) if files and median else None,
+            "phases": phases,
+        }
+
+    def cleanup(self):
+        for name in os.listdir(self.work_dir):
+            if name.startswith("run_"):
+                shutil.rmtree(os.path.join(self.work_dir, name), ignore_errors=True)
+
+
+def compare(previous, current):
+    """Muestra la diferencia de la mediana de cada escenario con un resultado anterior."""
+    print(f"{'escenario':<10} {'anterior':>10} {'actual':>10} {'cambio':>8}", file=sys.stderr)
+    for name, result in current["results"].items():
+        old = previous.get("results", {}).get(name)
+        if not old:
+            continue
+        change = (result["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0
+        print(f"{name:<10} {old['median']:>9.3f}s {result['median']:>9.3f}s {change:>+7.1f}%", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="mxd02_bench",
+        description="Benchmark reproducible de la instalación con packs sintéticos y un servidor local.")
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="mixed",
+                        help="jars: pocos archivos grandes; configs: miles de archivos pequeños; mixed: ambos")
+    parser.add_argument("--large", type=int, help="Número de archivos grandes (sustituye al de --shape)")
+    parser.add_argument("--large-kb", type=int, help="Tamaño de cada archivo grande, en KB")
+    parser.add_argument("--small", type=int, help="Número de archivos pequeños")
+    parser.add_argument("--small-kb", type=int, help="Tamaño de cada archivo pequeño, en KB")
+    parser.add_argument("--seed", default="mxd02", help="Semilla de los datos generados")
+    parser.add_argument("--format", choices=sorted(PACK_WRITERS), default="zip",
+                        help="Formato de los packs (tar.zst necesita el módulo zstandard)")
+    parser.add_argument("--bandwidth", type=float, default=0, help="Límite del servidor en MB/s (0 = sin límite)")
+    parser.add_argument("--latency", type=float, default=0, help="Latencia añadida a cada petición, en ms")
+    parser.add_argument("--connections", type=int, default=DOWNLOAD_CONNECTIONS, help="Conexiones por descarga")
+    parser.add_argument("--extract-threads", type=int, default=EXTRACT_THREADS,
+                        help="Hilos que escriben archivos al extraer")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones de cada escenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Escenarios separados por comas ({', '.join(SCENARIOS)})")
+    parser.add_argument("--work-dir", help="Carpeta de trabajo (por defecto una temporal que se borra al terminar)")
+    parser.add_argument("--keep", action="store_true", help="No borrar las instalaciones de cada ejecución")
+    parser.add_argument("--output", help="Archivo donde guardar el resultado JSON (por defecto, la salida estándar)")
+    parser.add_argument("--compare", help="Resultado JSON anterior con el que comparar")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"Escenarios desconocidos: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    if args.format == "tar.zst" and zstandard is None:
+        print("El formato tar.zst necesita el módulo zstandard (pip install zstandard).", file=sys.stderr)
+        return 1
+    shape = dict(SHAPES[args.shape])
+    for key in ("large", "large_kb", "small", "small_kb"):
+        if getattr(args, key) is not None:
+            shape[key] = getattr(args, key)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="mxd02bench_")
+    serve_dir = os.path.join(work_dir, "serve")
+    os.makedirs(serve_dir, exist_ok=True)
+    server, base_url, stats = start_server(serve_dir, args.bandwidth, args.latency)
+    try:
+        print("Generando packs sintéticos...", file=sys.stderr)
+        manifests, pack = build_packs(shape, args.seed, serve_dir, base_url, args.format)
+        bench = Bench(args, work_dir, base_url, manifests, pack, stats)
+        results = {}
+        for name in scenarios:
+            print(f"Escenario '{name}' ({args.runs} ejecuciones)...", file=sys.stderr)
+            results[name] = bench.run(name)
+    finally:
+        server.shutdown()
+        server.server_close()
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "mxd02_bench",
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "shape": args.shape, **shape, "seed": args.seed, "format": args.format, "bandwidthMBps": args.bandwidth,
+            "latencyMs": args.latency, "connections": args.connections,
+            "extractThreads": args.extract_threads, "runs": args.runs,
+        },
+        "pack": pack,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
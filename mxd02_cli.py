@@ -0,0 +1,306 @@
+"""
+Línea de comandos del MXD02 Modpack Manager, sin ventana ni Qt, para
+instalaciones desatendidas (p.e. en muchos equipos a la vez).
+
+    python mxd02_cli.py install [--core-only] [opciones] [carpeta_modpack ...]
+    python mxd02_cli.py optional [opciones] [carpeta_modpack ...]   (contenido opcional pendiente)
+    python mxd02_cli.py verify  [--repair] [opciones] [carpeta_modpack ...]
+    python mxd02_cli.py plan    [opciones] [carpeta_modpack ...]
+    python mxd02_cli.py status  [opciones] [carpeta_modpack ...]
+    python mxd02_cli.py jvm     [--ram N] [carpeta_modpack ...]   (argumentos de Java, sin instalar nada)
+    python mxd02_cli.py serve   [--port N]   (comparte la caché de descargas en la red local)
+    python mxd02_cli.py prune-store          (borra del almacén compartido lo que no usa ninguna instancia)
+
+Con varias carpetas, cada una se procesa en paralelo. Con --json se escribe
+una línea JSON por evento (log, progress, phase, result); 'phase' llega al
+terminar cada fase (descarga, extracción, hash...) con su tiempo y velocidad.
+
+Códigos de salida: 0 = correcto, 1 = error, 3 = hay una actualización
+pendiente (plan/status), 4 = la verificación encontró archivos distintos,
+130 = cancelado (Ctrl+C).
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mxd02_engine import (
+    DEFAULT_MANIFEST_URL, DEFAULT_MINECRAFT_DIR, DEFAULT_MODPACK_DIR, FORGE_VERSIONS_DIR,
+    DOWNLOAD_CONNECTIONS, EXTRACT_THREADS, LOG_FLUSH_HZ, LAN_CACHE_PORT, LAN_DISCOVERY_PORT, OPTIONAL_LOG_FILE,
+    DEFAULT_STORE_DIR, EventSink, LanCacheServer, ModpackUpdater, ContentStore, create_cache, create_store,
+    lan_cache_peers, load_user_settings, read_installed_version,
+)
+from mxd02_jvm import RAM_AUTO, describe_tuning
+
+EXIT_OK            = 0
+EXIT_ERROR         = 1
+EXIT_OUTDATED      = 3
+EXIT_VERIFY_FAILED = 4
+EXIT_CANCELLED     = 130
+
+# Si hay resultados distintos entre carpetas, se devuelve el primero de esta lista
+EXIT_PRIORITY = [EXIT_CANCELLED, EXIT_ERROR, EXIT_VERIFY_FAILED, EXIT_OUTDATED, EXIT_OK]
+
+
+class Reporter:
+    """Escribe los eventos de cada carpeta en stdout (texto o una línea JSON por evento)."""
+
+    def __init__(self, json_output):
+        self.json_output = json_output
+        self.lock = threading.Lock()
+
+    def emit(self, modpack_dir, event, **fields):
+        with self.lock:
+            if self.json_output:
+                record = {"event": event, "dir": modpack_dir, "time": round(time.time(), 3)}
+                record.update(fields)
+                print(json.dumps(record, ensure_ascii=False), flush=True)
+            elif event == "log":
+                print(f"[{modpack_dir}] {fields['message']}", flush=True)
+            elif event == "result":
+                print(f"[{modpack_dir}] {fields['message']}", flush=True)
+
+
+# ---------------------------------------------------------
+# COMANDOS
+# ---------------------------------------------------------
+def command_install(updater, args):
+    error, info = updater.update()
+    phases = updater.report.totals()
+    if error:
+        return EXIT_ERROR, {"message": f"ERROR: {info}", "error": info, "phases": phases}
+    message = f"Versión instalada: {info}"
+    if updater.optional_pending:
+        message += f"; contenido opcional pendiente: {', '.join(updater.optional_pending)} (ver 'optional')"
+    return EXIT_OK, {"message": message, "version": info, "phases": phases,
+                     "optionalPending": updater.optional_pending}
+
+def command_optional(updater, args):
+    error, info = updater.install_optional()
+    if error:
+        return EXIT_ERROR, {"message": f"ERROR: {info}", "error": info}
+    return EXIT_OK, {"message": f"Contenido opcional: {info}", "phases": updater.report.totals()}
+
+def command_plan(updater, args):
+    manifest_data = get_manifest(updater)
+    plan = updater.build_plan(manifest_data, read_installed_version(updater.modpack_dir))
+    for line in plan.describe():
+        updater.log(line)
+    code = EXIT_OUTDATED if plan.steps else EXIT_OK
+    return code, {"message": f"{len(plan.steps)} pasos hasta {plan.target_version}", "plan": plan.to_dict()}
+
+def command_status(updater, args):
+    manifest_data = get_manifest(updater)
+    current_version = read_installed_version(updater.modpack_dir)
+    latest_version = manifest_data.get("latestVersion")
+    up_to_date = current_version is not None and current_version == latest_version
+    message = (f"Versión instalada: {current_version or 'Ninguna'}, última: {latest_version}"
+               + ("" if up_to_date else " (hay que actualizar)"))
+    result = {"installed": current_version, "latest": latest_version, "upToDate": up_to_date}
+    if current_version:
+        # Comparación rápida (solo tamaño y fecha) contra el índice de archivos instalados
+        result.update(updater.index_status())
+        message += (f"; {result['indexedFiles']} archivos en el índice, "
+                    f"{len(result['changedFiles'])} modificados, {len(result['orphanFiles'])} ajenos")
+    pending = sorted(updater.pending_optional(manifest_data)) if current_version else []
+    if pending:
+        result["optionalPending"] = pending
+        message += f"; contenido opcional pendiente: {', '.join(pending)}"
+    journal = updater.pending_journal()
+    if journal:
+        result["interruptedUpdate"] = {"from": journal.get("from"), "target": journal.get("target")}
+        message += f"; actualización a {journal.get('target')} interrumpida (install la continuará)"
+    result["message"] = message
+    return (EXIT_OK if up_to_date else EXIT_OUTDATED), result
+
+def command_verify(updater, args):
+    result = updater.verify(get_manifest(updater), repair=args.repair, full=args.full)
+    speed = f"{result['filesPerSecond']:.0f} archivos/s, {result['mbPerSecond']:.1f} MB/s"
+    if result["mismatched"]:
+        result["message"] = f"{len(result['mismatched'])} archivos no coinciden ({speed})"
+        return EXIT_VERIFY_FAILED, result
+    if result["repaired"]:
+        result["message"] = f"{len(result['repaired'])} archivos reparados ({speed})"
+    else:
+        result["message"] = f"Todos los archivos coinciden ({speed})"
+    return EXIT_OK, result
+
+def command_jvm(updater, args):
+    tuning = updater.jvm_tuning()
+    for line in describe_tuning(tuning):
+        updater.log(line)
+    tuning["message"] = f"{tuning['heapGb']} GB, {len(tuning['warnings'])} avisos: {tuning['javaArgs']}"
+    return EXIT_OK, tuning
+
+COMMANDS = {
+    "install": command_install,
+    "jvm": command_jvm,
+    "optional": command_optional,
+    "verify": command_verify,
+    "plan": command_plan,
+    "status": command_status,
+}
+
+def get_manifest(updater):
+    manifest_data = updater.download_json(updater.manifest_url)
+    if not manifest_data:
+        raise Exception("No se pudo obtener el manifest o está vacío.")
+    return manifest_data
+
+
+# ---------------------------------------------------------
+# EJECUCIÓN
+# ---------------------------------------------------------
+def run_job(modpack_dir, args, settings, cache, store, reporter, updaters, cancel_event):
+    """Ejecuta el comando en una carpeta, enviando su log y progreso al 'reporter'."""
+    # Solo 'install' escribe install.log: el resto no debe pisar el de la última instalación
+    if args.command == "install":
+        events = None
+    elif args.command == "optional":
+        events = EventSink(os.path.join(modpack_dir, OPTIONAL_LOG_FILE))
+    else:
+        events = EventSink()
+    updater = ModpackUpdater(args.manifest, modpack_dir, args.versions_dir, args.minecraft_dir,
+                             args.ram or settings.get("ram", RAM_AUTO),
+                             connections=args.connections or settings.get("connections", DOWNLOAD_CONNECTIONS),
+                             cache=cache, events=events,
+                             lan_peers=(args.lan_peer or []) + lan_cache_peers(settings),
+                             lan_discover=args.lan_discover or settings.get("lan_cache_discover", False),
+                             on_phase=lambda record: reporter.emit(modpack_dir, "phase", **record),
+                             extract_threads=args.extract_threads or settings.get("extract_threads", EXTRACT_THREADS),
+                             defer_optional=args.core_only, store=store, instance_name=args.name)
+    updaters.append(updater)
+    if cancel_event.is_set():
+        updater.cancel()
+
+    done = threading.Event()
+
+    def pump():
+        # Se recoge el log y el progreso LOG_FLUSH_HZ veces por segundo
+        while True:
+            finished = done.wait(1 / LOG_FLUSH_HZ)
+            lines, value = updater.events.drain()
+            for line in lines:
+                reporter.emit(modpack_dir, "log", message=line)
+            if value is not None:
+                reporter.emit(modpack_dir, "progress", value=value)
+            if finished:
+                return
+
+    pump_thread = threading.Thread(target=pump, daemon=True)
+    pump_thread.start()
+    try:
+        code, result = COMMANDS[args.command](updater, args)
+    except Exception as e:
+        code, result = EXIT_ERROR, {"message": f"ERROR: {e}", "error": str(e)}
+    finally:
+        updater.close()
+        done.set()
+        pump_thread.join()
+        updater.events.close()
+
+    if cancel_event.is_set() and code != EXIT_OK:
+        code = EXIT_CANCELLED
+    reporter.emit(modpack_dir, "result", exitCode=code, **result)
+    return code
+
+def serve_cache(args, cache):
+    """Comando 'serve': comparte la caché de descargas en la red local hasta Ctrl+C."""
+    if not cache:
+        print("La caché de descargas está desactivada (cache_max_gb = 0).", file=sys.stderr)
+        return EXIT_ERROR
+    server = LanCacheServer(cache, port=args.port,
+                            discovery_port=None if args.no_discovery else LAN_DISCOVERY_PORT,
+                            log_func=lambda message: print(message, flush=True))
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return EXIT_OK
+
+def prune_store(store):
+    """Comando 'prune-store': borra del almacén compartido los archivos que ya no usa ninguna instancia."""
+    files, freed = store.prune()
+    print(f"{files} archivos eliminados del almacén compartido ({freed / (1024 * 1024):.1f} MB liberados).")
+    return EXIT_OK
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="mxd02_cli",
+        description="Instala y comprueba el modpack MXD02 sin interfaz gráfica.")
+    parser.add_argument("command", choices=sorted(COMMANDS) + ["serve", "prune-store"],
+                        help="install: instalar/actualizar; optional: instalar el contenido opcional pendiente; "
+                             "verify: comprobar archivos; jvm: argumentos de Java recomendados para este equipo; "
+                             "plan: mostrar el plan de actualización; status: versión instalada y última; "
+                             "serve: compartir la caché de descargas en la red local; "
+                             "prune-store: limpiar el almacén compartido entre instancias")
+    parser.add_argument("dirs", nargs="*", metavar="carpeta_modpack",
+                        help=f"Carpetas .mxd02modpack a procesar (por defecto {DEFAULT_MODPACK_DIR})")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_URL, help="URL del manifest")
+    parser.add_argument("--minecraft-dir", default=DEFAULT_MINECRAFT_DIR, help="Carpeta .minecraft")
+    parser.add_argument("--versions-dir", default=FORGE_VERSIONS_DIR, help="Carpeta .minecraft/versions")
+    parser.add_argument("--ram", help="Memoria RAM para el perfil, en GB, o 'auto' para la recomendada "
+                                      "(por defecto la de user_settings.json)")
+    parser.add_argument("--connections", type=int, help="Conexiones simultáneas por descarga")
+    parser.add_argument("--extract-threads", type=int,
+                        help=f"Hilos que escriben archivos al extraer (por defecto {EXTRACT_THREADS})")
+    parser.add_argument("--core-only", action="store_true",
+                        help="install: instalar solo el contenido imprescindible y el perfil; "
+                             "el opcional queda para el comando 'optional'")
+    parser.add_argument("--shared-store", action="store_true",
+                        help="Compartir mods y resourcepacks entre instancias con enlaces duros "
+                             "(también \"shared_store\" en user_settings.json)")
+    parser.add_argument("--name", help="Nombre del perfil en el launcher (por defecto según la carpeta)")
+    parser.add_argument("--jobs", type=int, help="Carpetas procesadas a la vez (por defecto todas)")
+    parser.add_argument("--no-cache", action="store_true", help="No usar la caché de descargas")
+    parser.add_argument("--repair", action="store_true", help="verify: volver a descargar los archivos dañados o que faltan")
+    parser.add_argument("--full", action="store_true", help="verify: calcular el hash de todos los archivos, ignorando el índice")
+    parser.add_argument("--json", action="store_true", help="Un evento JSON por línea en la salida")
+    parser.add_argument("--lan-peer", action="append", metavar="URL",
+                        help="Servidor de caché en red local (p.e. http://192.168.1.20:8765); se puede repetir")
+    parser.add_argument("--lan-discover", action="store_true", help="Buscar servidores de caché en la red local")
+    parser.add_argument("--port", type=int, default=LAN_CACHE_PORT, help="serve: puerto HTTP")
+    parser.add_argument("--no-discovery", action="store_true", help="serve: no responder a las búsquedas por broadcast")
+    return parser
+
+def main(argv=None):
+    # Las opciones pueden ir antes o después de las carpetas (install --ram 6 carpeta)
+    args = build_parser().parse_intermixed_args(argv)
+    dirs = args.dirs or [DEFAULT_MODPACK_DIR]
+    settings = load_user_settings()
+    cache = None if args.no_cache else create_cache(settings)
+    if args.command == "serve":
+        return serve_cache(args, cache)
+    store = create_store(settings)
+    if args.shared_store and not store:
+        store = ContentStore(settings.get("store_dir", DEFAULT_STORE_DIR))
+    if args.command == "prune-store":
+        return prune_store(store or ContentStore(settings.get("store_dir", DEFAULT_STORE_DIR)))
+    reporter = Reporter(args.json)
+    updaters = []
+    cancel_event = threading.Event()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, args.jobs or len(dirs)))
+    futures = [pool.submit(run_job, d, args, settings, cache, store, reporter, updaters, cancel_event) for d in dirs]
+    try:
+        # Espera con timeout para que Ctrl+C llegue también en Windows
+        while not all(future.done() for future in futures):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        for updater in list(updaters):
+            updater.cancel()
+    pool.shutdown(wait=True)
+
+    codes = {future.result() for future in futures}
+    return next(code for code in EXIT_PRIORITY if code in codes)
+
+if __name__ == "__main__":
+    sys.exit(main())
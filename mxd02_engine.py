@@ -0,0 +1,3294 @@
+"""
+Motor de instalación del MXD02 Modpack Manager (sin dependencias de Qt).
+Lo usan la ventana (mxd02_modpackinstaller.py) y la línea de comandos (mxd02_cli.py).
+"""
+import os
+import json
+import shutil
+import sqlite3
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+import bz2
+import hashlib
+import heapq
+import http.server
+import io
+import re
+import socket
+import struct
+import tarfile
+import zipfile
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from datetime import datetime
+
+try:
+    import fcntl  # Solo existe en Linux/macOS (necesario para reflinks)
+except ImportError:
+    fcntl = None
+
+try:
+    import bsdiff4  # Opcional: aplica parches binarios más rápido (extensión en C)
+except ImportError:
+    bsdiff4 = None
+
+try:
+    import zstandard  # Opcional: packs .tar.zst y entradas zstd dentro de .zip
+except ImportError:
+    zstandard = None
+
+from pyunpack import Archive  # Para extraer .rar/.7z (los .zip/.tar se extraen directamente)
+
+from mxd02_jvm import RAM_AUTO, describe_tuning, tune_jvm
+
+# ---------------------------------------------------------
+# CONFIGURACIONES
+# ---------------------------------------------------------
+
+# (Cambia aquí la URL raw de tu Pastebin con el manifest)
+DEFAULT_MANIFEST_URL = "https://pastebin.com/raw/mPKas0Ci"
+
+# Rutas "universales" en Windows (usando APPDATA)
+DEFAULT_MINECRAFT_DIR = os.path.join(os.getenv("APPDATA"), ".minecraft")
+DEFAULT_MODPACK_DIR   = os.path.join(os.getenv("APPDATA"), ".mxd02modpack")
+FORGE_VERSIONS_DIR    = os.path.join(DEFAULT_MINECRAFT_DIR, "versions")
+DEFAULT_CACHE_DIR     = os.path.join(os.getenv("APPDATA"), ".mxd02cache")  # Caché de descargas
+DEFAULT_STORE_DIR     = os.path.join(os.getenv("APPDATA"), ".mxd02store")  # Almacén compartido entre instancias
+
+INSTALLED_VERSION_FILE = "installed_version.txt"  # Dentro de .mxd02modpack
+MANIFEST_CACHE_FILE    = "manifest_cache.json"  # Copia local del manifest, dentro de .mxd02modpack
+INDEX_FILE             = "installed_files.db"  # Índice de archivos instalados, dentro de .mxd02modpack
+JOURNAL_FILE           = "install_journal.json"  # Diario de la actualización en curso, dentro de .mxd02modpack
+MAX_DOWNLOAD_RETRIES   = 5  # Reintentos de descarga
+DOWNLOAD_CONNECTIONS   = 4  # Conexiones simultáneas para archivos grandes
+MIRROR_PROBE_BYTES     = 64 * 1024  # Bytes que se piden a cada espejo para medir su velocidad
+LAN_CACHE_PORT         = 8765  # Puerto HTTP del servidor de caché en red local
+LAN_DISCOVERY_PORT     = 8766  # Puerto UDP para descubrir servidores de caché en la red local
+LAN_PROBE_TIMEOUT      = 2  # Segundos que se espera a un servidor de caché en red al comprobarlo
+LAN_DISCOVERY_MAGIC    = b"MXD02-CACHE?"  # Mensaje de descubrimiento (la respuesta es "MXD02-CACHE <puerto>")
+SEGMENT_SIZE           = 16 * 1024 * 1024  # Tamaño de cada trozo (Range) en descargas segmentadas
+DOWNLOAD_STATE_SUFFIX  = ".state.json"  # Estado de descargas a medias (junto al archivo parcial)
+DOWNLOAD_STATE_INTERVAL = 4 * 1024 * 1024  # Cada cuántos bytes se guarda el estado
+CACHE_MAX_GB           = 10  # Tamaño máximo de la caché de descargas (0 = desactivada)
+ESTIMATED_BANDWIDTH    = 5 * 1024 * 1024  # Bytes/s para estimar la duración de un plan
+PIPELINE_LOOKAHEAD     = 2  # Pasos del plan que se descargan por adelantado
+VERIFY_THREADS         = max(2, min(8, os.cpu_count() or 2))  # Hilos para calcular hashes al verificar
+EXTRACT_THREADS        = max(2, min(8, os.cpu_count() or 2))  # Hilos que escriben archivos al extraer o copiar
+EXTRACT_INLINE_SIZE    = 4 * 1024 * 1024  # En un .tar, los archivos mayores se escriben en el hilo que lee
+HASH_ALGORITHM         = "sha256"  # para la verificación del ZIP
+HASH_BUFFER_SIZE       = 1024 * 1024  # Lectura en bloques de 1 MB al calcular hashes
+LOG_FLUSH_HZ           = 20  # Veces por segundo que la ventana recoge el log y el progreso
+LOG_MAX_LINES          = 5000  # Líneas que se conservan en pantalla (el archivo de log guarda todas)
+LOG_FILE               = "install.log"  # Log completo de la última instalación, dentro de .mxd02modpack
+RUN_REPORT_FILE        = "last_run_report.json"  # Tiempos de cada fase de la última instalación, dentro de .mxd02modpack
+OPTIONAL_STATE_FILE    = "optional_content.json"  # Niveles de contenido opcional ya instalados, dentro de .mxd02modpack
+OPTIONAL_LOG_FILE      = "install_optional.log"  # Log de la descarga del contenido opcional, dentro de .mxd02modpack
+STORE_EXTENSIONS       = (".jar", ".zip")  # Archivos que se comparten entre instancias (el juego no los modifica)
+LEGACY_PROFILE_ID      = "23fc205a599a1340b3cb7ee096b9760d"  # Perfil de la instancia por defecto
+PROFILE_NAME           = "mxd02modpack"  # Nombre del perfil de la instancia por defecto
+TIER_REQUIRED          = "required"  # Nivel de contenido sin el que no se puede jugar (el de las entradas sin "tier")
+
+# Evita que dos instalaciones en paralelo escriban launcher_profiles.json a la vez
+PROFILES_LOCK = threading.Lock()
+
+# Archivo local para guardar la configuración de la GUI (ej. memoria RAM)
+SETTINGS_FILE = "user_settings.json"
+
+# Formas de colocar archivos en su destino (ver copy_all)
+APPLY_COPY = "copy"  # Copia normal
+APPLY_MOVE = "move"  # Renombrar si es el mismo disco (el origen desaparece)
+FICLONE    = 0x40049409  # ioctl de Linux para reflinks
+
+# Compresión zstd
+ZSTD_MAGIC       = b"\x28\xb5\x2f\xfd"  # Inicio de un frame zstd
+ZIP_ZSTANDARD    = 93  # Método zstd dentro de un .zip (zipfile no lo admite)
+ZSTD_PIPE_CHUNKS = 8  # Bloques de HASH_BUFFER_SIZE que se descomprimen por adelantado
+
+# Carpetas de primer nivel dentro de un pack y su destino en disco.
+# (La ruta de cada archivo en el manifest usa esta misma estructura)
+PACK_ROOT_MODPACK    = ".mxd02modpack"
+PACK_ROOT_FORGE      = "forgeVersion"
+PACK_ROOT_LIBRARIES  = "libraries"
+PACK_ROOT_ADDITIONAL = "additional_files"
+
+
+# ---------------------------------------------------------
+# FUNCIONES AUXILIARES
+# ---------------------------------------------------------
+
+def ensure_dir(path):
+    os.makedirs(path, exist_ok=True)
+
+def temp_path(dest):
+    """
+    Archivo temporal junto a 'dest' (mismo disco, para os.replace), único por
+    proceso e hilo: varias instalaciones a la vez (p.e. la línea de comandos con
+    varias carpetas) escriben los mismos archivos de .minecraft/libraries.
+    """
+    return f"{dest}.{os.getpid()}.{threading.get_ident()}.mxd02tmp"
+
+def calc_file_hash(file_path, hash_type="sha256", start=0, end=None, h=None):
+    """
+    Calcula el hash del archivo (SHA-256 por defecto) leyendo en bloques grandes.
+    'start'/'end' limitan el rango leído y 'h' permite continuar un hash existente.
+    """
+    h = h or hashlib.new(hash_type)
+    buf = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(file_path, 'rb', buffering=0) as f:
+        f.seek(start)
+        left = None if end is None else end - start
+        while left is None or left > 0:
+            n = f.readinto(view if left is None or left >= len(buf) else view[:left])
+            if not n:
+                break
+            h.update(view[:n])
+            if left is not None:
+                left -= n
+    return h.hexdigest()
+
+class SegmentHasher:
+    """
+    Calcula el hash de un archivo que se descarga en trozos paralelos.
+    Los bytes que llegan en orden se procesan al vuelo; los trozos que terminan
+    antes de que les toque se leen de vuelta (normalmente desde la caché del
+    sistema) cuando el hash alcanza su posición.
+    """
+
+    def __init__(self, file_path, segments, hash_type=HASH_ALGORITHM):
+        self.file_path = file_path
+        self.segments  = segments  # [inicio, fin, recibidos], ordenados por inicio
+        self.hasher    = hashlib.new(hash_type)
+        self.offset    = 0  # Bytes ya incluidos en el hash
+
+    def update(self, pos, data):
+        """Se llama justo después de escribir 'data' en la posición 'pos'."""
+        if pos == self.offset:
+            self.hasher.update(data)
+            self.offset += len(data)
+        self._catch_up()
+
+    def _catch_up(self):
+        for start, _end, received in self.segments:
+            if self.offset < start:
+                break
+            if self.offset < start + received:
+                calc_file_hash(self.file_path, start=self.offset, end=start + received, h=self.hasher)
+                self.offset = start + received
+
+    def hexdigest(self):
+        """Devuelve el hash si ya se procesó todo el archivo, o None."""
+        self._catch_up()
+        if self.offset != self.segments[-1][1] + 1:
+            return None
+        return self.hasher.hexdigest()
+
+def split_pack_path(rel_path):
+    """Divide una ruta del pack en sus componentes (ignorando '.' y separadores repetidos)."""
+    return [p for p in rel_path.replace("\\", "/").split("/") if p not in ("", ".")]
+
+def file_matches(file_path, size=None, expected_hash=None):
+    """
+    Indica si 'file_path' existe y coincide con el tamaño y hash esperados.
+    El tamaño se compara primero para no calcular hashes innecesariamente.
+    """
+    if not os.path.isfile(file_path):
+        return False
+    if size is not None and os.path.getsize(file_path) != int(size):
+        return False
+    if expected_hash and calc_file_hash(file_path, HASH_ALGORITHM).lower() != expected_hash.lower():
+        return False
+    return True
+
+def build_file_manifest(archive_path, base_url=None):
+    """
+    Genera la lista 'files' del manifest a partir de un pack .zip.
+
+    Si se indica 'base_url', cada entrada apunta a su propia URL (base_url + ruta).
+    Si no, se guarda la posición de los datos comprimidos dentro del ZIP para
+    descargarlos con una petición Range sobre la URL del Full Pack.
+    """
+    files = []
+    with zipfile.ZipFile(archive_path) as zf, open(archive_path, 'rb') as raw:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            h = hashlib.new(HASH_ALGORITHM)
+            with open_zip_member(zf, info) as member:
+                for chunk in iter(lambda: member.read(1024 * 1024), b''):
+                    h.update(chunk)
+            entry = {
+                "path": info.filename,
+                "size": info.file_size,
+                "sha256": h.hexdigest(),
+            }
+            if base_url:
+                entry["url"] = base_url.rstrip("/") + "/" + info.filename
+            elif info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, ZIP_ZSTANDARD):
+                entry["offset"] = zip_data_offset(raw, info)
+                entry["compressedSize"] = info.compress_size
+                entry["method"] = info.compress_type
+            files.append(entry)
+    return files
+
+def zip_data_offset(raw, info):
+    """Posición de los datos comprimidos de 'info' dentro del ZIP abierto en 'raw'."""
+    # Cabecera local: 30 bytes fijos + nombre + campo extra
+    raw.seek(info.header_offset)
+    header = raw.read(30)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+def require_zstandard():
+    if zstandard is None:
+        raise Exception("El pack usa compresión zstd y falta el módulo 'zstandard' (pip install zstandard).")
+
+def open_zip_member(zf, info):
+    """
+    Abre una entrada de un ZIP para leerla. zipfile no admite el método zstd
+    (ZIP_ZSTANDARD): esas entradas se descomprimen con el módulo zstandard.
+    """
+    if info.compress_type != ZIP_ZSTANDARD:
+        return zf.open(info)
+    require_zstandard()
+    raw = open(zf.filename, 'rb')
+    raw.seek(zip_data_offset(raw, info))
+    # Se limita la lectura a los datos de la entrada (lo que sigue no es zstd)
+    return zstandard.ZstdDecompressor().stream_reader(LimitedReader(raw, info.compress_size), closefd=True)
+
+class LimitedReader:
+    """Lee como mucho 'size' bytes de 'raw' desde su posición actual."""
+    def __init__(self, raw, size):
+        self.raw = raw
+        self.left = size
+
+    def read(self, size=-1):
+        size = self.left if size < 0 else min(size, self.left)
+        data = self.raw.read(size)
+        self.left -= len(data)
+        return data
+
+    def close(self):
+        self.raw.close()
+
+def archive_format(archive_path, declared=None):
+    """
+    Formato de un pack: "zip", "tar", "tar.zst" u "other" (.rar/.7z, con pyunpack).
+    'declared' es el campo 'format' o el 'filename' del manifest; si no lo
+    aclara, se mira el contenido (la copia de la caché no tiene extensión).
+    """
+    name = (declared or "").lower()
+    if name.endswith(("tar.zst", "tzst", "tar.zstd")):
+        return "tar.zst"
+    if name.endswith("zip"):
+        return "zip"
+    if name.endswith(("tar", "tar.gz", "tgz", "tar.bz2", "tar.xz")):
+        return "tar"
+    if name.endswith(("rar", "7z")):
+        return "other"
+    with open(archive_path, 'rb') as f:
+        if f.read(4) == ZSTD_MAGIC:
+            return "tar.zst"
+    if zipfile.is_zipfile(archive_path):
+        return "zip"
+    if tarfile.is_tarfile(archive_path):
+        return "tar"
+    return "other"
+
+def pack_format(pack_info):
+    """Formato declarado en el manifest para un Full Pack o parche ('format' o la extensión de 'filename')."""
+    return pack_info.get("format") or pack_info.get("filename")
+
+class ZstdPipeReader:
+    """
+    Lee 'raw' (datos zstd) ya descomprimido. La descompresión ocurre en un
+    hilo aparte con hasta ZSTD_PIPE_CHUNKS bloques de adelanto, así que se
+    solapa con la escritura de los archivos en disco (zstandard libera el GIL).
+    """
+    def __init__(self, raw):
+        require_zstandard()
+        self.queue = Queue(maxsize=ZSTD_PIPE_CHUNKS)
+        self.buffer = b""
+        self.pos = 0
+        self.eof = False
+        self.error = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self._decompress, args=(raw,), daemon=True)
+        self.thread.start()
+
+    def _decompress(self, raw):
+        try:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+            while not self.stopped:
+                data = reader.read(HASH_BUFFER_SIZE)
+                self.queue.put(data)
+                if not data:
+                    return
+        except Exception as e:
+            self.error = e
+            self.queue.put(b"")
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self.pos >= len(self.buffer):
+                if self.eof:
+                    break
+                self.buffer, self.pos = self.queue.get(), 0
+                if not self.buffer:
+                    self.eof = True
+                    if self.error:
+                        raise Exception(f"Error al descomprimir zstd: {self.error}")
+                    break
+            available = len(self.buffer) - self.pos
+            take = available if size < 0 else min(size, available)
+            parts.append(self.buffer[self.pos:self.pos + take])
+            self.pos += take
+            if size > 0:
+                size -= take
+        return b"".join(parts)
+
+    def close(self):
+        """Detiene el hilo (aunque no se haya leído todo)."""
+        self.stopped = True
+        while self.thread.is_alive():
+            try:
+                self.queue.get_nowait()
+            except Exception:
+                pass
+            self.thread.join(0.05)
+
+def files_identical(src, dst):
+    """Compara dos archivos por tamaño y fecha y, solo si coinciden, por hash."""
+    try:
+        s_stat, d_stat = os.stat(src), os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if s_stat.st_size != d_stat.st_size or int(s_stat.st_mtime) != int(d_stat.st_mtime):
+        return False
+    if os.path.samefile(src, dst):
+        return True
+    return calc_file_hash(src, HASH_ALGORITHM) == calc_file_hash(dst, HASH_ALGORITHM)
+
+def reflink_file(src, dst):
+    """
+    Intenta crear 'dst' como copia instantánea (reflink) de 'src'.
+    Solo funciona en Linux con sistemas de archivos que lo soportan (Btrfs, XFS...).
+    """
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+def link_file(src, dst):
+    """Coloca 'src' en 'dst' con un enlace duro o un reflink. Devuelve False si no se puede."""
+    tmp_path = temp_path(dst)
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        if not reflink_file(src, tmp_path):
+            return False
+    os.replace(tmp_path, dst)
+    return True
+
+def apply_file(src, dst, mode=APPLY_COPY, same_fs=None):
+    """
+    Coloca el archivo 'src' en 'dst' según 'mode' y devuelve lo que se hizo:
+    "skipped", "moved" o "copied".
+    """
+    if files_identical(src, dst):
+        return "skipped"
+    if mode == APPLY_MOVE:
+        if same_fs is None:
+            same_fs = os.stat(src).st_dev == os.stat(os.path.dirname(dst)).st_dev
+        if same_fs:
+            os.replace(src, dst)
+            return "moved"
+    replace_file(src, dst)
+    return "copied"
+
+def replace_file(src, dst, move=False):
+    """
+    Copia (o mueve) 'src' sobre 'dst' a través de un temporal y os.replace,
+    sin escribir nunca dentro del archivo que ya había: puede ser un enlace
+    duro compartido con el almacén y otras instancias (ver ContentStore).
+    """
+    tmp_path = temp_path(dst)
+    try:
+        if move:
+            shutil.move(src, tmp_path)
+        else:
+            shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def copy_all(src, dst, log_func=None, mode=APPLY_COPY, stats=None, threads=1):
+    """
+    Copia recursivamente el contenido de 'src' dentro de 'dst', 
+    sobrescribiendo archivos existentes.
+    Primero se recorre el árbol y se crean todas las carpetas de destino;
+    después los archivos se colocan repartidos entre 'threads' hilos.
+
+    'mode' indica cómo se colocan los archivos:
+      - APPLY_COPY: copia normal (shutil.copy2).
+      - APPLY_MOVE: os.replace si 'src' y 'dst' están en el mismo disco (las
+        carpetas que no existen en destino se mueven enteras); si no, copia.
+    Los archivos que ya son idénticos en destino no se tocan.
+    Devuelve un dict con cuántos archivos se copiaron, movieron u omitieron.
+    """
+    if stats is None:
+        stats = {"copied": 0, "moved": 0, "skipped": 0}
+    jobs = []
+    _collect_copy_jobs(src, dst, log_func, mode, stats, jobs)
+
+    def place(job):
+        s, d, same_fs = job
+        return s, d, apply_file(s, d, mode, same_fs)
+
+    if threads > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(place, jobs))
+    else:
+        results = [place(job) for job in jobs]
+    for s, d, result in results:
+        stats[result] += 1
+        if log_func and result != "skipped":
+            log_func(f"Copiando de {s} a {d}")
+    return stats
+
+def _collect_copy_jobs(src, dst, log_func, mode, stats, jobs):
+    """Crea las carpetas de destino y añade a 'jobs' cada archivo a colocar (origen, destino, mismo disco)."""
+    ensure_dir(dst)
+    same_fs = mode != APPLY_COPY and os.stat(src).st_dev == os.stat(dst).st_dev
+    for item in os.listdir(src):
+        s = os.path.join(src, item)
+        d = os.path.join(dst, item)
+        if os.path.isdir(s):
+            if mode == APPLY_MOVE and same_fs and not os.path.exists(d):
+                # La carpeta no existe en destino: se mueve entera con un solo rename
+                if log_func:
+                    log_func(f"Moviendo carpeta {s} a {d}")
+                os.replace(s, d)
+                stats["moved"] += sum(len(files) for _, _, files in os.walk(d))
+            else:
+                _collect_copy_jobs(s, d, log_func, mode, stats, jobs)
+        else:
+            jobs.append((s, d, same_fs))
+
+class EntryWriter:
+    """
+    Escribe los archivos de un pack en 'threads' hilos. Como mucho quedan
+    'threads' * 4 escrituras pendientes (y sus datos en memoria). Dos escrituras
+    en el mismo destino nunca se solapan: la segunda espera a la primera, así
+    que el resultado final es el mismo que escribiendo en orden.
+    Cada carpeta de destino se crea una sola vez.
+    """
+    def __init__(self, threads):
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.slots = threading.BoundedSemaphore(threads * 4)
+        self.pending = {}  # destino -> Future de su última escritura
+        self.dirs = set()
+        self.errors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.shutdown(wait=True)
+        if exc_type is None and self.errors:
+            raise self.errors[0]
+
+    def make_dirs(self, paths):
+        for path in sorted(set(paths)):
+            if path not in self.dirs:
+                ensure_dir(path)
+                self.dirs.add(path)
+
+    def wait(self, dest):
+        """Espera a que termine la escritura pendiente en 'dest' (si la hay)."""
+        future = self.pending.pop(dest, None)
+        if future:
+            future.result()
+
+    def submit(self, dest, write):
+        """Ejecuta write() en un hilo del pool; 'dest' es el archivo que escribe."""
+        if self.errors:
+            raise self.errors[0]
+        self.wait(dest)
+        self.make_dirs([os.path.dirname(dest)])
+        self.slots.acquire()
+        future = self.pool.submit(write)
+        future.add_done_callback(self._done)
+        self.pending[dest] = future
+
+    def _done(self, future):
+        self.slots.release()
+        if not future.cancelled() and future.exception():
+            self.errors.append(future.exception())
+
+def read_offtin(buf):
+    """Lee un entero de 64 bits en el formato signo-magnitud de bsdiff."""
+    value = int.from_bytes(buf[:7], "little") | ((buf[7] & 0x7F) << 56)
+    return -value if buf[7] & 0x80 else value
+
+def add_bytes(a, b):
+    """
+    Suma byte a byte (módulo 256) dos bloques del mismo tamaño.
+    Se hace con enteros grandes para no recorrer los bytes uno a uno en Python:
+    se suman los 7 bits bajos de cada byte y el bit alto se corrige con un XOR.
+    """
+    n = len(a)
+    x = int.from_bytes(a, "little")
+    y = int.from_bytes(b, "little")
+    low = int.from_bytes(b"\x7f" * n, "little")
+    high = int.from_bytes(b"\x80" * n, "little")
+    return (((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(n, "little")
+
+def apply_bsdiff(old_path, patch_path, new_path):
+    """
+    Aplica un parche binario en formato BSDIFF40 (el de la herramienta bsdiff)
+    a 'old_path' y escribe el resultado en 'new_path'. Devuelve su sha256.
+    Usa el módulo bsdiff4 si está instalado; si no, una implementación propia.
+    """
+    if bsdiff4 is not None:
+        bsdiff4.file_patch(old_path, new_path, patch_path)
+        return calc_file_hash(new_path, HASH_ALGORITHM)
+
+    with open(patch_path, 'rb') as f:
+        header = f.read(32)
+        if len(header) != 32 or header[:8] != b"BSDIFF40":
+            raise Exception("El parche binario no tiene formato BSDIFF40.")
+        ctrl_len, diff_len, new_size = (read_offtin(header[i:i + 8]) for i in (8, 16, 24))
+        if ctrl_len < 0 or diff_len < 0 or new_size < 0:
+            raise Exception("Cabecera de parche binario corrupta.")
+        ctrl = bz2.decompress(f.read(ctrl_len))
+        diff_data = f.read(diff_len)
+        extra_data = f.read()
+
+    diff_stream = io.BytesIO(bz2.decompress(diff_data))
+    extra_stream = io.BytesIO(bz2.decompress(extra_data)) if extra_data else io.BytesIO()
+
+    with open(old_path, 'rb') as f:
+        old = f.read()
+    hasher = hashlib.new(HASH_ALGORITHM)
+    old_pos = new_pos = ctrl_pos = 0
+    with open(new_path, 'wb') as out:
+        while new_pos < new_size:
+            if ctrl_pos + 24 > len(ctrl):
+                raise Exception("Bloque de control del parche binario incompleto.")
+            add_len, copy_len, seek = (read_offtin(ctrl[ctrl_pos + i:ctrl_pos + i + 8]) for i in (0, 8, 16))
+            ctrl_pos += 24
+            if add_len < 0 or copy_len < 0 or new_pos + add_len + copy_len > new_size:
+                raise Exception("Parche binario corrupto.")
+
+            # 1) 'add_len' bytes: diferencia + bytes del archivo original
+            done = 0
+            while done < add_len:
+                n = min(HASH_BUFFER_SIZE, add_len - done)
+                delta = diff_stream.read(n)
+                if len(delta) != n:
+                    raise Exception("Bloque de diferencias del parche binario incompleto.")
+                start = old_pos + done
+                base = old[max(start, 0):max(min(start + n, len(old)), 0)]
+                # Fuera del archivo original se suma 0 (igual que bsdiff)
+                pad_before = min(max(-start, 0), n)
+                base = b"\0" * pad_before + base
+                base += b"\0" * (n - len(base))
+                chunk = add_bytes(delta, base)
+                out.write(chunk)
+                hasher.update(chunk)
+                done += n
+            new_pos += add_len
+            old_pos += add_len
+
+            # 2) 'copy_len' bytes nuevos tal cual
+            extra = extra_stream.read(copy_len)
+            if len(extra) != copy_len:
+                raise Exception("Bloque extra del parche binario incompleto.")
+            out.write(extra)
+            hasher.update(extra)
+            new_pos += copy_len
+            old_pos += seek
+    return hasher.hexdigest()
+
+def add_or_update_profile(launcher_profiles_path, profile_id, profile_data, logger=None, defaults=None):
+    """
+    Agrega o actualiza el perfil con 'profile_id' en 'launcher_profiles.json'
+    sin sobrescribir otros perfiles. Además, conserva campos personalizados 
+    si el perfil ya existe. Los campos de 'defaults' solo se escriben si el
+    perfil aún no los tiene (p.e. al crearlo desde un parche).
+    """
+    if logger:
+        logger(f"Modificando el archivo launcher_profiles.json en: {launcher_profiles_path}")
+
+    with PROFILES_LOCK:
+        _update_profiles_file(launcher_profiles_path, profile_id, profile_data, defaults or {})
+
+    if logger:
+        logger(f"Perfil '{profile_id}' agregado/actualizado en launcher_profiles.json.")
+
+def _update_profiles_file(launcher_profiles_path, profile_id, profile_data, defaults):
+    if not os.path.isfile(launcher_profiles_path):
+        data = {"profiles": {}}
+    else:
+        try:
+            with open(launcher_profiles_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            data = {"profiles": {}}
+
+    if "profiles" not in data:
+        data["profiles"] = {}
+
+    old_profile = data["profiles"].get(profile_id, {})
+    # Mezclamos los datos antiguos con los nuevos:
+    # (lo básico aquí es sobreescribir lo que necesitamos,
+    #  y dejar lo que el usuario haya configurado)
+    for key, value in profile_data.items():
+        old_profile[key] = value
+    for key, value in defaults.items():
+        old_profile.setdefault(key, value)
+
+    data["profiles"][profile_id] = old_profile
+
+    with open(launcher_profiles_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+
+def instance_profile(modpack_dir, name=None):
+    """
+    (profile_id, nombre) del perfil del launcher de la instancia instalada en
+    'modpack_dir'. La carpeta por defecto conserva el perfil de siempre; cada
+    otra carpeta tiene su propio id (derivado de la ruta), así que varias
+    instancias no se pisan el perfil.
+    """
+    path = os.path.normcase(os.path.abspath(modpack_dir))
+    if path == os.path.normcase(os.path.abspath(DEFAULT_MODPACK_DIR)):
+        return LEGACY_PROFILE_ID, name or PROFILE_NAME
+    profile_id = hashlib.md5(path.encode("utf-8")).hexdigest()
+    folder = os.path.abspath(modpack_dir).rstrip(os.sep)
+    if os.path.basename(folder).lower() == PACK_ROOT_MODPACK:
+        folder = os.path.dirname(folder)  # p.e. D:/packs/variante/.mxd02modpack -> "variante"
+    return profile_id, name or f"{PROFILE_NAME} ({os.path.basename(folder) or folder})"
+
+def count_installed_mods(modpack_dir, index=None):
+    """
+    Número de mods (.jar de la carpeta mods) instalados en 'modpack_dir', según
+    el índice de archivos instalados. Sin índice, se cuenta la carpeta.
+    """
+    mods_dir = os.path.join(os.path.abspath(modpack_dir), "mods")
+    db_path = os.path.join(modpack_dir, INDEX_FILE)
+    if index is None and os.path.isfile(db_path):
+        own_index = FileIndex(db_path)
+        try:
+            return count_installed_mods(modpack_dir, own_index)
+        finally:
+            own_index.close()
+    if index is not None:
+        count = sum(1 for row in index.rows()
+                    if row[0].startswith(mods_dir + os.sep) and row[0].lower().endswith(".jar"))
+        if count:
+            return count
+    try:
+        return sum(1 for name in os.listdir(mods_dir) if name.lower().endswith(".jar"))
+    except OSError:
+        return 0
+
+def load_user_settings():
+    """
+    Carga la configuración guardada en SETTINGS_FILE (si existe).
+    Devuelve un dict con 'ram' y cualquier otra configuración que quieras guardar.
+    """
+    if os.path.isfile(SETTINGS_FILE):
+        try:
+            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except:
+            pass
+    return {"ram": RAM_AUTO}  # Por defecto, la recomendada para el equipo (ver mxd02_jvm.py)
+
+def save_user_settings(settings):
+    """
+    Guarda la configuración en SETTINGS_FILE.
+    """
+    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=4)
+
+def load_cached_manifest(cache_dir, url):
+    """Devuelve la copia local del manifest de 'url' (dict con data, etag...) o None."""
+    cache_path = os.path.join(cache_dir, MANIFEST_CACHE_FILE)
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+    return cached if cached.get("url") == url and "data" in cached else None
+
+def create_session(pool_size=DOWNLOAD_CONNECTIONS):
+    """
+    Sesión HTTP compartida por todas las peticiones de una actualización:
+    reutiliza las conexiones (keep-alive) en lugar de abrir una por petición.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def entry_urls(info, key="url"):
+    """
+    Devuelve la lista de URLs (espejos) de una entrada del manifest. 'key' puede
+    ser una URL o una lista de URLs; para "url" se añaden además las de "mirrors".
+    """
+    value = info.get(key)
+    urls = [value] if isinstance(value, str) else list(value or [])
+    if key == "url":
+        urls += info.get("mirrors", [])
+    return list(dict.fromkeys(u for u in urls if u))  # Sin repetidas, en el mismo orden
+
+def mirror_host(url):
+    """Servidor de una URL (esquema + host), que es lo que se mide al comparar espejos."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def fetch_manifest(url, cache_dir, timeout=15, session=None):
+    """
+    Descarga el manifest guardando una copia en 'cache_dir'. Si ya hay copia,
+    siempre se revalida con If-None-Match / If-Modified-Since: si el servidor
+    responde 304 se reutiliza sin volver a descargarlo, y una versión recién
+    publicada se ve al momento.
+    """
+    cached = load_cached_manifest(cache_dir, url)
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("lastModified"):
+        headers["If-Modified-Since"] = cached["lastModified"]
+    r = (session or requests).get(url, headers=headers, timeout=timeout)
+    if r.status_code == 304 and cached:
+        data = cached["data"]
+    else:
+        r.raise_for_status()
+        data = r.json()
+        cached = {
+            "url": url,
+            "etag": r.headers.get("ETag"),
+            "lastModified": r.headers.get("Last-Modified"),
+            "data": data,
+        }
+    cached["fetchedAt"] = time.time()
+
+    ensure_dir(cache_dir)
+    cache_path = os.path.join(cache_dir, MANIFEST_CACHE_FILE)
+    # La comprobación de inicio y la instalación pueden guardarlo a la vez
+    tmp_path = temp_path(cache_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cached, f)
+    os.replace(tmp_path, cache_path)
+    return data
+
+def read_installed_version(modpack_dir):
+    """Lee installed_version.txt; devuelve None si no hay nada instalado."""
+    installed_version_path = os.path.join(modpack_dir, INSTALLED_VERSION_FILE)
+    if os.path.isfile(installed_version_path):
+        with open(installed_version_path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    return None
+
+def write_installed_version(modpack_dir, version):
+    """
+    Escribe installed_version.txt de forma atómica: primero en un temporal
+    y luego os.replace, para que nunca quede a medias si el programa se cierra.
+    """
+    installed_version_path = os.path.join(modpack_dir, INSTALLED_VERSION_FILE)
+    tmp_path = temp_path(installed_version_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, installed_version_path)
+
+def load_optional_state(modpack_dir):
+    """
+    Lee qué niveles de contenido opcional están instalados:
+    {"version": versión del Full Pack, "installed": [nombres]}.
+    """
+    try:
+        with open(os.path.join(modpack_dir, OPTIONAL_STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": None, "installed": []}
+
+def installed_tiers(modpack_dir, version):
+    """Nombres de los niveles opcionales ya instalados del Full Pack 'version'."""
+    state = load_optional_state(modpack_dir)
+    return set(state.get("installed", [])) if state.get("version") == version else set()
+
+def save_optional_state(modpack_dir, version, installed):
+    """Guarda (de forma atómica) los niveles opcionales instalados del Full Pack 'version'."""
+    state_path = os.path.join(modpack_dir, OPTIONAL_STATE_FILE)
+    ensure_dir(modpack_dir)
+    tmp_path = temp_path(state_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": version, "installed": sorted(installed)}, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+def entry_tier(entry):
+    """Nivel de contenido de una entrada del manifest (TIER_REQUIRED si no indica 'tier')."""
+    return entry.get("tier") or TIER_REQUIRED
+
+def pack_tiers(pack_info):
+    """
+    Niveles opcionales de un Full Pack, por nombre: los archivos extra de su
+    lista 'optional' y las entradas de 'files' con un 'tier' distinto de
+    TIER_REQUIRED. Devuelve {nombre: {"archives": [...], "files": [...]}}.
+    Un archivo de 'optional' sin 'tier' forma su propio nivel (su 'filename').
+    """
+    tiers = {}
+    for archive in pack_info.get("optional", []):
+        name = archive.get("tier") or archive["filename"]
+        tiers.setdefault(name, {"archives": [], "files": []})["archives"].append(archive)
+    for entry in pack_info.get("files", []):
+        if entry_tier(entry) != TIER_REQUIRED:
+            tiers.setdefault(entry_tier(entry), {"archives": [], "files": []})["files"].append(entry)
+    return tiers
+
+class DownloadCancelled(Exception):
+    """Se lanza al cancelar una descarga; el archivo parcial se conserva para reanudarlo."""
+
+def load_download_state(dest_path):
+    """Lee el estado de una descarga a medias o devuelve None si no existe."""
+    state_path = dest_path + DOWNLOAD_STATE_SUFFIX
+    if os.path.isfile(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+    return None
+
+def save_download_state(dest_path, state):
+    """Guarda el estado de la descarga de forma atómica (archivo temporal + replace)."""
+    state_path = dest_path + DOWNLOAD_STATE_SUFFIX
+    tmp_path = temp_path(state_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def clear_download_state(dest_path):
+    state_path = dest_path + DOWNLOAD_STATE_SUFFIX
+    if os.path.isfile(state_path):
+        os.remove(state_path)
+
+def discard_download(dest_path):
+    """Elimina una descarga y su estado (p.e. si el hash no coincide)."""
+    clear_download_state(dest_path)
+    if os.path.isfile(dest_path):
+        os.remove(dest_path)
+
+# ---------------------------------------------------------
+# PLANIFICADOR DE ACTUALIZACIONES
+# ---------------------------------------------------------
+def parse_version(version):
+    """Convierte "0.31.1" en (0, 31, 1) para poder comparar versiones."""
+    return tuple(int(part) for part in version.split("."))
+
+class UpdatePlan:
+    """
+    Secuencia de pasos (Full Packs y parches) para pasar de 'current_version'
+    a 'target_version'. Cada paso es un dict con kind ("full"/"patch"), key
+    (clave en el manifest), version, size (bytes a descargar) e info.
+    """
+
+    def __init__(self, current_version, target_version, steps):
+        self.current_version = current_version
+        self.target_version  = target_version
+        self.steps           = steps
+
+    @property
+    def total_bytes(self):
+        return sum(step["size"] for step in self.steps)
+
+    def estimate_seconds(self, bytes_per_second=ESTIMATED_BANDWIDTH):
+        return self.total_bytes / bytes_per_second if bytes_per_second > 0 else 0
+
+    def describe(self, bytes_per_second=ESTIMATED_BANDWIDTH):
+        """Resumen legible del plan (una línea por paso)."""
+        if not self.steps:
+            return [f"No hay nada que instalar (versión {self.current_version or 'Ninguna'})."]
+        lines = [f"Plan de actualización {self.current_version or 'Ninguna'} -> {self.target_version}:"]
+        for index, step in enumerate(self.steps, 1):
+            kind = "Full Pack" if step["kind"] == "full" else "Parche"
+            lines.append(f"  {index}. {kind} {step['version']} ({step['key']}): "
+                         f"{step['size'] / (1024 * 1024):.1f} MB" + (" (estimado)" if step.get("estimated") else ""))
+        lines.append(f"Total: {self.total_bytes / (1024 * 1024):.1f} MB, "
+                     f"~{self.estimate_seconds(bytes_per_second):.0f} s a "
+                     f"{bytes_per_second / (1024 * 1024):.1f} MB/s.")
+        return lines
+
+    def to_dict(self):
+        return {
+            "currentVersion": self.current_version,
+            "targetVersion": self.target_version,
+            "totalBytes": self.total_bytes,
+            "steps": [{k: v for k, v in step.items() if k != "info"} for step in self.steps],
+        }
+
+def plan_update(manifest_data, current_version, sizes=None):
+    """
+    Calcula la forma más barata (en bytes descargados) de pasar de
+    'current_version' a 'latestVersion' combinando Full Packs y parches.
+
+    - Un Full Pack (claves "full*") se puede instalar desde cualquier versión
+      menor que la suya, o sin nada instalado.
+    - Un parche (claves "patch*") se aplica sobre su versión base ("from" en el
+      manifest o, si no existe, la versión publicada inmediatamente anterior)
+      o cualquier versión posterior a ella y menor que la del parche.
+
+    'sizes' permite indicar el tamaño de cada paso por clave cuando el manifest
+    no trae "size" (None si no se sabe). Un paso de tamaño desconocido cuenta
+    como el Full Pack más grande (lo peor razonable) y, a igual coste, se
+    prefieren los pasos de tamaño conocido. Si 'latestVersion' no es
+    alcanzable, se planifica hasta la versión más alta a la que sí se puede llegar.
+    """
+    sizes = sizes or {}
+    releases = [(key, info) for key, info in manifest_data.items()
+                if key.startswith(("full", "patch")) and isinstance(info, dict) and info.get("version")]
+    releases.sort(key=lambda item: parse_version(item[1]["version"]))
+    versions = sorted({info["version"] for _, info in releases}, key=parse_version)
+
+    edges = []  # (kind, key, info, base, target)
+    for key, info in releases:
+        target = info["version"]
+        if key.startswith("full"):
+            edges.append(("full", key, info, None, target))
+            continue
+        base = info.get("from")
+        if not base:
+            lower = [v for v in versions if parse_version(v) < parse_version(target)]
+            if not lower:
+                continue  # Un parche sin versión anterior no se puede aplicar
+            base = lower[-1]
+        edges.append(("patch", key, info, base, target))
+
+    def step_size(key, info):
+        size = sizes[key] if key in sizes else info.get("size")
+        return None if size is None else int(size)
+
+    unknown_size = max((step_size(key, info) or 0 for key, info in releases if key.startswith("full")), default=0)
+
+    def can_apply(edge, version):
+        kind, _, _, base, target = edge
+        if version is not None and parse_version(target) <= parse_version(version):
+            return False
+        if kind == "full":
+            return True
+        return version is not None and parse_version(version) >= parse_version(base)
+
+    # Dijkstra sobre las versiones: coste = bytes, desempate por pasos de
+    # tamaño desconocido y después por número de pasos
+    best = {current_version: (0, 0, 0)}
+    paths = {current_version: []}
+    heap = [(0, 0, 0, 0, current_version)]
+    counter = 1
+    while heap:
+        cost, unknown, count, _, version = heapq.heappop(heap)
+        if (cost, unknown, count) > best[version]:
+            continue
+        for edge in edges:
+            if not can_apply(edge, version):
+                continue
+            kind, key, info, _, target = edge
+            size = step_size(key, info)
+            step = {"kind": kind, "key": key, "version": target, "size": unknown_size if size is None else size,
+                    "info": info}
+            if size is None:
+                step["estimated"] = True
+            candidate = (cost + step["size"], unknown + (size is None), count + 1)
+            if target not in best or candidate < best[target]:
+                best[target] = candidate
+                paths[target] = paths[version] + [step]
+                heapq.heappush(heap, (*candidate, counter, target))
+                counter += 1
+
+    latest = manifest_data.get("latestVersion")
+    if latest in paths:
+        target = latest
+    else:
+        reachable = [v for v in paths if v is not None]
+        target = max(reachable, key=parse_version) if reachable else current_version
+    if current_version is not None and target is not None and parse_version(target) <= parse_version(current_version):
+        return UpdatePlan(current_version, current_version, [])
+    return UpdatePlan(current_version, target, paths.get(target, []))
+
+# ---------------------------------------------------------
+# CACHÉ DE DESCARGAS
+# ---------------------------------------------------------
+class BlobCache:
+    """
+    Caché local de archivos descargados, identificados por su sha256.
+    Guarda packs, parches y (con la lista 'files' del manifest) archivos sueltos
+    para reinstalar, reparar o volver a una versión anterior sin descargar.
+    Cuando supera 'max_bytes' se eliminan los archivos usados hace más tiempo
+    (la fecha de modificación de cada archivo hace de "último uso").
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir  = cache_dir
+        self.max_bytes  = max_bytes
+        self.lock       = threading.Lock()
+        self.total_size = None  # Se calcula la primera vez que hace falta
+
+    def path_for(self, sha256):
+        sha256 = sha256.lower()
+        return os.path.join(self.cache_dir, sha256[:2], sha256)
+
+    def get(self, sha256, verify=True):
+        """
+        Devuelve la ruta del archivo en caché (y lo marca como usado) o None.
+        Antes se comprueba su hash: un archivo dañado se elimina de la caché y
+        se descarga de nuevo, en lugar de instalarlo (e indexarlo) como bueno.
+        Sin 'verify' (LanCacheServer) no se comprueba: quien lo descarga ya
+        verifica el hash, y cada trozo de una descarga segmentada es una petición.
+        """
+        path = self.path_for(sha256)
+        if not os.path.isfile(path):
+            return None
+        if verify and calc_file_hash(path, HASH_ALGORITHM).lower() != sha256.lower():
+            self.discard(path)
+            return None
+        os.utime(path)
+        return path
+
+    def discard(self, path):
+        """Elimina un archivo de la caché."""
+        with self.lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                return  # Otro hilo ya lo eliminó
+            if self.total_size is not None:
+                self.total_size -= size
+
+    def put(self, src_path, sha256):
+        """
+        Mueve a la caché un archivo ya verificado y devuelve su nueva ruta.
+        Si el archivo no cabe en la caché, se deja donde está.
+        """
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return src_path
+        path = self.path_for(sha256)
+        ensure_dir(os.path.dirname(path))
+        with self.lock:
+            existed = os.path.isfile(path)
+            shutil.move(src_path, path)
+            os.utime(path)
+            if self.total_size is not None and not existed:
+                self.total_size += size
+        self.evict(keep=path)
+        return path
+
+    def contains(self, path):
+        return os.path.abspath(path).startswith(os.path.abspath(self.cache_dir) + os.sep)
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                st = os.stat(path)
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self, keep=None):
+        """Elimina los archivos menos usados hasta quedar dentro de 'max_bytes'."""
+        with self.lock:
+            if self.total_size is None:
+                self.total_size = sum(size for _, size, _ in self._entries())
+            if self.total_size <= self.max_bytes:
+                return
+            for _, size, path in sorted(self._entries()):
+                if self.total_size <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                os.remove(path)
+                self.total_size -= size
+
+def create_cache(settings):
+    """Crea la caché de descargas según user_settings.json (None si está desactivada)."""
+    max_gb = float(settings.get("cache_max_gb", CACHE_MAX_GB))
+    if max_gb <= 0:
+        return None
+    cache_dir = settings.get("cache_dir", DEFAULT_CACHE_DIR)
+    return BlobCache(cache_dir, int(max_gb * 1024 ** 3))
+
+# ---------------------------------------------------------
+# ALMACÉN COMPARTIDO ENTRE INSTANCIAS
+# ---------------------------------------------------------
+class ContentStore:
+    """
+    Almacén de archivos instalados, identificados por su sha256, compartido por
+    todas las instancias (carpetas .mxd02modpack) del equipo. Cada archivo de
+    una instancia es un enlace duro (o un reflink) al del almacén, así que dos
+    variantes con los mismos mods solo ocupan una vez en disco y la segunda
+    solo descarga lo que cambia. Si el sistema de archivos no admite enlaces,
+    se copia. Solo se guardan los tipos de STORE_EXTENSIONS: un enlace duro
+    también comparte las modificaciones, y el juego reescribe p.e. la configuración.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+
+    def path_for(self, sha256):
+        sha256 = sha256.lower()
+        return os.path.join(self.store_dir, sha256[:2], sha256)
+
+    def wants(self, path):
+        return path.lower().endswith(STORE_EXTENSIONS)
+
+    def get(self, sha256):
+        """Ruta del archivo en el almacén, o None."""
+        path = self.path_for(sha256)
+        return path if os.path.isfile(path) else None
+
+    def verified(self, sha256):
+        """
+        Ruta del archivo del almacén si su contenido coincide con 'sha256', o
+        None. Un enlace duro comparte también los daños: si se modificó el
+        archivo de una instancia, el del almacén ya no vale y se saca de él
+        (las instancias que lo enlazan conservan su copia hasta repararlas).
+        """
+        blob = self.get(sha256)
+        if not blob or calc_file_hash(blob, HASH_ALGORITHM).lower() == sha256.lower():
+            return blob
+        try:
+            os.remove(blob)
+        except FileNotFoundError:
+            pass  # Otra instancia lo acaba de sacar
+        return None
+
+    def adopt(self, path, sha256):
+        """
+        Añade al almacén un archivo ya instalado y verificado o, si ya estaba,
+        lo sustituye por un enlace al del almacén. Devuelve "linked" (comparte
+        el del almacén), "stored" (añadido) o "copied" (no se pudo enlazar).
+        Si el del almacén estaba dañado, se sustituye por 'path'.
+        """
+        blob = self.path_for(sha256)
+        if os.path.isfile(blob) and os.path.samefile(blob, path):
+            return "linked"
+        if self.verified(sha256):
+            return "linked" if link_file(blob, path) else "copied"
+        ensure_dir(os.path.dirname(blob))
+        tmp_path = temp_path(blob)
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copy2(path, tmp_path)  # Otro disco: el almacén guarda su propia copia
+        os.replace(tmp_path, blob)
+        return "stored"
+
+    def materialize(self, sha256, dest):
+        """
+        Coloca en 'dest' el archivo 'sha256' del almacén (enlace o copia).
+        Devuelve "linked", "copied" o None si no está en el almacén (o estaba dañado).
+        """
+        blob = self.verified(sha256)
+        if not blob:
+            return None
+        ensure_dir(os.path.dirname(dest))
+        if link_file(blob, dest):
+            return "linked"
+        replace_file(blob, dest)
+        return "copied"
+
+    def prune(self):
+        """
+        Elimina los archivos que ya no usa ninguna instancia (sin más enlaces
+        que el del almacén). Devuelve (archivos, bytes) liberados.
+        """
+        files = freed = 0
+        if not os.path.isdir(self.store_dir):
+            return files, freed
+        for prefix in os.listdir(self.store_dir):
+            prefix_dir = os.path.join(self.store_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                st = os.stat(path)
+                if st.st_nlink <= 1:
+                    os.remove(path)
+                    files += 1
+                    freed += st.st_size
+        return files, freed
+
+def create_store(settings):
+    """Crea el almacén compartido según user_settings.json (None si no está activado)."""
+    if not settings.get("shared_store"):
+        return None
+    return ContentStore(settings.get("store_dir", DEFAULT_STORE_DIR))
+
+# ---------------------------------------------------------
+# CACHÉ EN RED LOCAL
+# ---------------------------------------------------------
+class LanCacheServer:
+    """
+    Sirve por HTTP los archivos de una BlobCache a otros equipos de la red
+    local: GET/HEAD /blob/<sha256>, con soporte de Range para descargas
+    segmentadas y reanudables. Solo contiene archivos ya verificados, y quien
+    los descarga vuelve a comprobar el hash del manifest.
+    Además responde a los mensajes de descubrimiento UDP (LAN_DISCOVERY_MAGIC).
+    """
+
+    def __init__(self, cache, host="0.0.0.0", port=LAN_CACHE_PORT, discovery_port=LAN_DISCOVERY_PORT, log_func=None):
+        self.cache          = cache
+        self.host           = host
+        self.port           = port
+        self.discovery_port = discovery_port  # None = no responder a descubrimientos
+        self.log_func       = log_func
+        self.httpd          = None
+        self.udp            = None
+
+    def start(self):
+        """Arranca el servidor (y el descubrimiento) en hilos de fondo."""
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self.send_blob(head=True)
+
+            def do_GET(self):
+                self.send_blob(head=False)
+
+            def send_blob(self, head):
+                match = re.fullmatch(r"/blob/([0-9a-fA-F]{64})", self.path)
+                path = server.cache.get(match.group(1), verify=False) if match else None
+                if not path:
+                    self.send_error(404)
+                    return
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                range_match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if range_match:
+                    start = int(range_match.group(1))
+                    if range_match.group(2):
+                        end = int(range_match.group(2))
+                    if start >= size or end < start or end >= size:
+                        # Rango imposible: sin esto, Content-Length podría salir negativo
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", f'"{match.group(1).lower()}"')
+                self.end_headers()
+                if head:
+                    return
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    left = end - start + 1
+                    while left > 0:
+                        data = f.read(min(HASH_BUFFER_SIZE, left))
+                        if not data:
+                            break
+                        self.wfile.write(data)
+                        left -= len(data)
+                if server.log_func:
+                    server.log_func(f"Caché en red: enviado {match.group(1)[:12]}... a {self.client_address[0]}")
+
+            def log_message(self, format, *args):
+                pass  # Sin registro por petición
+
+        self.httpd = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]  # Por si se pidió el puerto 0
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+        if self.discovery_port is not None:
+            self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.udp.bind(("", self.discovery_port))
+            threading.Thread(target=self._answer_discovery, daemon=True).start()
+        if self.log_func:
+            self.log_func(f"Caché en red local activa en el puerto {self.port}.")
+        return self
+
+    def _answer_discovery(self):
+        while True:
+            try:
+                data, addr = self.udp.recvfrom(512)
+            except OSError:
+                return  # Socket cerrado (stop)
+            if data.strip() == LAN_DISCOVERY_MAGIC:
+                self.udp.sendto(b"MXD02-CACHE %d" % self.port, addr)
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        if self.udp:
+            self.udp.close()
+            self.udp = None
+
+def discover_lan_caches(port=LAN_DISCOVERY_PORT, timeout=1.0):
+    """
+    Busca servidores de caché en la red local con un broadcast UDP.
+    Devuelve sus URLs base (p.e. "http://192.168.1.20:8765").
+    """
+    found = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.settimeout(timeout)
+        for address in ("<broadcast>", "127.0.0.1"):  # También este mismo equipo
+            try:
+                sock.sendto(LAN_DISCOVERY_MAGIC, (address, port))
+            except OSError:
+                pass
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                data, addr = sock.recvfrom(512)
+            except (socket.timeout, OSError):
+                break
+            parts = data.split()
+            if len(parts) == 2 and parts[0] == b"MXD02-CACHE" and parts[1].isdigit():
+                url = f"http://{addr[0]}:{int(parts[1])}"
+                if url not in found:
+                    found.append(url)
+    finally:
+        sock.close()
+    return found
+
+def lan_cache_peers(settings):
+    """Servidores de caché en red configurados en user_settings.json ('lan_cache_peers')."""
+    return [url.rstrip("/") for url in settings.get("lan_cache_peers", [])]
+
+# ---------------------------------------------------------
+# DIARIO DE INSTALACIÓN
+# ---------------------------------------------------------
+class InstallJournal:
+    """
+    Diario de una actualización en curso (JOURNAL_FILE). Cada fase terminada
+    de cada paso del plan (descargado, eliminaciones, extraído, deltas...) se
+    anota en disco antes de empezar la siguiente. Si el programa se cierra a
+    mitad, la siguiente ejecución del mismo plan continúa desde la última fase
+    anotada en lugar de empezar de cero.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+
+    def load(self):
+        """Devuelve el diario guardado en disco o None."""
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return None
+
+    def begin(self, plan):
+        """
+        Empieza el diario de 'plan' o continúa el anterior si era el mismo plan
+        (misma versión de origen, de destino y mismos pasos). Devuelve True si continúa.
+        """
+        keys = [step["key"] for step in plan.steps]
+        saved = self.load()
+        if (saved and saved.get("from") == plan.current_version and saved.get("target") == plan.target_version
+                and saved.get("keys") == keys):
+            self.data = saved
+            return True
+        self.data = {
+            "from": plan.current_version,
+            "target": plan.target_version,
+            "keys": keys,
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "steps": {key: {} for key in keys},
+        }
+        self._save()
+        return False
+
+    def get(self, key, phase):
+        with self.lock:
+            return self.data["steps"].get(key, {}).get(phase) if self.data else None
+
+    def done(self, key, phase, **info):
+        """Anota que la fase 'phase' del paso 'key' ha terminado."""
+        with self.lock:
+            self.data["steps"].setdefault(key, {})[phase] = info or True
+            self._save()
+
+    def finish(self):
+        """La actualización terminó: el diario ya no hace falta."""
+        with self.lock:
+            self.data = None
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+
+    def _save(self):
+        ensure_dir(os.path.dirname(self.path))
+        tmp_path = temp_path(self.path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+# ---------------------------------------------------------
+# ÍNDICE DE ARCHIVOS INSTALADOS
+# ---------------------------------------------------------
+class FileIndex:
+    """
+    Índice SQLite con cada archivo que coloca el instalador: ruta, tamaño,
+    fecha de modificación (ns), inodo, sha256 y versión que lo instaló.
+    Si el inodo, el tamaño y la fecha de un archivo coinciden con el índice,
+    se da por bueno sin volver a calcular su hash.
+    """
+
+    def __init__(self, db_path):
+        ensure_dir(os.path.dirname(db_path))
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS files (
+            path     TEXT PRIMARY KEY,
+            size     INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256   TEXT NOT NULL,
+            version  TEXT,
+            inode    INTEGER)""")
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(files)")]
+        if "inode" not in columns:  # Índices creados por versiones anteriores
+            self.db.execute("ALTER TABLE files ADD COLUMN inode INTEGER")
+
+    def record(self, path, sha256, version=None):
+        """Guarda el estado actual de 'path'. Sin 'version' se conserva la que ya tuviera."""
+        st = os.stat(path)
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO files (path, size, mtime_ns, sha256, version, inode) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "sha256 = excluded.sha256, version = COALESCE(excluded.version, files.version), "
+                "inode = excluded.inode",
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns, sha256.lower(), version, st.st_ino))
+
+    def forget(self, path):
+        """Quita del índice 'path' y, si es una carpeta, todo lo que contiene."""
+        path = os.path.abspath(path)
+        prefix = path + os.sep
+        with self.lock:
+            self.db.execute("DELETE FROM files WHERE path = ? OR substr(path, 1, ?) = ?",
+                            (path, len(prefix), prefix))
+
+    def lookup(self, path):
+        """Devuelve (size, mtime_ns, sha256, version, inode) de 'path' o None."""
+        with self.lock:
+            return self.db.execute("SELECT size, mtime_ns, sha256, version, inode FROM files WHERE path = ?",
+                                   (os.path.abspath(path),)).fetchone()
+
+    def matches(self, path, expected_hash=None):
+        """True si 'path' no ha cambiado desde que se indexó (y tiene el hash esperado)."""
+        row = self.lookup(path)
+        if not row or (expected_hash and row[2] != expected_hash.lower()):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if row[4] is not None and st.st_ino != row[4]:
+            return False  # Otro archivo con el mismo nombre (p.e. reemplazado por copia)
+        return st.st_size == row[0] and st.st_mtime_ns == row[1]
+
+    def rows(self):
+        with self.lock:
+            return self.db.execute("SELECT path, size, mtime_ns, sha256, version FROM files").fetchall()
+
+    def changed(self):
+        """Rutas indexadas que faltan o cuyo tamaño/fecha ya no coinciden (sin calcular hashes)."""
+        result = []
+        for path, size, mtime_ns, _, _ in self.rows():
+            try:
+                st = os.stat(path)
+            except OSError:
+                result.append(path)
+                continue
+            if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                result.append(path)
+        return result
+
+    def orphans(self, root):
+        """
+        Archivos dentro de 'root' que el instalador no colocó. Solo se revisan
+        las subcarpetas con archivos indexados (mods, config...), para no
+        marcar como huérfanos los mundos, capturas u opciones del jugador.
+        """
+        root = os.path.abspath(root)
+        indexed = {path for path, _, _, _, _ in self.rows()}
+        top_dirs = set()
+        for path in indexed:
+            rel = os.path.relpath(path, root)
+            if not rel.startswith(os.pardir) and os.sep in rel:
+                top_dirs.add(rel.split(os.sep, 1)[0])
+        result = []
+        for top in sorted(top_dirs):
+            for dirpath, _, filenames in os.walk(os.path.join(root, top)):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if path not in indexed and not name.endswith(".mxd02tmp"):
+                        result.append(path)
+        return result
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+# ---------------------------------------------------------
+# REGISTRO (LOG) Y PROGRESO
+# ---------------------------------------------------------
+class EventSink:
+    """
+    Recoge los mensajes de log y el progreso de un hilo de trabajo sin cruzar
+    de hilo en cada evento: el hilo solo los deja en un búfer y la ventana los
+    recoge en bloque con drain() unas LOG_FLUSH_HZ veces por segundo.
+    En pantalla solo se guardan las últimas 'max_lines' líneas; el log completo
+    se escribe en 'log_path' desde un hilo aparte para no frenar la instalación.
+    """
+    def __init__(self, log_path=None, max_lines=LOG_MAX_LINES):
+        self.lock = threading.Lock()
+        self.lines = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.progress_value = None
+        self.log_path = log_path
+        self.file_queue = Queue()
+        self.writer = None
+        if log_path:
+            self.writer = threading.Thread(target=self._write_log_file, daemon=True)
+            self.writer.start()
+
+    def log(self, message):
+        with self.lock:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            self.lines.append(message)
+        if self.writer:
+            self.file_queue.put(f"[{datetime.now():%H:%M:%S}] {message}\n")
+
+    def progress(self, value):
+        with self.lock:
+            self.progress_value = value
+
+    def drain(self):
+        """Devuelve (líneas nuevas, último progreso o None) y vacía el búfer."""
+        with self.lock:
+            lines = list(self.lines)
+            if self.dropped:
+                lines.insert(0, f"... ({self.dropped} líneas omitidas, ver {self.log_path or 'el log'})")
+            self.lines.clear()
+            self.dropped = 0
+            value, self.progress_value = self.progress_value, None
+        return lines, value
+
+    def close(self):
+        """Termina de escribir el archivo de log."""
+        if self.writer:
+            self.file_queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def _write_log_file(self):
+        try:
+            ensure_dir(os.path.dirname(self.log_path))
+            f = open(self.log_path, 'w', encoding='utf-8')
+        except OSError:
+            f = None  # Sin archivo de log: se sigue mostrando en pantalla
+        while True:
+            text = self.file_queue.get()
+            if text is None:
+                break
+            if f:
+                f.write(text)
+                if self.file_queue.empty():
+                    f.flush()
+        if f:
+            f.close()
+
+# ---------------------------------------------------------
+# INFORME DE TIEMPOS
+# ---------------------------------------------------------
+class RunReport:
+    """
+    Tiempos de cada fase de una ejecución (manifest, descarga, hash,
+    extracción, copia por destino, eliminaciones, índice, perfil...) con sus
+    bytes, archivos y velocidad. Cada fase terminada se pasa a 'callback' (si
+    se indica) y el informe completo se guarda como JSON con save().
+    Algunas fases se solapan (las descargas adelantadas ocurren durante la
+    extracción del paso anterior): 'start' indica cuándo empezó cada una.
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.clock = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, **fields):
+        """
+        Mide el bloque 'with' como una fase. El dict que devuelve se puede
+        completar dentro del bloque (p.e. record["bytes"] += n).
+        """
+        record = {"phase": name, "bytes": 0, "files": 0}
+        record.update(fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record["failed"] = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            record["start"] = round(start - self.clock, 4)
+            record["seconds"] = round(seconds, 4)
+            if seconds > 0 and record["bytes"]:
+                record["mbPerSecond"] = round(record["bytes"] / (1024 * 1024) / seconds, 2)
+            if seconds > 0 and record["files"]:
+                record["filesPerSecond"] = round(record["files"] / seconds, 1)
+            with self.lock:
+                self.phases.append(record)
+            if self.callback:
+                self.callback(dict(record))
+
+    def totals(self):
+        """Suma por nombre de fase: veces, segundos, bytes y archivos."""
+        totals = {}
+        with self.lock:
+            for record in self.phases:
+                total = totals.setdefault(record["phase"], {"count": 0, "seconds": 0.0, "bytes": 0, "files": 0})
+                total["count"] += 1
+                total["seconds"] = round(total["seconds"] + record["seconds"], 4)
+                total["bytes"] += record["bytes"]
+                total["files"] += record["files"]
+        for total in totals.values():
+            if total["seconds"] > 0 and total["bytes"]:
+                total["mbPerSecond"] = round(total["bytes"] / (1024 * 1024) / total["seconds"], 2)
+        return totals
+
+    def summary(self):
+        """Líneas de texto con el total de cada fase, para el log."""
+        lines = []
+        for name, total in self.totals().items():
+            line = f"  {name}: {total['seconds']:.2f} s"
+            if total["bytes"]:
+                line += f", {total['bytes'] / (1024 * 1024):.1f} MB ({total.get('mbPerSecond', 0):.1f} MB/s)"
+            if total["files"]:
+                line += f", {total['files']} archivos"
+            lines.append(line)
+        return lines
+
+    def to_dict(self, **extra):
+        with self.lock:
+            phases = list(self.phases)
+        data = {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self.clock, 4),
+        }
+        data.update(extra)
+        data["totals"] = self.totals()
+        data["phases"] = phases
+        return data
+
+    def save(self, path, **extra):
+        """Guarda el informe en 'path' (de forma atómica)."""
+        ensure_dir(os.path.dirname(path))
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(**extra), f, indent=2)
+        os.replace(tmp_path, path)
+
+# ---------------------------------------------------------
+# MOTOR DE ACTUALIZACIÓN
+# ---------------------------------------------------------
+class ModpackUpdater:
+    """
+    Realiza la actualización con "Full" o "Patch" según el manifest.
+    No depende de Qt: la ventana lo ejecuta dentro de un QThread (UpdateWorker)
+    y la línea de comandos directamente. El log y el progreso se dejan en
+    self.events (EventSink), que quien lo ejecuta recoge periódicamente.
+    """
+
+    def __init__(self, manifest_url, modpack_dir, forge_versions_dir, minecraft_dir, user_ram,
+                 connections=DOWNLOAD_CONNECTIONS, cache=None, events=None, lan_peers=None, lan_discover=False,
+                 on_phase=None, extract_threads=EXTRACT_THREADS, defer_optional=False, store=None,
+                 instance_name=None):
+        self.manifest_url       = manifest_url
+        self.modpack_dir        = modpack_dir
+        self.forge_versions_dir = forge_versions_dir
+        self.minecraft_dir      = minecraft_dir
+        self.user_ram           = user_ram  # e.g. "4" o "6" (GB), o RAM_AUTO
+        self.connections        = max(1, int(connections))  # Conexiones por descarga
+        self.extract_threads    = max(1, int(extract_threads))  # Hilos que escriben archivos al extraer
+        self.session            = create_session(self.connections * 2)  # Keep-alive para todo el proceso
+        self.mirror_scores      = {}  # Servidor -> segundos estimados por MB (ver rank_mirrors)
+        self.mirror_lock        = threading.Lock()
+        self.lan_peers          = list(lan_peers or [])  # Servidores de caché en red local
+        self.lan_discover       = lan_discover  # Buscar más servidores con broadcast (una vez)
+        self.lan_checked        = set()  # Servidores de caché en red ya comprobados (ver get_lan_peers)
+        self.cache              = cache  # BlobCache o None
+        self.store              = store  # ContentStore compartido entre instancias, o None
+        self.instance_name      = instance_name  # Nombre del perfil (ver instance_profile)
+        self.cancelled          = False
+        self.events             = events or EventSink(os.path.join(modpack_dir, LOG_FILE))
+        self.index              = None  # FileIndex, se abre al instalar o verificar
+        self.index_version      = None  # Versión que se está instalando (para el índice)
+        self.journal            = None  # InstallJournal mientras se ejecuta un plan
+        self.report             = RunReport(on_phase)  # Tiempos de cada fase (on_phase recibe cada una)
+        self.defer_optional     = defer_optional  # Dejar el contenido opcional para install_optional()
+        self.optional_pending   = []  # Niveles opcionales que faltan al terminar update()
+
+    def update(self):
+        """
+        Lleva la instalación a la última versión del manifest.
+        Devuelve (error, info): info es la versión instalada o el mensaje de error.
+        """
+        result = {"error": True, "info": None}
+        try:
+            # 1. Descargar manifest
+            self.log("Descargando manifest...")
+            with self.report.phase("manifest"):
+                manifest_data = self.download_json(self.manifest_url)
+            if not manifest_data:
+                raise Exception("No se pudo obtener el manifest o está vacío.")
+
+            latest_version = manifest_data.get("latestVersion")
+            has_full = any(key.startswith("full") and isinstance(info, dict) and "version" in info
+                           for key, info in manifest_data.items())
+
+            if not latest_version or not has_full:
+                raise Exception("El manifest no contiene la sección 'full' adecuada o 'latestVersion'.")
+
+            # 2. Leer versión instalada (si existe)
+            current_version = read_installed_version(self.modpack_dir)
+
+            self.log(f"Versión instalada: {current_version if current_version else 'Ninguna'}")
+            self.log(f"Última versión disponible: {latest_version}")
+
+            # 3. Si ya está en la última versión => mostrar mensaje y salir
+            if current_version == latest_version:
+                self.log("Ya tienes la última versión instalada. No es necesario actualizar.")
+                self.optional_pending = sorted(self.pending_optional(manifest_data))
+                result.update(error=False, info=latest_version)
+                return False, f"{latest_version} (ya instalado)"
+
+            # 4. Calcular el camino más barato (Full Pack y/o parches) y mostrarlo
+            with self.report.phase("plan"):
+                plan = self.build_plan(manifest_data, current_version)
+            for line in plan.describe():
+                self.log(line)
+            if plan.target_version != latest_version:
+                self.log(f"AVISO: no hay forma de llegar a {latest_version}; se instalará {plan.target_version}.")
+
+            # 5. Los parches suponen el contenido opcional de la versión actual instalado
+            if plan.steps and plan.steps[0]["kind"] == "patch":
+                self.complete_optional(manifest_data, current_version)
+
+            # 6. Ejecutar los pasos en orden (con descargas adelantadas)
+            self.execute_plan(plan)
+            if plan.steps and plan.steps[-1]["kind"] == "patch":
+                # Los parches actualizan todo lo instalado, también el contenido opcional
+                full_info = self.find_full_pack(manifest_data, plan.target_version)
+                if full_info:
+                    save_optional_state(self.modpack_dir, plan.target_version, pack_tiers(full_info))
+            self.optional_pending = sorted(self.pending_optional(manifest_data))
+
+            # 7. Finalización
+            result.update(error=False, info=plan.target_version or latest_version)
+            return False, plan.target_version or latest_version
+
+        except Exception as e:
+            self.log(f"ERROR: {e}")
+            result["info"] = str(e)
+            return True, str(e)
+        finally:
+            self.save_report(**result)
+            self.close()
+
+    def save_report(self, **extra):
+        """Guarda el informe de tiempos en RUN_REPORT_FILE y resume cada fase en el log."""
+        self.log("Tiempo por fase:")
+        for line in self.report.summary():
+            self.log(line)
+        try:
+            self.report.save(os.path.join(self.modpack_dir, RUN_REPORT_FILE), **extra)
+        except OSError as e:
+            self.log(f"No se pudo guardar el informe de tiempos: {e}")
+
+    def phase_done(self, key, phase):
+        """Lo anotado en el diario para la fase 'phase' del paso 'key' (None si no terminó)."""
+        return self.journal.get(key, phase) if self.journal and key else None
+
+    def mark_phase(self, key, phase, **info):
+        if self.journal and key:
+            self.journal.done(key, phase, **info)
+
+    def pending_journal(self):
+        """Diario de una actualización que quedó a medias en esta carpeta, o None."""
+        return InstallJournal(os.path.join(self.modpack_dir, JOURNAL_FILE)).load()
+
+    def open_index(self):
+        """Abre (si hace falta) el índice de archivos instalados de esta carpeta."""
+        if self.index is None:
+            self.index = FileIndex(os.path.join(self.modpack_dir, INDEX_FILE))
+        return self.index
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        self.session.close()
+
+    def index_file(self, path, sha256):
+        """Anota en el índice un archivo recién colocado por la versión que se instala."""
+        self.open_index().record(path, sha256, self.index_version)
+
+    def file_is_current(self, path, size=None, expected_hash=None):
+        """
+        Como file_matches, pero si el archivo no ha cambiado desde que se indexó
+        no se vuelve a calcular su hash. Los que se comprueban leyéndolos se
+        añaden al índice para la próxima vez.
+        """
+        index = self.open_index()
+        if expected_hash and index.matches(path, expected_hash):
+            return True
+        if not file_matches(path, size, expected_hash):
+            return False
+        if expected_hash:
+            index.record(path, expected_hash)
+        return True
+
+    def index_status(self):
+        """Resumen del índice comparando solo tamaño y fecha (sin leer los archivos)."""
+        index = self.open_index()
+        return {
+            "indexedFiles": len(index.rows()),
+            "changedFiles": index.changed(),
+            "orphanFiles": index.orphans(self.modpack_dir),
+        }
+
+    def is_version_greater(self, v1, v2):
+        """Compara strings de versión (p.e. "0.31.1" > "0.31")."""
+        return parse_version(v1) > parse_version(v2)
+
+    def build_plan(self, manifest_data, current_version):
+        """
+        Calcula el plan de actualización. Los pasos sin "size" en el manifest se
+        estiman: para Full Packs con lista 'files', lo que falta en disco; para
+        el resto, el tamaño que informa el servidor.
+        """
+        sizes = {}
+        for key, info in manifest_data.items():
+            if (not key.startswith(("full", "patch")) or not isinstance(info, dict) or "size" in info
+                    or not info.get("version")):
+                continue  # Sin "version" tampoco entra en el plan (ver plan_update)
+            if current_version and parse_version(info["version"]) <= parse_version(current_version):
+                continue  # No puede formar parte del plan
+            if info.get("files"):
+                sizes[key] = self.estimate_sync_bytes(info)
+            else:
+                urls = entry_urls(info)
+                size = self._probe_download(urls[0])["total"] if urls else 0
+                # Si el servidor no dice el tamaño, queda desconocido (no gratis)
+                sizes[key] = None if size is None else size + sum(int(delta.get("size", 0))
+                                                                  for delta in info.get("deltas", []))
+        return plan_update(manifest_data, current_version, sizes)
+
+    def execute_plan(self, plan):
+        """
+        Ejecuta los pasos del plan en orden. Mientras se instala un paso, se
+        descargan por adelantado hasta PIPELINE_LOOKAHEAD pasos siguientes, para
+        que la red no quede parada durante la extracción ni el disco durante
+        las descargas. Solo se adelanta la descarga: las eliminaciones
+        (filesToRemove/dirToRemove) y la extracción de cada paso siguen
+        ocurriendo estrictamente en orden.
+        Los Full Packs con lista 'files' no se adelantan, porque lo que hay que
+        descargar depende del estado del disco al instalarlos.
+
+        Con 'defer_optional', el contenido opcional del Full Pack del último paso
+        no se instala: queda para install_optional() (ver install_full).
+
+        Cada fase terminada se anota en el diario (InstallJournal): si el plan
+        se interrumpe, la siguiente ejecución continúa donde se quedó.
+        installed_version.txt solo se escribe al final, de forma atómica.
+        """
+        steps = plan.steps
+        futures = {}
+        prefetcher = ThreadPoolExecutor(max_workers=1)
+        self.journal = InstallJournal(os.path.join(self.modpack_dir, JOURNAL_FILE))
+        if self.journal.begin(plan):
+            self.log("Continuando la actualización interrumpida anteriormente...")
+
+        def schedule(index):
+            if index >= len(steps) or index in futures:
+                return
+            step = steps[index]
+            info = step["info"]
+            if self.phase_done(step["key"], "extracted") or self.phase_done(step["key"], "committed"):
+                return  # Ya no hace falta su archivo
+            if info.get("url") and not info.get("files"):
+                futures[index] = prefetcher.submit(self.fetch_pack, info,
+                                                   "Full Pack" if step["kind"] == "full" else "Parche", step["key"])
+
+        try:
+            for index, step in enumerate(steps):
+                if self.cancelled:
+                    raise Exception("Operación cancelada.")
+                if self.phase_done(step["key"], "committed"):
+                    self.log(f"{step['key']} ({step['version']}) ya se aplicó antes de la interrupción.")
+                    continue
+                for ahead in range(index, index + PIPELINE_LOOKAHEAD + 1):
+                    schedule(ahead)
+                archive_path = futures.pop(index).result() if index in futures else None
+                if step["kind"] == "full":
+                    # Solo se deja el contenido opcional para después si no hay parches detrás
+                    self.install_full(step["info"], archive_path, step["key"],
+                                      defer_optional=self.defer_optional and index == len(steps) - 1)
+                else:
+                    self.log(f"Aplicando {step['key']} para actualizar a la versión {step['version']}...")
+                    self.install_patch(step["info"], archive_path, step["key"])
+                self.mark_phase(step["key"], "committed")
+
+            # Todos los pasos terminaron: se marca la nueva versión de una sola vez
+            if steps:
+                write_installed_version(self.modpack_dir, plan.target_version)
+            self.journal.finish()
+        except Exception:
+            # Se detienen las descargas adelantadas (quedan guardadas para reanudarlas)
+            self.cancelled = True
+            raise
+        finally:
+            for future in futures.values():
+                future.cancel()
+            prefetcher.shutdown(wait=True)
+            self.journal = None
+
+    def fetch_pack(self, pack_info, label, key=None):
+        """
+        Descarga (o toma de la caché) el archivo de un Full Pack o parche.
+        Devuelve None si el parche no trae archivo (p.e. solo 'deltas').
+        Si el diario indica que ya se descargó y verificó, y el archivo sigue
+        igual (tamaño y fecha), no se vuelve a comprobar su hash.
+        """
+        if not pack_info.get("url"):
+            return None
+        saved = self.phase_done(key, "downloaded")
+        if saved and os.path.isfile(saved["path"]):
+            st = os.stat(saved["path"])
+            if st.st_size == saved["size"] and st.st_mtime_ns == saved["mtimeNs"]:
+                self.log(f"{pack_info['filename']} ya estaba descargado y verificado.")
+                return saved["path"]
+        with self.report.phase("download", file=pack_info["filename"]) as record:
+            archive_path = self.download_file_with_retries(entry_urls(pack_info), pack_info["filename"],
+                                                           pack_info.get("hash"))
+            if not archive_path:
+                raise Exception(f"No se pudo descargar o verificar el {label}.")
+            st = os.stat(archive_path)
+            record.update(bytes=st.st_size, files=1)
+        self.mark_phase(key, "downloaded", path=archive_path, size=st.st_size, mtimeNs=st.st_mtime_ns)
+        return archive_path
+
+    def estimate_sync_bytes(self, pack_info):
+        """Bytes que faltan según la lista 'files' (solo compara tamaños, sin hashes)."""
+        total = 0
+        for entry in pack_info["files"]:
+            dest = self.resolve_pack_path(entry["path"])
+            size = int(entry.get("size", 0))
+            if self.uses_store(dest or "") and self.store.get(entry.get("sha256", "")):
+                continue  # Se enlaza desde el almacén compartido, sin descargar
+            if dest and (not os.path.isfile(dest) or os.path.getsize(dest) != size):
+                total += size
+        return total
+
+    def download_json(self, url):
+        """
+        Descarga y parsea el manifest con reintentos. Se comparte la copia local
+        con la comprobación de inicio (ver fetch_manifest): si no ha cambiado,
+        el servidor solo responde 304.
+        """
+        for attempt in range(MAX_DOWNLOAD_RETRIES):
+            if self.cancelled:
+                return None
+            try:
+                return fetch_manifest(url, self.modpack_dir, session=self.session)
+            except Exception as e:
+                self.log(f"Fallo al descargar manifest (intento {attempt+1}/{MAX_DOWNLOAD_RETRIES}): {e}")
+        cached = load_cached_manifest(self.modpack_dir, url)
+        if cached:
+            self.log("Usando la copia local del manifest.")
+            return cached["data"]
+        return None
+
+    def install_full(self, full_info, archive_path=None, key=None, defer_optional=False):
+        """
+        Descarga e instala la versión Full.
+        'archive_path' permite pasar el pack ya descargado (ver execute_plan).
+        'key' es la clave del paso en el diario; las fases ya anotadas se saltan.
+        Primero se instala el contenido imprescindible (TIER_REQUIRED) y se
+        escribe el perfil del launcher; después, los niveles opcionales (ver
+        pack_tiers), salvo con 'defer_optional', que los deja para install_optional().
+        """
+        version = full_info["version"]
+        self.index_version = version
+        tiers = pack_tiers(full_info)
+        if not self.phase_done(key, "extracted"):
+            save_optional_state(self.modpack_dir, version, [])
+
+        self.log(f"Instalando Full Pack {version}...")
+
+        # Si el manifest lista cada archivo, solo se descarga lo que falta o cambió
+        if full_info.get("files"):
+            self.sync_files(full_info, [entry for entry in full_info["files"] if entry_tier(entry) == TIER_REQUIRED])
+            self.finish_full_install(version)
+            self.finish_optional(full_info, tiers, defer_optional)
+            self.log(f"Instalación Full Pack {version} completada.")
+            return
+
+        if self.phase_done(key, "extracted"):
+            self.log("El Full Pack ya se había descomprimido.")
+            # Solo queda borrar el archivo descargado (si sigue ahí)
+            archive_path = archive_path or (self.phase_done(key, "downloaded") or {}).get("path")
+        else:
+            # 1. Descargar el ZIP (con reintentos), salvo que ya venga descargado
+            if not archive_path:
+                archive_path = self.fetch_pack(full_info, "Full Pack", key)
+
+            # 2-6. Descomprimir directamente en .mxd02modpack, versions y libraries
+            self.log("Descomprimiendo Full Pack...")
+            self.install_archive(archive_path, "_temp_full_", "Full Pack", pack_format(full_info))
+            self.mark_phase(key, "extracted")
+
+        # 7 y 8. Índice y perfil del launcher
+        self.finish_full_install(version)
+
+        # Limpieza final
+        if archive_path:
+            self.release_download(archive_path)
+
+        # 9. Contenido opcional (ahora o en segundo plano)
+        self.finish_optional(full_info, tiers, defer_optional)
+
+        self.log(f"Instalación Full Pack {version} completada.")
+
+    def finish_optional(self, full_info, tiers, defer_optional):
+        """Instala los niveles opcionales de un Full Pack recién instalado, o avisa de que quedan pendientes."""
+        if not tiers:
+            return
+        if defer_optional:
+            self.log(f"El perfil ya está listo. Contenido opcional pendiente ({', '.join(sorted(tiers))}): "
+                     "se descargará en segundo plano.")
+        else:
+            self.install_tiers(full_info, tiers)
+
+    def find_full_pack(self, manifest_data, version):
+        """Devuelve la entrada 'full*' de 'version', o None."""
+        for key, info in manifest_data.items():
+            if key.startswith("full") and isinstance(info, dict) and info.get("version") == version:
+                return info
+        return None
+
+    def pending_optional(self, manifest_data, version=None):
+        """
+        Niveles opcionales (ver pack_tiers) del Full Pack de 'version' (por
+        defecto la instalada) que aún no se han instalado, por nombre.
+        """
+        version = version or read_installed_version(self.modpack_dir)
+        full_info = self.find_full_pack(manifest_data, version) if version else None
+        if not full_info:
+            return {}
+        installed = installed_tiers(self.modpack_dir, version)
+        return {name: tier for name, tier in pack_tiers(full_info).items() if name not in installed}
+
+    def complete_optional(self, manifest_data, version):
+        """Instala lo que falte del contenido opcional de 'version' antes de aplicarle parches."""
+        pending = self.pending_optional(manifest_data, version)
+        if pending:
+            self.log("Completando el contenido opcional pendiente antes de aplicar los parches...")
+            self.index_version = version
+            self.install_tiers(self.find_full_pack(manifest_data, version), pending)
+
+    def install_tiers(self, full_info, tiers):
+        """
+        Instala los niveles opcionales 'tiers' de un Full Pack: sus archivos extra
+        y sus entradas de la lista 'files'. Cada nivel terminado se anota en
+        OPTIONAL_STATE_FILE, así que si se interrumpe solo se repite el que quedó a medias.
+        """
+        version = full_info["version"]
+        for name, tier in sorted(tiers.items()):
+            if self.cancelled:
+                raise Exception("Operación cancelada.")
+            self.log(f"Instalando contenido opcional '{name}'...")
+            for archive in tier["archives"]:
+                archive_path = self.fetch_pack(archive, f"contenido opcional '{name}'")
+                self.install_archive(archive_path, "_temp_optional_", f"contenido opcional '{name}'",
+                                     pack_format(archive))
+                self.release_download(archive_path)
+            if tier["files"]:
+                self.sync_files(full_info, tier["files"])
+            with self.report.phase("index"):
+                self.open_index().commit()
+            save_optional_state(self.modpack_dir, version, installed_tiers(self.modpack_dir, version) | {name})
+
+    def install_optional(self):
+        """
+        Instala el contenido opcional que falta de la versión instalada (lo que
+        update() con 'defer_optional' dejó pendiente). Pensado para ejecutarse
+        en segundo plano, con pocas conexiones, mientras ya se puede jugar.
+        Devuelve (error, info) como update().
+        """
+        try:
+            manifest_data = self.download_json(self.manifest_url)
+            if not manifest_data:
+                raise Exception("No se pudo obtener el manifest o está vacío.")
+            version = read_installed_version(self.modpack_dir)
+            pending = self.pending_optional(manifest_data, version)
+            if not pending:
+                self.log("No hay contenido opcional pendiente.")
+                return False, "sin contenido opcional pendiente"
+            self.index_version = version
+            self.install_tiers(self.find_full_pack(manifest_data, version), pending)
+            self.log("Contenido opcional instalado.")
+            return False, ", ".join(sorted(pending))
+        except Exception as e:
+            self.log(f"ERROR: {e}")
+            return True, str(e)
+        finally:
+            self.close()
+
+    def finish_full_install(self, version):
+        """
+        Guarda el índice y crea/actualiza el perfil del launcher.
+        (installed_version.txt lo escribe execute_plan al terminar todo el plan)
+        """
+        # 7. Guardar el índice de archivos instalados
+        with self.report.phase("index"):
+            self.open_index().commit()
+
+        # 8. (Opcional) Agregar/actualizar perfil en launcher_profiles.json
+        self.write_profile(complete=True)
+
+    def jvm_tuning(self):
+        """Argumentos de Java para la RAM elegida, este equipo y los mods instalados (ver mxd02_jvm.py)."""
+        return tune_jvm(self.user_ram, count_installed_mods(self.modpack_dir, self.index))
+
+    def profile_data(self, java_args):
+        """JSON completo del perfil del launcher de esta instancia."""
+        _, name = instance_profile(self.modpack_dir, self.instance_name)
+        return {
+            "created": "2024-12-30T05:01:57.789Z",
+            "gameDir": self.modpack_dir,
+            "icon": "Furnace_On",
+            "javaArgs": java_args,
+            "lastUsed": datetime.utcnow().isoformat() + "Z",
+            "lastVersionId": "1.19.2-forge-43.4.0",
+            "name": name,
+            "type": "custom"
+        }
+
+    def write_profile(self, complete):
+        """
+        Crea/actualiza el perfil de esta instancia (ver instance_profile).
+        Sin 'complete' (parches) solo se actualizan lastUsed y javaArgs, salvo
+        los campos que el perfil aún no tenga.
+        """
+        launcher_profiles_path = os.path.join(self.minecraft_dir, "launcher_profiles.json")
+        profile_id, _ = instance_profile(self.modpack_dir, self.instance_name)
+        tuning = self.jvm_tuning()
+        for line in describe_tuning(tuning):
+            self.log(line)
+        profile_data = self.profile_data(tuning["javaArgs"])
+        defaults = {}
+        if not complete:
+            defaults = {key: value for key, value in profile_data.items() if key not in ("lastUsed", "javaArgs")}
+            profile_data = {"lastUsed": profile_data["lastUsed"], "javaArgs": profile_data["javaArgs"]}
+        with self.report.phase("profile"):
+            add_or_update_profile(launcher_profiles_path, profile_id, profile_data, logger=self.log,
+                                  defaults=defaults)
+
+    def find_file_list(self, manifest_data, version):
+        """Devuelve la entrada 'full*' de 'version' que trae lista 'files', o None."""
+        info = self.find_full_pack(manifest_data, version)
+        return info if info and info.get("files") else None
+
+    def verify(self, manifest_data, repair=False, full=False):
+        """
+        Comprueba los archivos instalados contra la lista 'files' de la versión
+        instalada, calculando hashes en VERIFY_THREADS hilos (hashlib libera el
+        GIL). Los archivos sin cambios según el índice no se leen, salvo con
+        'full'. Con 'repair' se vuelven a descargar los que faltan o no coinciden.
+        Devuelve un dict con las rutas erróneas, las reparadas y la velocidad.
+        """
+        version = read_installed_version(self.modpack_dir)
+        if not version:
+            raise Exception("No hay ninguna versión instalada.")
+        pack_info = self.find_file_list(manifest_data, version)
+        if not pack_info:
+            raise Exception(f"El manifest no tiene lista de archivos ('files') para la versión {version}.")
+
+        index = self.open_index()
+        # El contenido opcional que aún no se ha descargado no cuenta como dañado
+        pending = self.pending_optional(manifest_data, version)
+        files = [entry for entry in pack_info["files"] if entry_tier(entry) not in pending]
+        if pending:
+            self.log(f"Contenido opcional pendiente, no se verifica: {', '.join(sorted(pending))}.")
+        self.log(f"Verificando {len(files)} archivos con {VERIFY_THREADS} hilos...")
+        start = time.time()
+
+        def check(entry):
+            dest = self.resolve_pack_path(entry["path"])
+            if not dest or self.cancelled:
+                return entry, dest, True, 0
+            if not full and index.matches(dest, entry["sha256"]):
+                return entry, dest, True, 0
+            read = os.path.getsize(dest) if os.path.isfile(dest) else 0
+            ok = file_matches(dest, entry.get("size"), entry["sha256"])
+            if ok:
+                index.record(dest, entry["sha256"])
+            return entry, dest, ok, read
+
+        bad = []
+        hashed_files = hashed_bytes = 0
+        with self.report.phase("hash") as record, ThreadPoolExecutor(max_workers=VERIFY_THREADS) as pool:
+            for done, (entry, dest, ok, read) in enumerate(pool.map(check, files), 1):
+                if read:
+                    hashed_files += 1
+                    hashed_bytes += read
+                if not ok:
+                    self.log(f"No coincide: {entry['path']}")
+                    bad.append((entry, dest))
+                self.events.progress(int(done * 100 / len(files)))
+            record.update(bytes=hashed_bytes, files=hashed_files)
+        if self.cancelled:
+            raise Exception("Operación cancelada.")
+
+        seconds = max(time.time() - start, 0.001)
+        self.log(f"{len(files) - len(bad)} de {len(files)} archivos correctos en {seconds:.1f} s "
+                 f"({len(files) / seconds:.0f} archivos/s; {hashed_files} leídos a "
+                 f"{hashed_bytes / (1024 * 1024) / seconds:.1f} MB/s, el resto sin cambios según el índice).")
+        result = {
+            "version": version,
+            "files": len(files),
+            "hashedFiles": hashed_files,
+            "hashedBytes": hashed_bytes,
+            "seconds": round(seconds, 3),
+            "filesPerSecond": round(len(files) / seconds, 1),
+            "mbPerSecond": round(hashed_bytes / (1024 * 1024) / seconds, 1),
+            "mismatched": [entry["path"] for entry, _ in bad],
+            "repaired": [],
+        }
+
+        if repair and bad:
+            self.log(f"Reparando {len(bad)} archivos...")
+            self.index_version = version
+            self.download_entries(pack_info, bad, refetch=True)
+            # Se vuelve a calcular el hash de cada archivo reparado: solo cuenta
+            # como reparado el que ahora coincide
+            with ThreadPoolExecutor(max_workers=VERIFY_THREADS) as pool:
+                checked = list(pool.map(
+                    lambda item: (item[0], file_matches(item[1], item[0].get("size"), item[0]["sha256"])), bad))
+            result["repaired"] = [entry["path"] for entry, ok in checked if ok]
+            result["mismatched"] = [entry["path"] for entry, ok in checked if not ok]
+            for path in result["mismatched"]:
+                self.log(f"Sigue sin coincidir después de repararlo: {path}")
+            index.commit()
+        return result
+
+    def repair(self):
+        """
+        Verifica la instalación y vuelve a descargar solo los archivos dañados
+        o que faltan. Se calcula el hash de todos los archivos (sin fiarse del
+        índice), porque se usa justo cuando algo falla. Devuelve (error, info)
+        como update().
+        """
+        try:
+            self.log("Descargando manifest...")
+            manifest_data = self.download_json(self.manifest_url)
+            if not manifest_data:
+                raise Exception("No se pudo obtener el manifest o está vacío.")
+            result = self.verify(manifest_data, repair=True, full=True)
+            if result["mismatched"]:
+                raise Exception(f"{len(result['mismatched'])} archivos siguen dañados después de repararlos.")
+            return False, f"{result['version']} ({len(result['repaired'])} archivos reparados)"
+        except Exception as e:
+            self.log(f"ERROR: {e}")
+            return True, str(e)
+        finally:
+            self.close()
+
+    def resolve_pack_path(self, rel_path):
+        """
+        Traduce una ruta con la estructura del pack (p.e. ".mxd02modpack/mods/x.jar")
+        a su destino final en disco. Devuelve None si la carpeta raíz no se instala.
+        """
+        parts = split_pack_path(rel_path)
+        if len(parts) < 2 or ".." in parts:
+            return None
+        root, rest = parts[0], parts[1:]
+        if root in (PACK_ROOT_MODPACK, PACK_ROOT_ADDITIONAL):
+            base = self.modpack_dir
+        elif root == PACK_ROOT_FORGE:
+            base = self.forge_versions_dir
+        elif root == PACK_ROOT_LIBRARIES:
+            base = os.path.join(self.minecraft_dir, "libraries")
+        else:
+            return None
+        return os.path.join(base, *rest)
+
+    def sync_files(self, pack_info, entries=None):
+        """
+        Sincroniza archivo por archivo según la lista 'files' del manifest:
+        compara cada entrada con el disco y descarga solo las que faltan o difieren.
+        'entries' limita la sincronización a parte de la lista (p.e. un nivel).
+        """
+        entries = pack_info["files"] if entries is None else entries
+        to_download = []
+        with self.report.phase("check", files=len(entries)):
+            for entry in entries:
+                dest = self.resolve_pack_path(entry["path"])
+                if not dest:
+                    self.log(f"Ruta ignorada en el manifest: {entry['path']}")
+                    continue
+                if not self.file_is_current(dest, entry.get("size"), entry.get("sha256")):
+                    to_download.append((entry, dest))
+
+        total_bytes = sum(int(entry.get("size", 0)) for entry, _ in to_download)
+        self.log(f"{len(to_download)} de {len(entries)} archivos necesitan descargarse "
+                 f"({total_bytes / (1024 * 1024):.1f} MB).")
+        self.download_entries(pack_info, to_download)
+
+    def download_entries(self, pack_info, to_download, refetch=False):
+        """
+        Descarga y coloca las entradas (entry, dest) de la lista 'files' de 'pack_info'.
+        Con 'refetch' (reparación) no se usan el almacén compartido ni la caché
+        local: su copia puede ser justo la dañada. Se descarga de nuevo y la
+        copia verificada sustituye a la que hubiera (ver ContentStore.adopt).
+        """
+        with self.report.phase("download", files=len(to_download),
+                               bytes=sum(int(entry.get("size", 0)) for entry, _ in to_download)):
+            for entry, dest in to_download:
+                if self.cancelled:
+                    raise Exception("Operación cancelada.")
+                # Otra instancia ya tiene este archivo: se enlaza sin descargarlo
+                if not refetch and self.uses_store(dest) and self.store.materialize(entry["sha256"], dest):
+                    self.index_file(dest, entry["sha256"])
+                    self.log(f"Enlazado desde el almacén compartido: {dest}")
+                    continue
+                if entry.get("url"):
+                    fetch = None
+                    url = entry_urls(entry)
+                elif "offset" in entry:
+                    # Sin URL propia: se extrae con Range desde el ZIP del pack (o sus espejos)
+                    fetch = lambda u, p, e=entry: self._download_archive_member(u, e, p)
+                    url = entry_urls(pack_info)
+                else:
+                    raise Exception(f"La entrada {entry['path']} no tiene 'url' ni 'offset'.")
+
+                tmp_path = self.download_file_with_retries(url, entry["sha256"], entry["sha256"], fetch=fetch,
+                                                           use_cache=not refetch)
+                if not tmp_path:
+                    raise Exception(f"No se pudo descargar o verificar {entry['path']}.")
+                self.place_download(tmp_path, dest, entry["sha256"])
+                self.log(f"Actualizado: {dest}")
+
+    def apply_deltas(self, patch_info):
+        """
+        Aplica las entradas 'deltas' de un parche: parches binarios (BSDIFF40)
+        contra la versión instalada de archivos grandes. Si el archivo instalado
+        no coincide con 'baseHash' o el resultado no da 'hash', se descarga el
+        archivo completo desde 'fullUrl'.
+        """
+        if not patch_info.get("deltas"):
+            return
+        with self.report.phase("deltas") as record:
+            for delta in patch_info["deltas"]:
+                if self.apply_delta_entry(delta):
+                    record["files"] += 1
+                    record["bytes"] += os.path.getsize(self.resolve_pack_path(delta["path"]))
+
+    def apply_delta_entry(self, delta):
+        """Actualiza el archivo de una entrada 'deltas'. Devuelve False si ya estaba al día o se ignora."""
+        if self.cancelled:
+            raise Exception("Operación cancelada.")
+        dest = self.resolve_pack_path(delta["path"])
+        if not dest:
+            self.log(f"Ruta ignorada en el manifest: {delta['path']}")
+            return False
+        if self.file_is_current(dest, None, delta["hash"]):
+            self.log(f"{delta['path']} ya está actualizado.")
+            return False
+        if self.apply_delta(delta, dest):
+            return True
+
+        if not delta.get("fullUrl"):
+            raise Exception(f"No se pudo aplicar el parche binario de {delta['path']} y no hay 'fullUrl'.")
+        self.log(f"Descargando {delta['path']} completo...")
+        full_path = self.download_file_with_retries(entry_urls(delta, "fullUrl"), delta["hash"], delta["hash"])
+        if not full_path:
+            raise Exception(f"No se pudo descargar o verificar {delta['path']}.")
+        self.place_download(full_path, dest, delta["hash"])
+        self.log(f"Actualizado: {dest}")
+        return True
+
+    def apply_delta(self, delta, dest):
+        """Intenta actualizar 'dest' con su parche binario. Devuelve False si hay que usar el archivo completo."""
+        if self.uses_store(dest) and self.store.materialize(delta["hash"], dest):
+            self.index_file(dest, delta["hash"].lower())
+            self.log(f"Enlazado desde el almacén compartido: {dest}")
+            return True
+        if not os.path.isfile(dest) or calc_file_hash(dest, HASH_ALGORITHM) != delta["baseHash"].lower():
+            self.log(f"{delta['path']} no coincide con la versión base del parche binario.")
+            return False
+
+        patch_path = self.download_file_with_retries(entry_urls(delta), delta["hash"] + ".bsdiff", delta.get("deltaHash"))
+        if not patch_path:
+            self.log(f"No se pudo descargar el parche binario de {delta['path']}.")
+            return False
+
+        tmp_path = temp_path(dest)
+        try:
+            new_hash = apply_bsdiff(dest, patch_path, tmp_path)
+        except Exception as e:
+            self.log(f"ERROR al aplicar el parche binario de {delta['path']}: {e}")
+            new_hash = None
+        finally:
+            self.release_download(patch_path)
+        if new_hash != delta["hash"].lower():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.log(f"El resultado del parche binario de {delta['path']} no coincide con el hash esperado.")
+            return False
+
+        os.replace(tmp_path, dest)
+        self.share_file(dest, new_hash)
+        self.index_file(dest, new_hash)
+        self.log(f"Parche binario aplicado: {dest}")
+        return True
+
+    def place_download(self, path, dest, sha256):
+        """Coloca un archivo descargado en 'dest' (copiándolo si pertenece a la caché)."""
+        ensure_dir(os.path.dirname(dest))
+        if self.cache and self.cache.contains(path):
+            apply_file(path, dest, APPLY_COPY)  # La copia en caché se conserva
+        else:
+            replace_file(path, dest, move=True)
+        self.share_file(dest, sha256)
+        self.index_file(dest, sha256)
+
+    def uses_store(self, dest):
+        """Si 'dest' se comparte con otras instancias a través del almacén (ver ContentStore)."""
+        if not self.store or not self.store.wants(dest):
+            return False
+        # Forge y las librerías ya se comparten: están en la carpeta .minecraft común
+        base = os.path.abspath(self.modpack_dir) + os.sep
+        return os.path.abspath(dest).startswith(base)
+
+    def share_file(self, dest, sha256):
+        """Pasa al almacén compartido un archivo recién instalado (o lo enlaza al que ya había)."""
+        if self.uses_store(dest):
+            self.store.adopt(dest, sha256)
+
+    def install_patch(self, patch_info, archive_path=None, key=None):
+        """
+        Descarga un ZIP que contiene solo los archivos modificados. 
+        Simplemente se descomprime y se copian/reescriben los archivos en .mxd02modpack 
+        (y/o la carpeta de forgeVersion, si aplica).
+        'archive_path' permite pasar el parche ya descargado (ver execute_plan).
+        'key' es la clave del paso en el diario; las fases ya anotadas se saltan.
+        """
+        version = patch_info["version"]
+        self.index_version = version
+
+        self.log(f"Instalando Parche {version}...")
+
+        if not archive_path and not self.phase_done(key, "extracted"):
+            archive_path = self.fetch_pack(patch_info, "Parche", key)
+
+        # Primero se eliminan los archivos obsoletos: la extracción escribe
+        # directamente en los destinos finales
+        if not self.phase_done(key, "removals"):
+            with self.report.phase("removals") as record:
+                record["files"] = self.remove_obsolete(patch_info)
+            self.mark_phase(key, "removals")
+
+        # En el parche, podrías tener la misma estructura:
+        #   .mxd02modpack/
+        #   forgeVersion/
+        #   resourcepacks/
+        #   additional_files/
+        #   u otras carpetas
+        # Se instala igual que en full, pero sólo lo que exista
+        if self.phase_done(key, "extracted"):
+            self.log("El parche ya se había descomprimido.")
+            # Solo queda borrar el archivo descargado (si sigue ahí)
+            archive_path = archive_path or (self.phase_done(key, "downloaded") or {}).get("path")
+        elif archive_path:
+            self.log("Descomprimiendo Parche...")
+            self.install_archive(archive_path, "_temp_patch_", "Parche", pack_format(patch_info))
+            self.mark_phase(key, "extracted")
+
+        # Archivos grandes actualizados con parches binarios
+        if not self.phase_done(key, "deltas"):
+            self.apply_deltas(patch_info)
+            self.mark_phase(key, "deltas")
+
+        # La versión instalada se actualiza al terminar el plan (ver execute_plan)
+        with self.report.phase("index"):
+            self.open_index().commit()
+
+        # También actualizamos el perfil con la RAM que el usuario eligió:
+        self.write_profile(complete=False)
+
+        if archive_path:
+            self.release_download(archive_path)
+
+        self.log(f"Parche {version} instalado con éxito.")
+
+    def remove_obsolete(self, patch_info):
+        """
+        Elimina los archivos y carpetas de 'filesToRemove' y 'dirToRemove' del parche.
+        Devuelve cuántos se eliminaron.
+        """
+        removed = 0
+        files_to_remove = patch_info.get("filesToRemove", [])
+        for rel_path in files_to_remove:
+            # Suponiendo que rel_path es relativo a .mxd02modpack
+            target_path = os.path.join(self.modpack_dir, rel_path)
+            if os.path.exists(target_path):
+                self.log(f"Eliminando archivo obsoleto: {target_path}")
+                os.remove(target_path)
+                removed += 1
+            self.open_index().forget(target_path)
+
+        dir_to_remove = patch_info.get("dirToRemove", [])
+        for rel_path in dir_to_remove:
+            # Suponiendo que rel_path es relativo a .mxd02modpack
+            target_path = os.path.join(self.modpack_dir, rel_path)
+            if os.path.exists(target_path):
+                self.log(f"Eliminando carpeta obsoleta: {target_path}")
+                try:
+                    os.chmod(target_path, 0o777)  # Cambiar permisos
+                    shutil.rmtree(target_path)
+                    removed += 1
+                except Exception as e:
+                    self.log(f"ERROR al eliminar la carpeta: {e}")
+            self.open_index().forget(target_path)
+        return removed
+
+    def install_archive(self, archive_path, staging_name, label, declared_format=None):
+        """
+        Instala el contenido de un pack en sus carpetas finales.
+        Los .zip, .tar(.gz/.bz2/.xz) y .tar.zst se leen en streaming y cada entrada
+        se escribe directamente en su destino según su carpeta raíz. Los demás
+        formatos (.rar/.7z) se descomprimen con pyunpack en 'staging_name' y
+        luego se copian. 'declared_format' es el formato según el manifest
+        (ver archive_format).
+        """
+        fmt = archive_format(archive_path, declared_format)
+        if fmt != "other":
+            with self.report.phase("extract", file=os.path.basename(archive_path), format=fmt) as record:
+                if fmt == "zip":
+                    counts = self.extract_zip_direct(archive_path)
+                else:
+                    counts = self.extract_tar_direct(archive_path, zstd=fmt == "tar.zst")
+                # Archivos y bytes escritos en cada destino (carpeta raíz del pack)
+                record["destinations"] = counts
+                record["files"] = sum(c["files"] for c in counts.values())
+                record["bytes"] = sum(c["bytes"] for c in counts.values())
+        else:
+            temp_dir = os.path.join(self.modpack_dir, staging_name)
+            ensure_dir(temp_dir)
+            with self.report.phase("extract", file=os.path.basename(archive_path),
+                                   bytes=os.path.getsize(archive_path)):
+                self.extract_archive(archive_path, temp_dir)
+            self.apply_staged_dir(temp_dir, label)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def extract_zip_direct(self, archive_path):
+        """
+        Extrae cada entrada del ZIP directamente en su destino final. Las
+        carpetas se crean antes de empezar y los archivos se escriben en
+        'self.extract_threads' hilos, cada uno con su propio ZipFile abierto.
+        """
+        self.events.progress(0)
+        counts = {}
+        with zipfile.ZipFile(archive_path) as zf:
+            entries = []
+            for info in zf.infolist():
+                dest = self.resolve_pack_path(info.filename)
+                if dest:
+                    entries.append((info, dest))
+        files = [(info, dest) for info, dest in entries if not info.is_dir()]
+        total = sum(info.file_size for info, _ in files) or 1
+        done = 0
+
+        local = threading.local()
+        opened = []
+        opened_lock = threading.Lock()
+
+        def write(info, dest):
+            if self.cancelled:
+                raise Exception("Operación cancelada.")
+            if not hasattr(local, "zf"):
+                local.zf = zipfile.ZipFile(archive_path)
+                with opened_lock:
+                    opened.append(local.zf)
+            with open_zip_member(local.zf, info) as src:
+                self._write_pack_entry(src, dest, time.mktime(info.date_time + (0, 0, -1)), make_dirs=False)
+
+        self.open_index()  # Antes de los hilos: todos escriben en el mismo índice
+        try:
+            with EntryWriter(self.extract_threads) as writer:
+                writer.make_dirs([dest for info, dest in entries if info.is_dir()] +
+                                 [os.path.dirname(dest) for _, dest in files])
+                for info, dest in files:
+                    if self.cancelled:
+                        raise Exception("Operación cancelada.")
+                    writer.submit(dest, lambda info=info, dest=dest: write(info, dest))
+                    self._count_entry(counts, info.filename, info.file_size)
+                    done += info.file_size
+                    self.events.progress(int(done * 100 / total))
+        finally:
+            for handle in opened:
+                handle.close()
+        self._log_extracted(archive_path, counts)
+        return counts
+
+    def extract_tar_direct(self, archive_path, zstd=False):
+        """
+        Lee el .tar en streaming (sin acceso aleatorio) y escribe cada archivo en su destino.
+        Con 'zstd' (.tar.zst) se descomprime en otro hilo mientras se escribe (ver ZstdPipeReader).
+        """
+        self.events.progress(0)
+        counts = {}
+        total = os.path.getsize(archive_path) or 1
+        with open(archive_path, 'rb') as raw:
+            source = ZstdPipeReader(raw) if zstd else raw
+            try:
+                # "r|*" detecta .gz/.bz2/.xz; el .tar.zst llega ya descomprimido
+                self._extract_tar_stream(source, "r|" if zstd else "r|*", raw, total, counts)
+            finally:
+                if zstd:
+                    source.close()
+        self._log_extracted(archive_path, counts)
+        return counts
+
+    def _extract_tar_stream(self, source, mode, raw, total, counts):
+        """
+        El .tar solo se puede leer en orden, pero la escritura se reparte: los
+        archivos pequeños se leen a memoria y se escriben en otros hilos
+        (EntryWriter) mientras se sigue leyendo; los grandes
+        (> EXTRACT_INLINE_SIZE) se escriben directamente desde el stream.
+        """
+        self.open_index()  # Antes de los hilos: todos escriben en el mismo índice
+        with EntryWriter(self.extract_threads) as writer, tarfile.open(fileobj=source, mode=mode) as tf:
+            for member in tf:
+                if self.cancelled:
+                    raise Exception("Operación cancelada.")
+                dest = self.resolve_pack_path(member.name)
+                if not dest:
+                    continue
+                if member.isdir():
+                    writer.make_dirs([dest])
+                    continue
+                if not member.isfile():
+                    continue  # Enlaces y archivos especiales no se instalan
+                if member.size <= EXTRACT_INLINE_SIZE:
+                    data = tf.extractfile(member).read()
+                    writer.submit(dest, lambda data=data, dest=dest, mtime=member.mtime:
+                                  self._write_pack_entry(io.BytesIO(data), dest, mtime, make_dirs=False))
+                else:
+                    writer.wait(dest)
+                    writer.make_dirs([os.path.dirname(dest)])
+                    self._write_pack_entry(tf.extractfile(member), dest, member.mtime, make_dirs=False)
+                self._count_entry(counts, member.name, member.size)
+                self.events.progress(int(raw.tell() * 100 / total))
+
+    def _write_pack_entry(self, src, dest, mtime, make_dirs=True):
+        """
+        Escribe una entrada del pack en 'dest' a través de un archivo temporal,
+        para no dejar nunca un archivo a medio escribir en su lugar final.
+        Con 'make_dirs' en False, la carpeta de 'dest' ya debe existir.
+        """
+        if make_dirs:
+            ensure_dir(os.path.dirname(dest))
+        tmp_path = temp_path(dest)
+        hasher = hashlib.new(HASH_ALGORITHM)  # El hash para el índice se calcula al escribir
+        try:
+            with open(tmp_path, 'wb') as out:
+                while True:
+                    data = src.read(HASH_BUFFER_SIZE)
+                    if not data:
+                        break
+                    out.write(data)
+                    hasher.update(data)
+            os.replace(tmp_path, dest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.utime(dest, (mtime, mtime))
+        self.share_file(dest, hasher.hexdigest())
+        self.index_file(dest, hasher.hexdigest())
+
+    def _count_entry(self, counts, name, size):
+        """Suma un archivo escrito a 'counts' ({carpeta raíz: {"files", "bytes"}})."""
+        count = counts.setdefault(split_pack_path(name)[0], {"files": 0, "bytes": 0})
+        count["files"] += 1
+        count["bytes"] += size
+
+    def _log_extracted(self, archive_path, counts):
+        for root, count in counts.items():
+            self.log(f"{count['files']} archivos instalados desde '{root}'.")
+        self.log(f"Archivo extraído correctamente: {archive_path}")
+        self.events.progress(100)
+
+    def apply_staged_dir(self, temp_dir, label):
+        """
+        Mueve una extracción completa en 'temp_dir' a sus carpetas finales.
+        Como 'temp_dir' se borra después, se usa APPLY_MOVE: en el mismo disco
+        es un simple rename y solo entre discos distintos se copian los datos.
+        """
+        routes = [
+            (PACK_ROOT_MODPACK, self.modpack_dir),
+            (PACK_ROOT_FORGE, self.forge_versions_dir),
+            (PACK_ROOT_LIBRARIES, os.path.join(self.minecraft_dir, "libraries")),
+            (PACK_ROOT_ADDITIONAL, self.modpack_dir),
+        ]
+        for root, dest in routes:
+            src = os.path.join(temp_dir, root)
+            if not os.path.isdir(src):
+                if root == PACK_ROOT_ADDITIONAL:
+                    self.log(f"No se encontró la carpeta 'additional_files' en el {label}.")
+                continue
+            self.log(f"Aplicando '{root}' en {dest}...")
+            # Los hashes se calculan antes de mover (mover no cambia el contenido)
+            with self.report.phase("hash", destination=root) as record:
+                paths = [os.path.join(dirpath, name) for dirpath, _, filenames in os.walk(src) for name in filenames]
+                with ThreadPoolExecutor(max_workers=self.extract_threads) as pool:
+                    hashes = dict(zip((os.path.relpath(path, src) for path in paths),
+                                      pool.map(lambda path: calc_file_hash(path, HASH_ALGORITHM), paths)))
+                record["files"] = len(paths)
+                record["bytes"] = size = sum(os.path.getsize(path) for path in paths)
+            with self.report.phase("copy", destination=root, files=len(hashes), bytes=size):
+                stats = copy_all(src, dest, mode=APPLY_MOVE, threads=self.extract_threads)
+            for rel, sha256 in hashes.items():
+                self.index_file(os.path.join(dest, rel), sha256)
+            self.log(f"'{root}': {stats['moved']} movidos, {stats['copied']} copiados, "
+                     f"{stats['skipped']} sin cambios.")
+
+    def download_file_with_retries(self, urls, filename, expected_hash=None, fetch=None, use_cache=True):
+        """
+        Descarga un archivo con reintentos, verifica el hash si se proporciona.
+        'urls' puede ser una URL o una lista de espejos: se ordenan por velocidad
+        (rank_mirrors) y cada reintento pasa al siguiente.
+        'fetch' permite sustituir la descarga normal (por defecto self._download).
+        Las descargas a medias se conservan en _temp_down_ y se reanudan en el
+        siguiente intento (o en la siguiente ejecución del programa).
+        Si 'fetch' devuelve el hash calculado durante la descarga, se usa ese
+        en lugar de volver a leer el archivo.
+        Con 'use_cache' en False no se toma de la caché local (pero la descarga
+        verificada sí se guarda en ella, sustituyendo la copia anterior).
+        Retorna la ruta local al archivo o None si falla.
+        """
+        urls = [urls] if isinstance(urls, str) else list(urls)
+        if not urls:
+            raise Exception(f"{filename} no tiene ninguna URL en el manifest.")
+        if not fetch:
+            # Con hash conocido, una descarga a medias puede continuar desde otro espejo
+            mirrors = urls if expected_hash else None
+            fetch = lambda u, p: self._download(u, p, mirrors)
+        temp_download_dir = os.path.join(self.modpack_dir, "_temp_down_")
+        ensure_dir(temp_download_dir)
+        dest_path = os.path.join(temp_download_dir, filename)
+
+        # Antes de ir a la red se consulta la caché local
+        if expected_hash and self.cache and use_cache:
+            cached_path = self.cache.get(expected_hash)
+            if cached_path:
+                self.log(f"{filename} encontrado en la caché local.")
+                return cached_path
+
+        # Descarga completa de una ejecución anterior (p.e. se cerró antes de instalar)
+        if expected_hash and load_download_state(dest_path) is None and file_matches(dest_path, None, expected_hash):
+            self.log(f"{filename} ya estaba descargado y verificado.")
+            return dest_path
+
+        # Después se prueba con la caché de otros equipos de la red local
+        if expected_hash:
+            lan_path = self.fetch_from_lan(filename, expected_hash, dest_path)
+            if lan_path:
+                return lan_path
+
+        urls = self.rank_mirrors(urls)
+        for attempt in range(MAX_DOWNLOAD_RETRIES):
+            if self.cancelled:
+                return None
+            url = urls[attempt % len(urls)]
+            try:
+                if attempt and len(urls) > 1:
+                    self.log(f"Probando con el espejo {mirror_host(url)}.")
+                self.log(f"Descargando {filename} (intento {attempt+1}/{MAX_DOWNLOAD_RETRIES})...")
+                self.events.progress(0)
+                file_hash = fetch(url, dest_path)
+                if expected_hash:
+                    if not file_hash:
+                        with self.report.phase("hash", files=1, bytes=os.path.getsize(dest_path)):
+                            file_hash = calc_file_hash(dest_path, HASH_ALGORITHM)
+                    if file_hash.lower() != expected_hash.lower():
+                        # El archivo está corrupto: no tiene sentido reanudarlo
+                        discard_download(dest_path)
+                        raise Exception(f"Hash distinto. Esperado={expected_hash}, obtenido={file_hash}")
+                    if self.cache:
+                        return self.cache.put(dest_path, expected_hash)
+                return dest_path
+            except DownloadCancelled:
+                self.log(f"Descarga de {filename} cancelada. Se reanudará en el próximo intento.")
+                return None
+            except Exception as e:
+                self.log(f"Error en descarga {filename}: {e}")
+        return None
+
+    def get_lan_peers(self):
+        """
+        Servidores de caché en red local (configurados y, si se pidió,
+        descubiertos). Cada uno se comprueba una sola vez por actualización: los
+        que no responden se descartan, para no esperar su timeout en cada archivo.
+        """
+        with self.mirror_lock:
+            if self.lan_discover:
+                self.lan_discover = False
+                for url in discover_lan_caches():
+                    if url not in self.lan_peers:
+                        self.log(f"Caché en red local encontrada: {url}")
+                        self.lan_peers.append(url)
+            for peer in list(self.lan_peers):
+                if peer in self.lan_checked:
+                    continue
+                self.lan_checked.add(peer)
+                try:
+                    # Cualquier respuesta HTTP (normalmente 404) indica que el servidor está vivo
+                    self.session.head(f"{peer}/blob/{'0' * 64}", timeout=LAN_PROBE_TIMEOUT)
+                except requests.RequestException as e:
+                    self._drop_lan_peer(peer, e)
+            return list(self.lan_peers)
+
+    def _drop_lan_peer(self, peer, reason):
+        """Deja de usar un servidor de caché en red durante el resto de la actualización (con mirror_lock)."""
+        if peer in self.lan_peers:
+            self.lan_peers.remove(peer)
+            self.log(f"La caché en red {peer} no responde ({reason}); no se usará en esta actualización.")
+
+    def fetch_from_lan(self, filename, expected_hash, dest_path):
+        """
+        Descarga 'expected_hash' de la caché de otro equipo de la red local, si
+        alguno lo tiene. El hash se verifica igual que en cualquier descarga.
+        Devuelve la ruta del archivo o None (se sigue con los servidores normales).
+        """
+        for peer in self.get_lan_peers():
+            url = f"{peer}/blob/{expected_hash.lower()}"
+            try:
+                head = self.session.head(url, timeout=LAN_PROBE_TIMEOUT)
+            except requests.RequestException as e:
+                with self.mirror_lock:
+                    self._drop_lan_peer(peer, e)
+                continue
+            if head.status_code != 200:
+                continue
+            self.log(f"Descargando {filename} desde la caché en red {peer}...")
+            try:
+                file_hash = self._download(url, dest_path)
+            except DownloadCancelled:
+                return None
+            except requests.RequestException as e:
+                with self.mirror_lock:
+                    self._drop_lan_peer(peer, e)
+                continue
+            except Exception as e:
+                self.log(f"Error al descargar desde {peer}: {e}")
+                continue
+            if file_hash.lower() != expected_hash.lower():
+                self.log(f"{peer} envió un archivo con hash distinto; se descarta.")
+                discard_download(dest_path)
+                continue
+            if self.cache:
+                return self.cache.put(dest_path, expected_hash)
+            return dest_path
+        return None
+
+    def rank_mirrors(self, urls):
+        """
+        Ordena los espejos de más rápido a más lento. Cada servidor se mide una
+        sola vez por actualización (ver _probe_mirror) y se recuerda el resultado.
+        """
+        if len(urls) < 2:
+            return urls
+        with self.mirror_lock:
+            pending = {}
+            for url in urls:
+                host = mirror_host(url)
+                if host not in self.mirror_scores:
+                    pending.setdefault(host, url)
+            if pending:
+                with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+                    scores = dict(zip(pending, pool.map(self._probe_mirror, pending.values())))
+                for host, score in scores.items():
+                    self.mirror_scores[host] = score
+                    if score == float("inf"):
+                        self.log(f"Espejo {host}: no responde.")
+                    else:
+                        self.log(f"Espejo {host}: {score:.2f} s/MB estimados.")
+            return sorted(urls, key=lambda url: self.mirror_scores[mirror_host(url)])
+
+    def _probe_mirror(self, url):
+        """
+        Pide los primeros MIRROR_PROBE_BYTES de 'url' y estima cuántos segundos
+        tardaría 1 MB: latencia hasta la respuesta + velocidad de transferencia.
+        Devuelve infinito si el espejo falla.
+        """
+        try:
+            start = time.time()
+            resp = self.session.get(url, headers={"Range": f"bytes=0-{MIRROR_PROBE_BYTES - 1}"},
+                                    stream=True, timeout=5)
+            resp.raise_for_status()
+            latency = time.time() - start
+            received = 0
+            for chunk in resp.iter_content(chunk_size=16384):
+                received += len(chunk)
+                if received >= MIRROR_PROBE_BYTES:
+                    break
+            resp.close()
+            elapsed = max(time.time() - start - latency, 0.001)
+        except requests.RequestException:
+            return float("inf")
+        return latency + (1024 * 1024) * elapsed / max(received, 1)
+
+    def release_download(self, path):
+        """Borra un archivo descargado tras instalarlo, salvo que pertenezca a la caché."""
+        if self.cache and self.cache.contains(path):
+            return
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def _download(self, url, dest_path, mirrors=None):
+        """
+        Descarga con `requests`, actualizando barra de progreso.
+        Si el servidor admite Range y el archivo es grande, se reparte en trozos
+        descargados en paralelo; si no, se usa una única conexión.
+        El progreso se guarda en un archivo de estado junto a 'dest_path' para
+        poder reanudar la descarga si se cancela, falla o se cierra el programa.
+        'mirrors' son las demás URLs del mismo archivo (solo si se verifica su
+        hash al final): la descarga puede continuar desde cualquiera de ellas.
+        Devuelve el hash del archivo calculado durante la descarga.
+        """
+        info = self._probe_download(url)
+        state = load_download_state(dest_path)
+
+        if self._can_resume(state, url, info, dest_path, mirrors):
+            done = state.get("received", 0) + sum(seg[2] for seg in state.get("segments", []))
+            self.log(f"Reanudando descarga ({done / (1024 * 1024):.1f} MB ya descargados)...")
+            if state["url"] != url:
+                # Continúa desde otro espejo: sus validadores son distintos
+                state.update(url=url, etag=info["etag"], lastModified=info["last_modified"])
+        else:
+            state = {
+                "url": url,
+                "etag": info["etag"],
+                "lastModified": info["last_modified"],
+                "total": info["total"],
+            }
+            if info["ranges"] and self.connections > 1 and info["total"] > SEGMENT_SIZE:
+                state["segments"] = [[start, min(start + SEGMENT_SIZE, info["total"]) - 1, 0]
+                                     for start in range(0, info["total"], SEGMENT_SIZE)]
+            else:
+                state["received"] = 0
+
+        if "segments" in state:
+            alternates = [u for u in (mirrors or []) if u != url]
+            digest = self._download_segmented(url, dest_path, state, alternates)
+        else:
+            digest = self._download_single(url, dest_path, state, info["ranges"])
+        clear_download_state(dest_path)
+        return digest
+
+    def _probe_download(self, url):
+        """
+        Pide el primer byte con Range para saber si el servidor admite descargas
+        parciales, el tamaño total y los validadores (ETag / Last-Modified).
+        """
+        info = {"ranges": False, "total": None, "etag": None, "last_modified": None}
+        try:
+            resp = self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=15)
+            resp.close()
+        except requests.RequestException:
+            return info
+        info["etag"] = resp.headers.get("ETag")
+        info["last_modified"] = resp.headers.get("Last-Modified")
+        content_range = resp.headers.get("Content-Range", "")
+        if resp.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                info["ranges"] = True
+                info["total"] = int(total)
+        elif resp.status_code == 200 and resp.headers.get("content-length", "").isdigit():
+            info["total"] = int(resp.headers["content-length"])
+        return info
+
+    def _can_resume(self, state, url, info, dest_path, mirrors=None):
+        """
+        Una descarga se reanuda solo si es la misma URL, el archivo remoto no ha
+        cambiado (mismo tamaño y ETag o Last-Modified) y el parcial sigue en disco.
+        Si empezó en otro espejo de 'mirrors' basta con que coincida el tamaño:
+        el hash final descarta el archivo si el contenido no es el mismo.
+        """
+        if not state or not info["ranges"]:
+            return False
+        if not os.path.isfile(dest_path) or state.get("total") != info["total"]:
+            return False
+        if state.get("url") != url:
+            return bool(mirrors) and state.get("url") in mirrors
+        if info["etag"]:
+            return state.get("etag") == info["etag"]
+        if info["last_modified"]:
+            return state.get("lastModified") == info["last_modified"]
+        return False
+
+    def _download_segmented(self, url, dest_path, state, alternates=()):
+        """
+        Descarga 'url' en trozos de SEGMENT_SIZE bytes con un pool de
+        'self.connections' hilos; cada trozo se escribe en su posición del archivo.
+        Cada trozo de state["segments"] es [inicio, fin, bytes_recibidos].
+        Si un trozo falla a mitad, continúa en los espejos de 'alternates'
+        desde el byte en que se quedó.
+        """
+        total = state["total"]
+        segments = state["segments"]
+        pending = [seg for seg in segments if seg[2] < seg[1] - seg[0] + 1]
+        self.log(f"Descarga segmentada: {len(pending)} de {len(segments)} trozos "
+                 f"con {self.connections} conexiones.")
+
+        if not os.path.isfile(dest_path):
+            # Se reserva el archivo completo para que cada hilo escriba en su offset
+            with open(dest_path, 'wb') as f:
+                f.truncate(total)
+
+        lock = threading.Lock()
+        progress = {"downloaded": sum(seg[2] for seg in segments), "value": -1, "saved": 0}
+        hasher = SegmentHasher(dest_path, segments)
+
+        validator = state.get("etag") or state.get("lastModified")
+
+        def fetch_segment(seg):
+            for number, source in enumerate([url] + list(alternates)):
+                try:
+                    return fetch_segment_from(seg, source, validator if source == url else None)
+                except DownloadCancelled:
+                    raise
+                except Exception as e:
+                    if number == len(alternates) or self.cancelled:
+                        raise
+                    self.log(f"Trozo {seg[0]}-{seg[1]}: {e}. Continuando desde {mirror_host(alternates[number])}...")
+
+        def fetch_segment_from(seg, url, validator):
+            start, end = seg[0] + seg[2], seg[1]
+            headers = {"Range": f"bytes={start}-{end}"}
+            if validator:
+                headers["If-Range"] = validator
+            resp = self.session.get(url, headers=headers, stream=True, timeout=15)
+            resp.raise_for_status()
+            if resp.status_code != 206:
+                raise Exception("El archivo remoto cambió o el servidor dejó de admitir Range.")
+            with open(dest_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in resp.iter_content(chunk_size=65536):
+                    if self.cancelled:
+                        raise DownloadCancelled()
+                    if chunk:
+                        f.write(chunk)
+                        f.flush()
+                        with lock:
+                            pos = seg[0] + seg[2]
+                            seg[2] += len(chunk)
+                            hasher.update(pos, chunk)
+                            progress["downloaded"] += len(chunk)
+                            prog = int(progress["downloaded"] * 100 / total)
+                            if prog != progress["value"]:
+                                progress["value"] = prog
+                                self.events.progress(prog)
+                            if progress["downloaded"] - progress["saved"] >= DOWNLOAD_STATE_INTERVAL:
+                                progress["saved"] = progress["downloaded"]
+                                save_download_state(dest_path, state)
+            if seg[2] != seg[1] - seg[0] + 1:
+                raise Exception(f"Trozo incompleto {seg[0]}-{seg[1]}: {seg[2]} bytes recibidos.")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.connections) as pool:
+                futures = [pool.submit(fetch_segment, seg) for seg in pending]
+                for future in futures:
+                    future.result()
+        finally:
+            with lock:
+                save_download_state(dest_path, state)
+        return hasher.hexdigest()
+
+    def _download_single(self, url, dest_path, state, ranges):
+        """
+        Descarga con una sola conexión. Si ya hay bytes recibidos y el servidor
+        admite Range, continúa desde ahí (If-Range evita mezclar versiones).
+        """
+        received = state.get("received", 0)
+        if os.path.isfile(dest_path):
+            received = min(received, os.path.getsize(dest_path))
+        else:
+            received = 0
+        headers = {}
+        if received and ranges:
+            headers["Range"] = f"bytes={received}-"
+            validator = state.get("etag") or state.get("lastModified")
+            if validator:
+                headers["If-Range"] = validator
+
+        resp = self.session.get(url, headers=headers, stream=True, timeout=15)
+        if resp.status_code == 416 and received:
+            # Lo recibido ya no encaja con el archivo remoto: se empieza de cero
+            resp.close()
+            resp = self.session.get(url, stream=True, timeout=15)
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            received = 0  # El servidor envía el archivo completo
+        total = received + int(resp.headers.get('content-length', 0))
+        state["received"] = received
+        saved = received
+
+        # Al reanudar, el hash de lo ya descargado se calcula una sola vez
+        hasher = hashlib.new(HASH_ALGORITHM)
+        if received:
+            calc_file_hash(dest_path, end=received, h=hasher)
+
+        with open(dest_path, 'r+b' if received else 'wb') as f:
+            f.truncate(received)
+            f.seek(received)
+            try:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    if self.cancelled:
+                        raise DownloadCancelled()
+                    if chunk:
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        received += len(chunk)
+                        if total > 0:
+                            prog = int(received * 100 / total)
+                            self.events.progress(prog)
+                        if received - saved >= DOWNLOAD_STATE_INTERVAL:
+                            f.flush()
+                            state["received"] = saved = received
+                            save_download_state(dest_path, state)
+            finally:
+                f.flush()
+                state["received"] = received
+                save_download_state(dest_path, state)
+        return hasher.hexdigest()
+
+    def _download_archive_member(self, url, entry, dest_path):
+        """
+        Descarga un único archivo de dentro de un ZIP remoto pidiendo solo el rango
+        de sus datos comprimidos ('offset' y 'compressedSize' del manifest).
+        """
+        start = int(entry["offset"])
+        end = start + int(entry["compressedSize"]) - 1
+        resp = self.session.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=15)
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            raise Exception("El servidor no admite descargas parciales (Range).")
+
+        method = int(entry.get("method", zipfile.ZIP_DEFLATED))
+        if method == zipfile.ZIP_DEFLATED:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method == zipfile.ZIP_STORED:
+            decompressor = None
+        elif method == ZIP_ZSTANDARD:
+            require_zstandard()
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            raise Exception(f"Método de compresión no soportado: {method}")
+
+        hasher = hashlib.new(HASH_ALGORITHM)
+        with open(dest_path, 'wb') as f:
+            for chunk in resp.iter_content(chunk_size=65536):
+                if self.cancelled:
+                    raise DownloadCancelled()
+                if chunk:
+                    data = decompressor.decompress(chunk) if decompressor else chunk
+                    f.write(data)
+                    hasher.update(data)
+            if decompressor:
+                data = decompressor.flush()
+                f.write(data)
+                hasher.update(data)
+        return hasher.hexdigest()
+
+    def extract_archive(self, archive_path, extract_to):
+        self.events.progress(0)
+        try:
+            Archive(archive_path).extractall(extract_to)
+            self.log(f"Archivo extraído correctamente: {archive_path}")
+        except Exception as e:
+            self.log(f"ERROR al descomprimir el archivo: {e}")
+            raise
+        self.events.progress(100)
+
+    def log(self, message):
+        self.events.log(message)
+
+    def cancel(self):
+        self.cancelled = True
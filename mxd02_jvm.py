@@ -0,0 +1,208 @@
+"""
+Argumentos de Java para el perfil del launcher según el equipo: memoria total
+y libre, núcleos de CPU y número de mods instalados. Sin Qt ni dependencias
+obligatorias (psutil se usa si está instalado).
+
+    tuning = tune_jvm("auto", mod_count=180)
+    tuning["javaArgs"]   # -Xmx8G -Xms8G -XX:+UseG1GC ...
+    tuning["warnings"]   # avisos si la RAM elegida no es segura
+
+La línea de comandos muestra el informe sin instalar nada:
+
+    python mxd02_cli.py jvm [--ram N] [carpeta_modpack ...]
+"""
+import ctypes
+import os
+import sys
+
+try:
+    import psutil  # Opcional: memoria total y libre en cualquier sistema
+except ImportError:
+    psutil = None
+
+RAM_AUTO           = "auto"  # Valor de "ram" en user_settings.json para usar la recomendación
+MIN_HEAP_GB        = 2  # Por debajo de esto Forge no llega a cargar
+OS_RESERVE_GB      = 2  # Memoria mínima que se deja al sistema y al launcher
+OS_RESERVE_PERCENT = 25  # ...o este porcentaje de la total, lo que sea mayor
+COMPRESSED_OOPS_GB = 32  # Desde aquí la JVM pierde los punteros comprimidos
+ZGC_MIN_HEAP_GB    = 16  # ZGC solo compensa con mucha memoria...
+ZGC_MIN_CORES      = 8   # ...y núcleos de sobra para sus hilos concurrentes
+
+# Memoria recomendada según el número de mods: (mods desde, GB)
+MOD_HEAP_STEPS = [(0, 3), (50, 4), (120, 6), (200, 8), (300, 10)]
+
+
+# ---------------------------------------------------------
+# DETECCIÓN DEL EQUIPO
+# ---------------------------------------------------------
+class _MemoryStatusEx(ctypes.Structure):
+    """MEMORYSTATUSEX de la API de Windows (GlobalMemoryStatusEx)."""
+    _fields_ = [
+        ("dwLength", ctypes.c_ulong),
+        ("dwMemoryLoad", ctypes.c_ulong),
+        ("ullTotalPhys", ctypes.c_ulonglong),
+        ("ullAvailPhys", ctypes.c_ulonglong),
+        ("ullTotalPageFile", ctypes.c_ulonglong),
+        ("ullAvailPageFile", ctypes.c_ulonglong),
+        ("ullTotalVirtual", ctypes.c_ulonglong),
+        ("ullAvailVirtual", ctypes.c_ulonglong),
+        ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+    ]
+
+def _memory_bytes():
+    """(total, libre) en bytes; cualquiera de los dos puede ser None si no se puede saber."""
+    if psutil is not None:
+        memory = psutil.virtual_memory()
+        return memory.total, memory.available
+    if sys.platform == "win32":
+        status = _MemoryStatusEx()
+        status.dwLength = ctypes.sizeof(_MemoryStatusEx)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys, status.ullAvailPhys
+        return None, None
+    if os.path.isfile("/proc/meminfo"):
+        values = {}
+        with open("/proc/meminfo", 'r', encoding='utf-8') as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                values[key] = int(rest.split()[0]) * 1024  # En kB
+        return values.get("MemTotal"), values.get("MemAvailable", values.get("MemFree"))
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"), None
+    except (AttributeError, ValueError, OSError):
+        return None, None
+
+def probe_hardware():
+    """Memoria total y libre (MB) y núcleos de CPU del equipo."""
+    total, free = _memory_bytes()
+    return {
+        "totalMb": total // (1024 * 1024) if total else None,
+        "freeMb": free // (1024 * 1024) if free else None,
+        "cpuCores": os.cpu_count() or 2,
+    }
+
+
+# ---------------------------------------------------------
+# RECOMENDACIÓN
+# ---------------------------------------------------------
+def heap_for_mods(mod_count):
+    """GB que necesita el modpack según su número de mods."""
+    return next(gb for mods, gb in reversed(MOD_HEAP_STEPS) if mod_count >= mods)
+
+def safe_max_gb(total_mb):
+    """Máximo de GB para el juego dejando memoria suficiente al sistema (None si no se sabe)."""
+    if not total_mb:
+        return None
+    reserve_mb = max(OS_RESERVE_GB * 1024, total_mb * OS_RESERVE_PERCENT // 100)
+    return max(1, int((total_mb - reserve_mb) // 1024))
+
+def recommend_heap_gb(hardware, mod_count):
+    """GB recomendados: lo que piden los mods, sin pasar del máximo seguro del equipo."""
+    heap = heap_for_mods(mod_count)
+    safe = safe_max_gb(hardware["totalMb"])
+    if safe is not None:
+        heap = min(heap, safe)
+    return max(MIN_HEAP_GB, heap)
+
+def gc_threads(cores):
+    """
+    (ParallelGCThreads, ConcGCThreads). Se deja un núcleo para el hilo
+    principal del juego; con más de 8 se sigue la fórmula de la propia JVM.
+    """
+    usable = max(1, cores - 1)
+    parallel = usable if usable <= 8 else 8 + (usable - 8) * 5 // 8
+    return parallel, max(1, (parallel + 2) // 4)
+
+def region_size_mb(heap_gb):
+    """Tamaño de región de G1 (potencia de 2 entre 4 y 32 MB) para unas 2048 regiones."""
+    size = 4
+    while size < 32 and heap_gb * 1024 // size > 2048:
+        size *= 2
+    return size
+
+def choose_gc(heap_gb, cores):
+    """Recolector de basura: G1 por defecto, ZGC con mucha memoria y núcleos, Serial con un solo núcleo."""
+    if cores < 2:
+        return "serial"
+    if heap_gb >= ZGC_MIN_HEAP_GB and cores >= ZGC_MIN_CORES:
+        return "zgc"
+    return "g1"
+
+def build_jvm_args(heap_gb, hardware):
+    """
+    Argumentos de Java para 'heap_gb'. -Xms igual a -Xmx evita que el montón
+    crezca a trompicones mientras se cargan los mods; si ahora no hay tanta
+    memoria libre, se reserva solo la mitad al arrancar.
+    """
+    cores = hardware["cpuCores"]
+    free_mb = hardware["freeMb"]
+    initial = heap_gb if not free_mb or heap_gb * 1024 <= free_mb else max(1, heap_gb // 2)
+    args = [f"-Xmx{heap_gb}G", f"-Xms{initial}G"]
+    gc = choose_gc(heap_gb, cores)
+    parallel, concurrent = gc_threads(cores)
+    if gc == "serial":
+        args.append("-XX:+UseSerialGC")
+    elif gc == "zgc":
+        args += ["-XX:+UseZGC", f"-XX:ParallelGCThreads={parallel}", f"-XX:ConcGCThreads={concurrent}"]
+    else:
+        args += ["-XX:+UnlockExperimentalVMOptions", "-XX:+UseG1GC", "-XX:G1NewSizePercent=20",
+                 "-XX:G1ReservePercent=20", "-XX:MaxGCPauseMillis=50",
+                 f"-XX:G1HeapRegionSize={region_size_mb(heap_gb)}M",
+                 f"-XX:ParallelGCThreads={parallel}", f"-XX:ConcGCThreads={concurrent}"]
+    return " ".join(args), gc
+
+def tune_jvm(selected_gb=RAM_AUTO, mod_count=0, hardware=None):
+    """
+    Calcula los argumentos de Java para la RAM elegida ('selected_gb', en GB, o
+    RAM_AUTO para la recomendada). Devuelve un dict con el equipo, la
+    recomendación, los argumentos y los avisos si la elección no es segura.
+    """
+    hardware = hardware or probe_hardware()
+    recommended = recommend_heap_gb(hardware, mod_count)
+    auto = selected_gb in (None, "", RAM_AUTO)
+    heap = recommended if auto else max(1, int(float(selected_gb)))
+    java_args, gc = build_jvm_args(heap, hardware)
+
+    warnings = []
+    total_mb, free_mb = hardware["totalMb"], hardware["freeMb"]
+    safe = safe_max_gb(total_mb)
+    if safe is not None and heap > safe:
+        warnings.append(f"{heap} GB supera el máximo seguro para este equipo ({safe} GB de "
+                        f"{total_mb / 1024:.1f} GB): el sistema puede quedarse sin memoria.")
+    elif free_mb and heap * 1024 > free_mb:
+        warnings.append(f"{heap} GB es más de la memoria libre ahora ({free_mb / 1024:.1f} GB): "
+                        "cierra otros programas antes de jugar.")
+    if heap < heap_for_mods(mod_count):
+        warnings.append(f"{heap} GB puede quedarse corto para {mod_count} mods "
+                        f"(se recomiendan {heap_for_mods(mod_count)} GB).")
+    if heap >= COMPRESSED_OOPS_GB:
+        warnings.append(f"Desde {COMPRESSED_OOPS_GB} GB Java pierde los punteros comprimidos "
+                        "y rinde peor que con algo menos de memoria.")
+
+    return {
+        "hardware": hardware,
+        "mods": mod_count,
+        "recommendedGb": recommended,
+        "safeMaxGb": safe,
+        "heapGb": heap,
+        "auto": auto,
+        "gc": gc,
+        "javaArgs": java_args,
+        "warnings": warnings,
+    }
+
+def describe_tuning(tuning):
+    """Líneas de texto del informe (para el log o la línea de comandos)."""
+    hardware = tuning["hardware"]
+    total = f"{hardware['totalMb'] / 1024:.1f} GB" if hardware["totalMb"] else "desconocida"
+    free = f"{hardware['freeMb'] / 1024:.1f} GB" if hardware["freeMb"] else "desconocida"
+    lines = [
+        f"Equipo: {total} de RAM ({free} libre), {hardware['cpuCores']} núcleos; {tuning['mods']} mods instalados.",
+        f"Recomendado: {tuning['recommendedGb']} GB"
+        + (f" (máximo seguro {tuning['safeMaxGb']} GB)." if tuning["safeMaxGb"] else "."),
+        f"Memoria para el juego: {tuning['heapGb']} GB" + (" (automática)" if tuning["auto"] else "")
+        + f", recolector {tuning['gc'].upper()}.",
+        f"Argumentos de Java: {tuning['javaArgs']}",
+    ]
+    lines += [f"AVISO: {warning}" for warning in tuning["warnings"]]
+    return lines
@@ -1,20 +1,22 @@
 import subprocess
 import sys
 import os
-import json
-import shutil
-import requests
-import hashlib
-from datetime import datetime
 
-from pyunpack import Archive  # Para extraer .zip/.rar/.7z
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QLabel, QTextEdit, QVBoxLayout,
     QWidget, QHBoxLayout, QLineEdit, QFileDialog, QProgressBar, QMessageBox, QComboBox
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QPalette, QColor, QIcon
 
+from mxd02_engine import (
+    DEFAULT_MANIFEST_URL, DEFAULT_MINECRAFT_DIR, DEFAULT_MODPACK_DIR, FORGE_VERSIONS_DIR,
+    DOWNLOAD_CONNECTIONS, EXTRACT_THREADS, LAN_CACHE_PORT, LOG_FLUSH_HZ, LOG_MAX_LINES, OPTIONAL_LOG_FILE,
+    EventSink, LanCacheServer, ModpackUpdater, create_cache, create_store, fetch_manifest, lan_cache_peers, load_user_settings,
+    count_installed_mods, parse_version, read_installed_version, save_user_settings,
+)
+from mxd02_jvm import RAM_AUTO, probe_hardware, tune_jvm
+
 # ---------------------------------------------------------
 # CONFIGURACIONES
 # ---------------------------------------------------------
@@ -26,21 +28,6 @@ else:
 
 icon_path = os.path.join(base_path, "resources", "icon.ico")
 
-# (Cambia aquí la URL raw de tu Pastebin con el manifest)
-DEFAULT_MANIFEST_URL = "https://pastebin.com/raw/mPKas0Ci"
-
-# Rutas "universales" en Windows (usando APPDATA)
-DEFAULT_MINECRAFT_DIR = os.path.join(os.getenv("APPDATA"), ".minecraft")
-DEFAULT_MODPACK_DIR   = os.path.join(os.getenv("APPDATA"), ".mxd02modpack")
-FORGE_VERSIONS_DIR    = os.path.join(DEFAULT_MINECRAFT_DIR, "versions")
-
-INSTALLED_VERSION_FILE = "installed_version.txt"  # Dentro de .mxd02modpack
-MAX_DOWNLOAD_RETRIES   = 5  # Reintentos de descarga
-HASH_ALGORITHM         = "sha256"  # para la verificación del ZIP
-
-# Archivo local para guardar la configuración de la GUI (ej. memoria RAM)
-SETTINGS_FILE = "user_settings.json"
-
 
 # ---------------------------------------------------------
 # FUNCIONES AUXILIARES
@@ -109,431 +96,81 @@ def set_dark_theme(app):
     """
     app.setStyleSheet(style_sheet)
 
-def ensure_dir(path):
-    os.makedirs(path, exist_ok=True)
-
-def calc_file_hash(file_path, hash_type="sha256"):
-    """Calcula el hash del archivo (SHA-256 por defecto)."""
-    h = hashlib.new(hash_type)
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            h.update(chunk)
-    return h.hexdigest()
-
-def copy_all(src, dst, log_func=None):
-    """
-    Copia recursivamente el contenido de 'src' dentro de 'dst', 
-    sobrescribiendo archivos existentes.
-    """
-    ensure_dir(dst)
-    for item in os.listdir(src):
-        s = os.path.join(src, item)
-        d = os.path.join(dst, item)
-        if log_func:
-            log_func(f"Copiando de {s} a {d}")
-        if os.path.isdir(s):
-            copy_all(s, d, log_func)
-        else:
-            shutil.copy2(s, d)
-
-def add_or_update_profile(launcher_profiles_path, profile_id, profile_data, logger=None):
-    """
-    Agrega o actualiza el perfil con 'profile_id' en 'launcher_profiles.json'
-    sin sobrescribir otros perfiles. Además, conserva campos personalizados 
-    si el perfil ya existe.
-    """
-    if logger:
-        logger(f"Modificando el archivo launcher_profiles.json en: {launcher_profiles_path}")
-
-    if not os.path.isfile(launcher_profiles_path):
-        data = {"profiles": {}}
-    else:
-        try:
-            with open(launcher_profiles_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            data = {"profiles": {}}
-
-    if "profiles" not in data:
-        data["profiles"] = {}
-
-    old_profile = data["profiles"].get(profile_id, {})
-    # Mezclamos los datos antiguos con los nuevos:
-    # (lo básico aquí es sobreescribir lo que necesitamos,
-    #  y dejar lo que el usuario haya configurado)
-    for key, value in profile_data.items():
-        old_profile[key] = value
-
-    data["profiles"][profile_id] = old_profile
-
-    with open(launcher_profiles_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
-
-    if logger:
-        logger(f"Perfil '{profile_id}' agregado/actualizado en launcher_profiles.json.")
-
-def load_user_settings():
-    """
-    Carga la configuración guardada en SETTINGS_FILE (si existe).
-    Devuelve un dict con 'ram' y cualquier otra configuración que quieras guardar.
-    """
-    if os.path.isfile(SETTINGS_FILE):
-        try:
-            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            pass
-    return {"ram": "4"}  # Valor por defecto (4 GB)
-
-def save_user_settings(settings):
-    """
-    Guarda la configuración en SETTINGS_FILE.
-    """
-    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(settings, f, indent=4)
-
 # ---------------------------------------------------------
 # HILO DE ACTUALIZACIÓN
 # ---------------------------------------------------------
 class UpdateWorker(QThread):
     """
-    Hilo que realiza la actualización con "Full" o "Patch" según el manifest.
+    Hilo que ejecuta un ModpackUpdater (ver mxd02_engine.py) sin bloquear la ventana.
+    Con 'repair' verifica la instalación y repara los archivos dañados en vez de actualizar.
+    El log y el progreso se dejan en self.events (EventSink), que la ventana
+    recoge periódicamente.
     """
-    logSignal = pyqtSignal(str)      
-    progressSignal = pyqtSignal(int)
     finishedSignal = pyqtSignal(bool, str)
 
-    def __init__(self, manifest_url, modpack_dir, forge_versions_dir, minecraft_dir, user_ram, parent=None):
+    def __init__(self, manifest_url, modpack_dir, forge_versions_dir, minecraft_dir, user_ram,
+                 connections=DOWNLOAD_CONNECTIONS, cache=None, repair=False,
+                 lan_peers=None, lan_discover=False, extract_threads=EXTRACT_THREADS, store=None, parent=None):
         super().__init__(parent)
-        self.manifest_url       = manifest_url
-        self.modpack_dir        = modpack_dir
-        self.forge_versions_dir = forge_versions_dir
-        self.minecraft_dir      = minecraft_dir
-        self.user_ram           = user_ram  # e.g. "4" o "6" (GB)
-        self.cancelled          = False
+        # El contenido opcional se deja para OptionalContentWorker: así se puede jugar antes
+        self.updater = ModpackUpdater(manifest_url, modpack_dir, forge_versions_dir, minecraft_dir,
+                                      user_ram, connections=connections, cache=cache,
+                                      lan_peers=lan_peers, lan_discover=lan_discover,
+                                      extract_threads=extract_threads, defer_optional=True, store=store)
+        self.events  = self.updater.events
+        self.repair  = repair
 
     def run(self):
-        try:
-            # 1. Descargar manifest
-            self.log("Descargando manifest...")
-            manifest_data = self.download_json(self.manifest_url)
-            if not manifest_data:
-                raise Exception("No se pudo obtener el manifest o está vacío.")
-
-            latest_version = manifest_data.get("latestVersion")
-            full_info = manifest_data.get("full", {})
-
-            if not latest_version or "version" not in full_info:
-                raise Exception("El manifest no contiene la sección 'full' adecuada o 'latestVersion'.")
-
-            # 2. Leer versión instalada (si existe)
-            installed_version_path = os.path.join(self.modpack_dir, INSTALLED_VERSION_FILE)
-            current_version = None
-            if os.path.isfile(installed_version_path):
-                with open(installed_version_path, 'r', encoding='utf-8') as f:
-                    current_version = f.read().strip()
-
-            self.log(f"Versión instalada: {current_version if current_version else 'Ninguna'}")
-            self.log(f"Última versión disponible: {latest_version}")
-
-            # 3. Si ya está en la última versión => mostrar mensaje y salir
-            if current_version == latest_version:
-                self.log("Ya tienes la última versión instalada. No es necesario actualizar.")
-                self.finishedSignal.emit(False, f"{latest_version} (ya instalado)")
-                return
-
-            # 4. Instalar Full Pack si la versión instalada no coincide con el Full más reciente
-            if not current_version or self.is_version_greater(full_info["version"], current_version):
-                self.log(f"Instalando Full Pack {full_info['version']}...")
-                self.install_full(full_info)
-                current_version = full_info["version"]
-
-            # 5. Aplicar parches solo si se requiere
-            patches = {key: value for key, value in manifest_data.items() if key.startswith("patch")}
-            for patch_key, patch_info in sorted(patches.items()):
-                patch_version = patch_info.get("version")
-                if self.is_version_greater(patch_version, current_version):
-                    self.log(f"Aplicando {patch_key} para actualizar a la versión {patch_version}...")
-                    self.install_patch(patch_info)
-                    current_version = patch_version
-
-            # 6. Finalización
-            self.finishedSignal.emit(False, latest_version)
-
-        except Exception as e:
-            self.log(f"ERROR: {e}")
-            self.finishedSignal.emit(True, str(e))
+        if self.repair:
+            self.finishedSignal.emit(*self.updater.repair())
+        else:
+            self.finishedSignal.emit(*self.updater.update())
 
-    def is_version_greater(self, v1, v2):
-        """
-        Compara strings de versión muy simple (p.e. "0.31.1" > "0.31").
-        Puedes reemplazarlo con un parser más robusto si quieres.
-        """
-        def parse_version(v):
-            return list(map(int, v.split(".")))
-        return parse_version(v1) > parse_version(v2)
+    def cancel(self):
+        self.updater.cancel()
 
-    def download_json(self, url):
-        """Descarga y parsea JSON con reintentos."""
-        for attempt in range(MAX_DOWNLOAD_RETRIES):
-            if self.cancelled:
-                return None
-            try:
-                r = requests.get(url, timeout=15)
-                r.raise_for_status()
-                return r.json()
-            except Exception as e:
-                self.log(f"Fallo al descargar manifest (intento {attempt+1}/{MAX_DOWNLOAD_RETRIES}): {e}")
-        return None
-
-    def install_full(self, full_info):
-        """Descarga e instala la versión Full."""
-        version       = full_info["version"]
-        url           = full_info["url"]
-        filename      = full_info["filename"]
-        expected_hash = full_info.get("hash")  # sha-256
-
-        self.log(f"Instalando Full Pack {version}...")
-
-        # 1. Descargar el ZIP (con reintentos)
-        archive_path = self.download_file_with_retries(url, filename, expected_hash)
-        if not archive_path:
-            raise Exception("No se pudo descargar o verificar el Full Pack.")
-
-        # 2. Descomprimir en carpeta temporal
-        temp_dir = os.path.join(self.modpack_dir, "_temp_full_")
-        ensure_dir(temp_dir)
-        self.log("Descomprimiendo Full Pack...")
-        self.extract_archive(archive_path, temp_dir)
-
-        # 3. Copiar la carpeta .mxd02modpack
-        src_modpack = os.path.join(temp_dir, ".mxd02modpack")
-        if os.path.isdir(src_modpack):
-            self.log("Copiando .mxd02modpack...")
-            copy_all(src_modpack, self.modpack_dir, self.log)
-
-        # 4. Copiar forgeVersion a .minecraft/versions (si existe)
-        forge_version_dir = os.path.join(temp_dir, "forgeVersion")
-        if os.path.isdir(forge_version_dir):
-            self.log("Copiando forgeVersion en .minecraft/versions...")
-            for item in os.listdir(forge_version_dir):
-                s = os.path.join(forge_version_dir, item)
-                d = os.path.join(self.forge_versions_dir, item)
-                if os.path.isdir(s):
-                    copy_all(s, d, self.log)
-                else:
-                    shutil.copy2(s, d)
-
-        # 5. Copiar libraries a .minecraft directory (si existe)
-        libraries_dir = os.path.join(temp_dir, "libraries")
-        if os.path.isdir(libraries_dir):
-            self.log("Copiando libraries en .minecraft...")
-            for item in os.listdir(libraries_dir):
-                s = os.path.join(libraries_dir, item)
-                d = os.path.join(self.minecraft_dir, "libraries", item)
-                if os.path.isdir(s):
-                    copy_all(s, d, self.log)
-                else:
-                    shutil.copy2(s, d)
-
-        # 6. Copiar el contenido de "additional_files" si existe
-        additional_dir = os.path.join(temp_dir, "additional_files")
-        if os.path.isdir(additional_dir):
-            self.log("Se encontró la carpeta 'additional_files'. Copiando su contenido a .mxd02modpack...")
-            copy_all(additional_dir, self.modpack_dir)
-        else:
-            self.log("No se encontró la carpeta 'additional_files' en el Full Pack.")
-
-        # 7. Guardar la versión instalada en installed_version.txt
-        installed_version_path = os.path.join(self.modpack_dir, INSTALLED_VERSION_FILE)
-        with open(installed_version_path, 'w', encoding='utf-8') as f:
-            f.write(version)
-
-        # 8. (Opcional) Agregar/actualizar perfil en launcher_profiles.json
-        launcher_profiles_path = os.path.join(self.minecraft_dir, "launcher_profiles.json")
-        # Crea un ID único para el perfil
-        profile_id = "23fc205a599a1340b3cb7ee096b9760d"
-        # Prepara el JSON del perfil
-        profile_data = {
-            "created": "2024-12-30T05:01:57.789Z",
-            "gameDir": self.modpack_dir,
-            "icon": "Furnace_On",
-            "javaArgs": f"-Xmx{self.user_ram}G -XX:+UnlockExperimentalVMOptions -XX:+UseG1GC -XX:G1NewSizePercent=20 -XX:G1ReservePercent=20 -XX:MaxGCPauseMillis=50 -XX:G1HeapRegionSize=32M",
-            "lastUsed": datetime.utcnow().isoformat() + "Z",
-            "lastVersionId": "1.19.2-forge-43.4.0",
-            "name": "mxd02modpack",
-            "type": "custom"
-        }
-        add_or_update_profile(launcher_profiles_path, profile_id, profile_data, logger=self.log)
+class OptionalContentWorker(QThread):
+    """
+    Descarga en segundo plano el contenido opcional (shaders, resourcepacks...)
+    que UpdateWorker dejó pendiente, con una sola conexión y un solo hilo de
+    extracción para no quitarle recursos al juego. Se arranca con prioridad baja
+    y tiene su propio log (OPTIONAL_LOG_FILE) y su propia barra de progreso.
+    """
+    finishedSignal = pyqtSignal(bool, str)
 
-        # Limpieza final
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        os.remove(archive_path)
+    def __init__(self, manifest_url, modpack_dir, forge_versions_dir, minecraft_dir, user_ram,
+                 cache=None, lan_peers=None, store=None, parent=None):
+        super().__init__(parent)
+        self.updater = ModpackUpdater(manifest_url, modpack_dir, forge_versions_dir, minecraft_dir,
+                                      user_ram, connections=1, cache=cache,
+                                      events=EventSink(os.path.join(modpack_dir, OPTIONAL_LOG_FILE)),
+                                      lan_peers=lan_peers, extract_threads=1, store=store)
+        self.events  = self.updater.events
 
-        self.log(f"Instalación Full Pack {version} completada.")
+    def run(self):
+        self.finishedSignal.emit(*self.updater.install_optional())
 
-    def install_patch(self, patch_info):
-        """
-        Descarga un ZIP que contiene solo los archivos modificados. 
-        Simplemente se descomprime y se copian/reescriben los archivos en .mxd02modpack 
-        (y/o la carpeta de forgeVersion, si aplica).
-        """
-        version       = patch_info["version"]
-        url           = patch_info["url"]
-        filename      = patch_info["filename"]
-        expected_hash = patch_info.get("hash")
-
-        self.log(f"Instalando Parche {version}...")
-
-        archive_path = self.download_file_with_retries(url, filename, expected_hash)
-        if not archive_path:
-            raise Exception("No se pudo descargar o verificar el Parche.")
-
-        temp_dir = os.path.join(self.modpack_dir, "_temp_patch_")
-        ensure_dir(temp_dir)
-        self.log("Descomprimiendo Parche...")
-        self.extract_archive(archive_path, temp_dir)
-
-        files_to_remove = patch_info.get("filesToRemove", [])
-        for rel_path in files_to_remove:
-            # Suponiendo que rel_path es relativo a .mxd02modpack
-            target_path = os.path.join(self.modpack_dir, rel_path)
-            if os.path.exists(target_path):
-                self.log(f"Eliminando archivo obsoleto: {target_path}")
-                os.remove(target_path)
-
-        dir_to_remove = patch_info.get("dirToRemove", [])
-        for rel_path in dir_to_remove:
-            # Suponiendo que rel_path es relativo a .mxd02modpack
-            target_path = os.path.join(self.modpack_dir, rel_path)
-            if os.path.exists(target_path):
-                self.log(f"Eliminando carpeta obsoleta: {target_path}")
-                try:
-                    os.chmod(target_path, 0o777)  # Cambiar permisos
-                    shutil.rmtree(target_path)
-                except Exception as e:
-                    self.log(f"ERROR al eliminar la carpeta: {e}")
-
-        # En el parche, podrías tener la misma estructura:
-        #   .mxd02modpack/
-        #   forgeVersion/
-        #   resourcepacks/
-        #   additional_files/
-        #   u otras carpetas
-        # Copia igual que en full, pero sólo lo que exista
-        src_modpack = os.path.join(temp_dir, ".mxd02modpack")
-        if os.path.isdir(src_modpack):
-            self.log("Copiando parche .mxd02modpack...")
-            copy_all(src_modpack, self.modpack_dir, self.log)
-
-        forge_version_dir = os.path.join(temp_dir, "forgeVersion")
-        if os.path.isdir(forge_version_dir):
-            self.log("Copiando parche forgeVersion en .minecraft/versions...")
-            for item in os.listdir(forge_version_dir):
-                s = os.path.join(forge_version_dir, item)
-                d = os.path.join(self.forge_versions_dir, item)
-                if os.path.isdir(s):
-                    copy_all(s, d, self.log)
-                else:
-                    shutil.copy2(s, d)
-
-        #Copiar el contenido de "additional_files" si existe
-        additional_dir = os.path.join(temp_dir, "additional_files")
-        if os.path.isdir(additional_dir):
-            self.log("Se encontró la carpeta 'additional_files'. Copiando su contenido a .mxd02modpack...")
-            copy_all(additional_dir, self.modpack_dir)
-        else:
-            self.log("No se encontró la carpeta 'additional_files' en el Parche.")
-
-        libraries_dir = os.path.join(temp_dir, "libraries")
-        if os.path.isdir(libraries_dir):
-            self.log("Copiando parche libraries en .minecraft...")
-            for item in os.listdir(libraries_dir):
-                s = os.path.join(libraries_dir, item)
-                d = os.path.join(self.minecraft_dir, "libraries", item)
-                if os.path.isdir(s):
-                    copy_all(s, d, self.log)
-                else:
-                    shutil.copy2(s, d)
-
-        # Actualizamos la versión instalada (esto depende de tu criterio)
-        installed_version_path = os.path.join(self.modpack_dir, INSTALLED_VERSION_FILE)
-        with open(installed_version_path, 'w', encoding='utf-8') as f:
-            f.write(version)
-
-        # También actualizamos el perfil con la RAM que el usuario eligió:
-        launcher_profiles_path = os.path.join(self.minecraft_dir, "launcher_profiles.json")
-        profile_id = "23fc205a599a1340b3cb7ee096b9760d"
-        profile_data = {
-            # Solo actualizamos lastUsed y javaArgs si quieres
-            "lastUsed": datetime.utcnow().isoformat() + "Z",
-            "javaArgs": f"-Xmx{self.user_ram}G -XX:+UnlockExperimentalVMOptions -XX:+UseG1GC -XX:G1NewSizePercent=20 -XX:G1ReservePercent=20 -XX:MaxGCPauseMillis=50 -XX:G1HeapRegionSize=32M",
-        }
-        add_or_update_profile(launcher_profiles_path, profile_id, profile_data, logger=self.log)
+    def cancel(self):
+        self.updater.cancel()
 
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        os.remove(archive_path)
+class UpdateCheckWorker(QThread):
+    """
+    Comprueba en segundo plano si hay una versión nueva, para no bloquear
+    la ventana mientras se descarga el manifest.
+    """
+    resultSignal = pyqtSignal(object)  # dict del manifest
+    errorSignal = pyqtSignal(str)
 
-        self.log(f"Parche {version} instalado con éxito.")
+    def __init__(self, manifest_url, modpack_dir, parent=None):
+        super().__init__(parent)
+        self.manifest_url = manifest_url
+        self.modpack_dir  = modpack_dir
 
-    def download_file_with_retries(self, url, filename, expected_hash=None):
-        """
-        Descarga un archivo con reintentos, verifica el hash si se proporciona.
-        Retorna la ruta local al archivo o None si falla.
-        """
-        temp_download_dir = os.path.join(self.modpack_dir, "_temp_down_")
-        ensure_dir(temp_download_dir)
-        dest_path = os.path.join(temp_download_dir, filename)
-
-        for attempt in range(MAX_DOWNLOAD_RETRIES):
-            if self.cancelled:
-                return None
-            try:
-                self.log(f"Descargando {filename} (intento {attempt+1}/{MAX_DOWNLOAD_RETRIES})...")
-                self.progressSignal.emit(0)
-                self._download(url, dest_path)
-                if expected_hash:
-                    file_hash = calc_file_hash(dest_path, HASH_ALGORITHM)
-                    if file_hash.lower() != expected_hash.lower():
-                        raise Exception(f"Hash distinto. Esperado={expected_hash}, obtenido={file_hash}")
-                return dest_path
-            except Exception as e:
-                self.log(f"Error en descarga {filename}: {e}")
-        return None
-
-    def _download(self, url, dest_path):
-        """Descarga con `requests`, actualizando barra de progreso."""
-        resp = requests.get(url, stream=True, timeout=15)
-        resp.raise_for_status()
-        total = int(resp.headers.get('content-length', 0))
-        downloaded = 0
-
-        with open(dest_path, 'wb') as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                if self.cancelled:
-                    return
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total > 0:
-                        prog = int(downloaded * 100 / total)
-                        self.progressSignal.emit(prog)
-
-    def extract_archive(self, archive_path, extract_to):
-        self.progressSignal.emit(0)
+    def run(self):
         try:
-            Archive(archive_path).extractall(extract_to)
-            self.log(f"Archivo extraído correctamente: {archive_path}")
+            self.resultSignal.emit(fetch_manifest(self.manifest_url, self.modpack_dir, timeout=10))
         except Exception as e:
-            self.log(f"ERROR al descomprimir el archivo: {e}")
-            raise
-        self.progressSignal.emit(100)
-
-    def log(self, message):
-        self.logSignal.emit(message)
-
-    def cancel(self):
-        self.cancelled = True
+            self.errorSignal.emit(str(e))
 
 import os
 
@@ -612,30 +249,57 @@ class MainWindow(QMainWindow):
         row_ram = QHBoxLayout()
         row_ram.addWidget(QLabel("Memoria RAM (GB):"))
         self.ramCombo = QComboBox()
+        self.hardware = probe_hardware()
+        recommended = tune_jvm(RAM_AUTO, self.installed_mods(), self.hardware)["recommendedGb"]
+        self.ramCombo.addItem(f"Auto ({recommended})", RAM_AUTO)
         ram_options = ["2", "3", "4", "6", "8", "12", "16", "24", "32"]
-        self.ramCombo.addItems(ram_options)
-        if self.user_settings["ram"] in ram_options:
-            self.ramCombo.setCurrentText(self.user_settings["ram"])
-        else:
-            self.ramCombo.setCurrentText("4")
+        for option in ram_options:
+            self.ramCombo.addItem(option, option)
+        index = self.ramCombo.findData(self.user_settings.get("ram", RAM_AUTO))
+        self.ramCombo.setCurrentIndex(max(index, 0))
+        self.ramCombo.currentIndexChanged.connect(self.update_ram_hint)
         row_ram.addWidget(self.ramCombo)
         layout.addLayout(row_ram)
 
+        # ---- Recomendación y avisos sobre la RAM elegida (ver mxd02_jvm.py)
+        self.ramHintLabel = QLabel()
+        self.ramHintLabel.setWordWrap(True)
+        layout.addWidget(self.ramHintLabel)
+        self.update_ram_hint()
+
         # ---- Área de texto para logs
         self.logArea = QTextEdit()
         self.logArea.setReadOnly(True)
+        self.logArea.document().setMaximumBlockCount(LOG_MAX_LINES)
         layout.addWidget(self.logArea)
 
         # ---- Barra de progreso
         self.progressBar = QProgressBar()
         layout.addWidget(self.progressBar)
 
+        # ---- Progreso del contenido opcional (solo visible mientras se descarga)
+        self.optionalLabel = QLabel("Contenido opcional (en segundo plano):")
+        self.optionalBar = QProgressBar()
+        self.optionalLabel.setVisible(False)
+        self.optionalBar.setVisible(False)
+        layout.addWidget(self.optionalLabel)
+        layout.addWidget(self.optionalBar)
+
+        # ---- Temporizador que recoge el log/progreso del hilo de instalación
+        self.eventTimer = QTimer(self)
+        self.eventTimer.setInterval(1000 // LOG_FLUSH_HZ)
+        self.eventTimer.timeout.connect(self.flush_worker_events)
+
         # ---- Fila de botones: Instalar/Actualizar y Abrir Minecraft
         row_buttons = QHBoxLayout()
         self.installBtn = QPushButton("INSTALAR / ACTUALIZAR")
         self.installBtn.clicked.connect(self.on_install_clicked)
         row_buttons.addWidget(self.installBtn)
 
+        self.repairBtn = QPushButton("VERIFICAR / REPARAR")
+        self.repairBtn.clicked.connect(self.on_repair_clicked)
+        row_buttons.addWidget(self.repairBtn)
+
         self.openMCBtn = QPushButton("ABRIR MINECRAFT")
         self.openMCBtn.clicked.connect(self.on_open_minecraft)
         row_buttons.addWidget(self.openMCBtn)
@@ -652,7 +316,14 @@ class MainWindow(QMainWindow):
         container.setLayout(layout)
         self.setCentralWidget(container)
 
-        self.workerThread = None
+        self.workerThread   = None
+        self.optionalThread = None
+        self.checkThread    = None
+        self.lanServer      = None
+
+        # Compartir la caché de descargas con otros equipos de la red local (opcional)
+        if self.user_settings.get("lan_cache_serve"):
+            self.start_lan_server()
 
         # Al final del init, chequeamos si hay actualizaciones
         self.check_for_updates_on_start()
@@ -660,29 +331,32 @@ class MainWindow(QMainWindow):
     def check_for_updates_on_start(self):
         """
         Verifica si hay una versión o parche más nuevo que el actual.
-        De manera sencilla y sin hilos: descarga el manifest, lee la versión instalada,
-        y compara. Si hay algo más nuevo, muestra un mensaje.
+        El manifest se descarga en un hilo aparte (UpdateCheckWorker) para que
+        la ventana aparezca enseguida; el resultado llega a on_update_check_result.
         """
+        manifest_url = self.manifestEdit.text().strip()
+        if not manifest_url:
+            return  # Si no hay URL, no hacemos nada
+
+        if not read_installed_version(self.modpackPathEdit.text()):
+            # No hay nada instalado => no decimos nada especial
+            return
+
+        self.checkThread = UpdateCheckWorker(manifest_url, self.modpackPathEdit.text())
+        self.checkThread.resultSignal.connect(self.on_update_check_result)
+        self.checkThread.errorSignal.connect(
+            lambda error: self.logArea.append(f"No se pudo verificar actualizaciones: {error}"))
+        self.checkThread.start()
+
+    def on_update_check_result(self, data):
+        """Compara el manifest descargado con la versión instalada y avisa si hay algo nuevo."""
         try:
-            manifest_url = self.manifestEdit.text().strip()
-            if not manifest_url:
-                return  # Si no hay URL, no hacemos nada
-            r = requests.get(manifest_url, timeout=10)
-            r.raise_for_status()
-            data = r.json()
             latest_version = data.get("latestVersion")
-            full_info = data.get("full", {})
             patch_info = data.get("patch", {})
 
             # Leemos versión instalada
-            installed_version_path = os.path.join(self.modpackPathEdit.text(), INSTALLED_VERSION_FILE)
-            current_version = None
-            if os.path.isfile(installed_version_path):
-                with open(installed_version_path, 'r', encoding='utf-8') as f:
-                    current_version = f.read().strip()
-
+            current_version = read_installed_version(self.modpackPathEdit.text())
             if not current_version:
-                # No hay nada instalado => no decimos nada especial
                 return
 
             # Comparar con "latestVersion"
@@ -710,10 +384,25 @@ class MainWindow(QMainWindow):
             self.logArea.append(f"No se pudo verificar actualizaciones: {e}")
 
     def is_version_greater(self, v1, v2):
-        def parse_version(v):
-            return list(map(int, v.split(".")))
         return parse_version(v1) > parse_version(v2)
 
+    def installed_mods(self):
+        return count_installed_mods(self.modpackPathEdit.text().strip())
+
+    def update_ram_hint(self):
+        """Muestra la RAM recomendada para este equipo y avisa si la elegida no es segura."""
+        tuning = tune_jvm(self.ramCombo.currentData(), self.installed_mods(), self.hardware)
+        text = f"Recomendado: {tuning['recommendedGb']} GB ({tuning['mods']} mods, {self.hardware['cpuCores']} núcleos"
+        if self.hardware["totalMb"]:
+            text += f", {self.hardware['totalMb'] / 1024:.1f} GB de RAM"
+        text += ")."
+        if tuning["warnings"]:
+            text += "\n⚠ " + "\n⚠ ".join(tuning["warnings"])
+            self.ramHintLabel.setStyleSheet("color: orange;")
+        else:
+            self.ramHintLabel.setStyleSheet("")
+        self.ramHintLabel.setText(text)
+
     def browse_modpack_dir(self):
         path = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta .mxd02modpack", self.modpackPathEdit.text())
         if path:
@@ -730,6 +419,12 @@ class MainWindow(QMainWindow):
             self.minecraftPathEdit.setText(path)
 
     def on_install_clicked(self):
+        self.start_worker(repair=False)
+
+    def on_repair_clicked(self):
+        self.start_worker(repair=True)
+
+    def start_worker(self, repair):
         manifest_url = self.manifestEdit.text().strip()
         modpack_dir  = self.modpackPathEdit.text().strip()
         forge_dir    = self.forgePathEdit.text().strip()
@@ -740,20 +435,37 @@ class MainWindow(QMainWindow):
             return
 
         # Guardamos la configuración del usuario (RAM)
-        self.user_settings["ram"] = self.ramCombo.currentText()
+        self.user_settings["ram"] = self.ramCombo.currentData()
         save_user_settings(self.user_settings)
 
         self.logArea.clear()
         self.installBtn.setEnabled(False)
+        self.repairBtn.setEnabled(False)
         self.cancelBtn.setEnabled(True)
         self.progressBar.setValue(0)
 
         # Crear hilo
-        self.workerThread = UpdateWorker(manifest_url, modpack_dir, forge_dir, minecraft_dir, user_ram=self.user_settings["ram"])
-        self.workerThread.logSignal.connect(self.append_log)
-        self.workerThread.progressSignal.connect(self.update_progress)
+        self.workerThread = UpdateWorker(manifest_url, modpack_dir, forge_dir, minecraft_dir, user_ram=self.user_settings["ram"],
+                                         connections=self.user_settings.get("connections", DOWNLOAD_CONNECTIONS),
+                                         cache=create_cache(self.user_settings), repair=repair,
+                                         lan_peers=lan_cache_peers(self.user_settings),
+                                         lan_discover=self.user_settings.get("lan_cache_discover", False),
+                                         extract_threads=self.user_settings.get("extract_threads", EXTRACT_THREADS),
+                                         store=create_store(self.user_settings))
         self.workerThread.finishedSignal.connect(self.on_finished)
         self.workerThread.start()
+        self.eventTimer.start()
+
+    def start_lan_server(self):
+        cache = create_cache(self.user_settings)
+        if not cache:
+            self.logArea.append("La caché en red local necesita la caché de descargas (cache_max_gb > 0).")
+            return
+        try:
+            self.lanServer = LanCacheServer(cache, port=int(self.user_settings.get("lan_cache_port", LAN_CACHE_PORT))).start()
+            self.logArea.append(f"Compartiendo la caché de descargas en la red local (puerto {self.lanServer.port}).")
+        except OSError as e:
+            self.logArea.append(f"No se pudo iniciar la caché en red local: {e}")
 
     def on_open_minecraft(self):
         # 1) Primero intentamos abrir rutas comunes
@@ -761,22 +473,101 @@ class MainWindow(QMainWindow):
             return
         open_minecraft_store_edition()
 
+    def start_optional_worker(self, pending):
+        """Arranca la descarga del contenido opcional pendiente con prioridad baja."""
+        self.append_log(f"Descargando en segundo plano el contenido opcional: {', '.join(pending)}. "
+                        "Ya puedes abrir Minecraft.")
+        self.optionalThread = OptionalContentWorker(self.manifestEdit.text().strip(),
+                                                    self.modpackPathEdit.text().strip(),
+                                                    self.forgePathEdit.text().strip(),
+                                                    self.minecraftPathEdit.text().strip(),
+                                                    user_ram=self.user_settings["ram"],
+                                                    cache=create_cache(self.user_settings),
+                                                    lan_peers=lan_cache_peers(self.user_settings),
+                                                    store=create_store(self.user_settings))
+        self.optionalThread.finishedSignal.connect(self.on_optional_finished)
+        self.optionalBar.setValue(0)
+        self.optionalLabel.setVisible(True)
+        self.optionalBar.setVisible(True)
+        self.cancelBtn.setEnabled(True)
+        self.optionalThread.start(QThread.LowPriority)
+        self.eventTimer.start()
+
+    def on_optional_finished(self, error_occurred, info):
+        self.flush_worker_events()
+        self.optionalThread.events.close()
+        self.optionalThread = None
+        self.eventTimer.stop()
+        self.optionalLabel.setVisible(False)
+        self.optionalBar.setVisible(False)
+        self.installBtn.setEnabled(True)
+        self.repairBtn.setEnabled(True)
+        self.cancelBtn.setEnabled(False)
+        if error_occurred:
+            self.append_log(f"No se pudo completar el contenido opcional: {info}. "
+                            "Se reintentará en la próxima actualización.")
+        else:
+            self.append_log(f"Contenido opcional instalado: {info}")
+
     def on_cancel_clicked(self):
-        if self.workerThread:
+        if self.workerThread and self.workerThread.isRunning():
             self.workerThread.cancel()
             self.append_log("Cancelando operación...")
+        elif self.optionalThread:
+            self.optionalThread.cancel()
+            self.append_log("Cancelando la descarga del contenido opcional...")
 
     def update_progress(self, value):
         self.progressBar.setValue(value)
 
+    def flush_worker_events(self):
+        """Pasa a la ventana, de una sola vez, el log y el progreso acumulados por los hilos."""
+        if self.workerThread:
+            lines, value = self.workerThread.events.drain()
+            if lines:
+                self.append_log("\n".join(lines))
+            if value is not None:
+                self.update_progress(value)
+        if self.optionalThread:
+            lines, value = self.optionalThread.events.drain()
+            if lines:
+                self.append_log("\n".join(f"[opcional] {line}" for line in lines))
+            if value is not None:
+                self.optionalBar.setValue(value)
+
     def on_finished(self, error_occurred, info):
-        self.installBtn.setEnabled(True)
-        self.cancelBtn.setEnabled(False)
+        self.eventTimer.stop()
+        self.flush_worker_events()
+        self.workerThread.events.close()
+        pending = [] if error_occurred else self.workerThread.updater.optional_pending
+        if pending:
+            # Instalar/Reparar siguen desactivados hasta que termine el contenido opcional
+            self.start_optional_worker(pending)
+        else:
+            self.installBtn.setEnabled(True)
+            self.repairBtn.setEnabled(True)
+            self.cancelBtn.setEnabled(False)
         if error_occurred:
             QMessageBox.critical(self, "Error", f"Se produjo un error:\n{info}")
+        elif pending:
+            QMessageBox.information(self, "Completado",
+                                    f"Versión instalada: {info}. Ya puedes jugar; el contenido opcional "
+                                    "se sigue descargando en segundo plano.")
         else:
             QMessageBox.information(self, "Completado", f"Proceso finalizado. Versión instalada: {info}")
 
+    def closeEvent(self, event):
+        # No se cierra con hilos escribiendo en disco: se cancelan y se espera a que paren
+        for thread in (self.workerThread, self.optionalThread):
+            if thread and thread.isRunning():
+                thread.cancel()
+                thread.wait()
+        # La comprobación de inicio también escribe en disco (la copia del manifest);
+        # no se puede cancelar, pero termina como mucho en su timeout
+        if self.checkThread and self.checkThread.isRunning():
+            self.checkThread.wait()
+        super().closeEvent(event)
+
     def append_log(self, text):
         self.logArea.append(text)
         print(text)  # opcional para la consola
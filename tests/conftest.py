@@ -0,0 +1,43 @@
+"""
+Configuración común de las pruebas (pytest).
+
+El motor calcula sus rutas por defecto con APPDATA (solo existe en Windows),
+así que se apunta a una carpeta temporal antes de importarlo.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("APPDATA", tempfile.mkdtemp(prefix="mxd02_appdata_"))
+
+from mxd02_bench import start_server  # noqa: E402
+
+
+def serve(serve_dir, **kwargs):
+    serve_dir.mkdir()
+    httpd, url, stats = start_server(str(serve_dir), **kwargs)
+    yield serve_dir, url, stats
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Servidor HTTP local (el del benchmark) sobre tmp_path/srv: (carpeta, url, contadores)."""
+    yield from serve(tmp_path / "srv")
+
+
+@pytest.fixture
+def server_without_ranges(tmp_path):
+    """Como 'server', pero ignora Range y siempre envía el archivo completo."""
+    yield from serve(tmp_path / "srv", ranges=False)
+
+
+@pytest.fixture(autouse=True)
+def settings_dir(tmp_path, monkeypatch):
+    """user_settings.json se lee de la carpeta actual: cada prueba usa la suya."""
+    monkeypatch.chdir(tmp_path)
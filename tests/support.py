@@ -0,0 +1,78 @@
+"""Utilidades compartidas por las pruebas: packs, manifests e instancias."""
+import hashlib
+import json
+import os
+
+from mxd02_bench import write_zip
+from mxd02_engine import EventSink, ModpackUpdater
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return sha256(f.read())
+
+def write_pack(serve_dir, name, files):
+    """Escribe un .zip en la carpeta del servidor y devuelve su sha256."""
+    path = os.path.join(str(serve_dir), name)
+    write_zip(path, files)
+    return file_sha256(path)
+
+def write_manifest(serve_dir, name, data):
+    with open(os.path.join(str(serve_dir), name), "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+def file_entries(serve_dir, url, files):
+    """Lista 'files' del manifest, con cada archivo servido aparte con su propia URL."""
+    entries = []
+    for path, data in sorted(files.items()):
+        blob = sha256(data)
+        with open(os.path.join(str(serve_dir), blob), "wb") as f:
+            f.write(data)
+        entries.append({"path": path, "size": len(data), "sha256": blob, "url": f"{url}/{blob}"})
+    return entries
+
+def instance_dirs(base, minecraft_dir=None):
+    """Crea (y devuelve) las carpetas .mxd02modpack, versions y .minecraft de una instancia."""
+    minecraft_dir = minecraft_dir or os.path.join(str(base), "minecraft")
+    dirs = (os.path.join(str(base), "mxd02modpack"), os.path.join(minecraft_dir, "versions"), minecraft_dir)
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+    return dirs
+
+def new_updater(base, manifest_url, minecraft_dir=None, **kwargs):
+    """ModpackUpdater sobre una instancia nueva (o existente) en 'base'."""
+    kwargs.setdefault("events", EventSink())
+    return ModpackUpdater(manifest_url, *instance_dirs(base, minecraft_dir), "4", **kwargs)
+
+def pack_files():
+    """Archivos de un pack de prueba: mods y configuración de la instancia y librerías comunes."""
+    files = {f".mxd02modpack/mods/mod_{i}.jar": os.urandom(1024 + i) for i in range(60)}
+    files.update({f".mxd02modpack/config/c_{i}.toml": os.urandom(300) for i in range(40)})
+    files.update({f"libraries/net/lib/lib_{i}.jar": os.urandom(2048) for i in range(20)})
+    return files
+
+def installed(updater):
+    """{ruta: contenido} de lo instalado, con las rutas como en el pack pero sin '.mxd02modpack/'."""
+    files = {}
+    for d in (os.path.join(updater.modpack_dir, "mods"), os.path.join(updater.modpack_dir, "config"),
+              os.path.join(updater.minecraft_dir, "libraries")):
+        for dirpath, _, filenames in os.walk(d):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, os.path.dirname(d)).replace(os.sep, "/")] = f.read()
+    return files
+
+def expected(files):
+    """Lo que installed() debe devolver tras instalar un pack con 'files'."""
+    return {name.replace(".mxd02modpack/", "", 1): data for name, data in files.items()}
+
+def extract(base, archive_path, threads):
+    """Instala 'archive_path' en una instancia nueva con 'threads' hilos. Devuelve (updater, installed())."""
+    updater = new_updater(base, "http://127.0.0.1/manifest.json", extract_threads=threads)
+    updater.install_archive(str(archive_path), "_temp_", "Full Pack")
+    updater.close()
+    return updater, installed(updater)
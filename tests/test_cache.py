@@ -0,0 +1,55 @@
+"""Pruebas de la caché de descargas (BlobCache)."""
+import os
+
+from mxd02_engine import BlobCache
+from support import file_entries, file_sha256, new_updater, sha256, write_manifest
+
+
+def put(cache, tmp_path, data):
+    src = tmp_path / f"src_{sha256(data)}"
+    src.write_bytes(data)
+    return cache.put(str(src), sha256(data))
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = BlobCache(str(tmp_path / "cache"), 250)
+    a, b, c = b"a" * 100, b"b" * 100, b"c" * 100
+    path_a, path_b = put(cache, tmp_path, a), put(cache, tmp_path, b)
+    os.utime(path_a, (1000, 1000))
+    os.utime(path_b, (2000, 2000))
+    assert cache.get(sha256(a)) == path_a  # Usar 'a' lo vuelve el más reciente
+
+    put(cache, tmp_path, c)
+
+    assert cache.get(sha256(b)) is None
+    assert cache.get(sha256(a)) and cache.get(sha256(c))
+    assert cache.total_size == 200
+
+
+def test_file_larger_than_the_budget_is_not_cached(tmp_path):
+    cache = BlobCache(str(tmp_path / "cache"), 50)
+    src = tmp_path / "big"
+    src.write_bytes(b"x" * 100)
+    assert cache.put(str(src), sha256(b"x" * 100)) == str(src)
+    assert cache.get(sha256(b"x" * 100)) is None
+
+
+def test_damaged_file_is_dropped_and_downloaded_again(server, tmp_path):
+    serve_dir, url, _ = server
+    data = os.urandom(4096)
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": {
+        "version": "1.0", "files": file_entries(serve_dir, url, {".mxd02modpack/mods/m.jar": data})}})
+    cache = BlobCache(str(tmp_path / "cache"), 1024 ** 3)
+    error, info = new_updater(tmp_path / "a", f"{url}/manifest.json", cache=cache).update()
+    assert not error, info
+    with open(cache.path_for(sha256(data)), "r+b") as f:
+        f.write(b"\0" * 16)
+
+    updater = new_updater(tmp_path / "b", f"{url}/manifest.json", cache=cache)
+    error, info = updater.update()
+
+    assert not error, info
+    jar = os.path.join(updater.modpack_dir, "mods", "m.jar")
+    assert file_sha256(jar) == sha256(data)
+    assert updater.verify(updater.download_json(f"{url}/manifest.json"), full=True)["mismatched"] == []
+    assert file_sha256(cache.get(sha256(data))) == sha256(data)
@@ -0,0 +1,55 @@
+"""Pruebas de la línea de comandos (mxd02_cli.py)."""
+import os
+
+import mxd02_cli
+from support import write_manifest, write_pack
+
+
+def make_full_pack(serve_dir, url, libraries=40):
+    """Full Pack 1.0 con unos mods y muchas librerías (que van a la carpeta .minecraft común)."""
+    files = {f".mxd02modpack/mods/mod_{i}.jar": os.urandom(2048) for i in range(5)}
+    files.update({f"libraries/net/lib/lib_{i}.jar": os.urandom(4096) for i in range(libraries)})
+    pack_hash = write_pack(serve_dir, "full.zip", files)
+    write_manifest(serve_dir, "manifest.json", {
+        "latestVersion": "1.0",
+        "full": {"version": "1.0", "url": f"{url}/full.zip", "filename": "full.zip", "hash": pack_hash},
+    })
+    return files
+
+
+def test_parallel_installs_share_libraries(server, tmp_path):
+    serve_dir, url, _ = server
+    files = make_full_pack(serve_dir, url)
+    minecraft_dir = tmp_path / "minecraft"
+    dirs = [str(tmp_path / f"instance_{i}") for i in range(4)]
+
+    code = mxd02_cli.main(["install", *dirs, "--manifest", f"{url}/manifest.json", "--no-cache",
+                           "--minecraft-dir", str(minecraft_dir),
+                           "--versions-dir", str(minecraft_dir / "versions")])
+
+    assert code == mxd02_cli.EXIT_OK
+    libraries = minecraft_dir / "libraries" / "net" / "lib"
+    assert sorted(os.listdir(libraries)) == sorted(f"lib_{i}.jar" for i in range(40))
+    for name, data in files.items():
+        if name.startswith("libraries/"):
+            assert (minecraft_dir / name).read_bytes() == data
+    for d in dirs:
+        assert (tmp_path / d / "mods" / "mod_0.jar").exists()
+
+
+def test_options_before_and_after_folders():
+    parser = mxd02_cli.build_parser()
+    for argv in (["install", "--core-only", "--ram", "6", "a", "b"],
+                 ["install", "a", "--core-only", "b", "--ram", "6"],
+                 ["install", "a", "b", "--core-only", "--ram", "6"]):
+        args = parser.parse_intermixed_args(argv)
+        assert (args.command, args.dirs, args.core_only, args.ram) == ("install", ["a", "b"], True, "6")
+    args = parser.parse_intermixed_args(["verify", "--repair", "a"])
+    assert (args.command, args.dirs, args.repair) == ("verify", ["a"], True)
+    args = parser.parse_intermixed_args(["status"])
+    assert args.dirs == []
+
+
+def test_main_accepts_options_before_folders(tmp_path):
+    # 'jvm' no descarga nada: basta con que se acepten las opciones delante de la carpeta
+    assert mxd02_cli.main(["jvm", "--ram", "6", str(tmp_path / "instance")]) == mxd02_cli.EXIT_OK
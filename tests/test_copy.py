@@ -0,0 +1,61 @@
+"""Pruebas de copy_all / apply_file (colocar una extracción en sus carpetas finales)."""
+import os
+
+from mxd02_engine import APPLY_COPY, APPLY_MOVE, copy_all, files_identical
+
+
+def write(path, data, mtime=1704067200):
+    os.makedirs(os.path.dirname(str(path)), exist_ok=True)
+    with open(str(path), "wb") as f:
+        f.write(data)
+    os.utime(str(path), (mtime, mtime))
+
+
+def read(path):
+    with open(str(path), "rb") as f:
+        return f.read()
+
+
+def test_files_identical(tmp_path):
+    write(tmp_path / "a", b"1234")
+    write(tmp_path / "b", b"1234")
+    write(tmp_path / "c", b"5678")  # Mismo tamaño y fecha, otro contenido
+    write(tmp_path / "d", b"1234", mtime=1704067300)
+    assert files_identical(tmp_path / "a", tmp_path / "b")
+    assert not files_identical(tmp_path / "a", tmp_path / "c")
+    assert not files_identical(tmp_path / "a", tmp_path / "d")
+    assert not files_identical(tmp_path / "a", tmp_path / "missing")
+
+
+def test_copy_skips_identical_files(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write(src / "same.jar", b"same")
+    write(src / "changed.jar", b"new!")
+    write(src / "sub" / "new.toml", b"x")
+    write(dst / "same.jar", b"same")
+    write(dst / "changed.jar", b"old!")
+
+    stats = copy_all(str(src), str(dst), mode=APPLY_COPY, threads=4)
+
+    assert stats == {"copied": 2, "moved": 0, "skipped": 1}
+    assert read(dst / "changed.jar") == b"new!" and read(dst / "sub" / "new.toml") == b"x"
+    assert read(src / "changed.jar") == b"new!"  # La copia conserva el origen
+
+
+def test_move(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write(src / "mods" / "a.jar", b"a")
+    write(src / "mods" / "same.jar", b"same")
+    write(src / "config" / "c.toml", b"c")
+    write(src / "config" / "deep" / "d.toml", b"d")
+    write(dst / "mods" / "same.jar", b"same")
+    write(dst / "mods" / "kept.jar", b"kept")
+
+    stats = copy_all(str(src), str(dst), mode=APPLY_MOVE)
+
+    # 'config' no existía: se mueve entera; en 'mods' se mueve archivo a archivo
+    assert stats == {"copied": 0, "moved": 3, "skipped": 1}
+    assert read(dst / "mods" / "a.jar") == b"a"
+    assert read(dst / "mods" / "kept.jar") == b"kept"
+    assert read(dst / "config" / "deep" / "d.toml") == b"d"
+    assert not os.path.exists(src / "mods" / "a.jar") and not os.path.exists(src / "config")
@@ -0,0 +1,111 @@
+"""
+Pruebas de los parches binarios (BSDIFF40). data/delta.bsdiff se generó con
+bsdiff4.diff(delta_old.bin, delta_new.bin): es un parche real de la herramienta.
+"""
+import os
+import shutil
+
+import pytest
+
+import mxd02_engine
+from mxd02_engine import apply_bsdiff, read_installed_version
+from support import file_sha256, new_updater, sha256, write_manifest, write_pack
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+OLD, NEW, PATCH = (os.path.join(DATA, name) for name in ("delta_old.bin", "delta_new.bin", "delta.bsdiff"))
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(params=["propio", "bsdiff4"])
+def decoder(request, monkeypatch):
+    """Se prueba la implementación propia y, si está instalado, el módulo bsdiff4."""
+    if request.param == "propio":
+        monkeypatch.setattr(mxd02_engine, "bsdiff4", None)
+    else:
+        monkeypatch.setattr(mxd02_engine, "bsdiff4", pytest.importorskip("bsdiff4"))
+
+
+def test_apply_real_patch(tmp_path, decoder):
+    new_path = str(tmp_path / "new.bin")
+    assert apply_bsdiff(OLD, PATCH, new_path) == file_sha256(NEW)
+    assert read(new_path) == read(NEW)
+
+
+def test_rejects_files_that_are_not_bsdiff(tmp_path, monkeypatch):
+    monkeypatch.setattr(mxd02_engine, "bsdiff4", None)
+    bad = tmp_path / "bad.bsdiff"
+    bad.write_bytes(b"NOTBSDIFF" + read(PATCH)[9:])
+    with pytest.raises(Exception, match="BSDIFF40"):
+        apply_bsdiff(OLD, str(bad), str(tmp_path / "new.bin"))
+
+
+def install_with_delta(serve_dir, url, tmp_path, full_data=None):
+    """
+    Instala 1.0 con delta_old.bin como mods/big.jar y publica un parche 1.1 que
+    solo trae su parche binario. 'full_data' es lo que sirve 'fullUrl' (y lo que
+    debe dar el resultado); por defecto, delta_new.bin.
+    """
+    full_data = read(NEW) if full_data is None else full_data
+    pack_hash = write_pack(serve_dir, "full.zip", {".mxd02modpack/mods/big.jar": read(OLD)})
+    shutil.copy(PATCH, serve_dir / "big.jar.bsdiff")
+    (serve_dir / "big.jar").write_bytes(full_data)
+    full = {"version": "1.0", "url": f"{url}/full.zip", "filename": "full.zip", "hash": pack_hash}
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": full})
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json")
+    error, info = updater.update()
+    assert not error, info
+
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.1", "full": full, "patch": {
+        "version": "1.1",
+        "deltas": [{"path": ".mxd02modpack/mods/big.jar", "baseHash": file_sha256(OLD), "hash": sha256(full_data),
+                    "url": f"{url}/big.jar.bsdiff", "fullUrl": f"{url}/big.jar", "size": os.path.getsize(PATCH)}],
+    }})
+    return os.path.join(updater.modpack_dir, "mods", "big.jar")
+
+
+def update(tmp_path, url):
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json")
+    error, info = updater.update()
+    assert not error, info
+    assert read_installed_version(updater.modpack_dir) == "1.1"
+    return updater.events.drain()[0]
+
+
+def test_patch_applies_delta(server, tmp_path, decoder):
+    serve_dir, url, _ = server
+    jar = install_with_delta(serve_dir, url, tmp_path)
+    os.remove(serve_dir / "big.jar")  # El archivo completo no hace falta
+
+    lines = update(tmp_path, url)
+
+    assert read(jar) == read(NEW)
+    assert any(line.startswith("Parche binario aplicado") for line in lines)
+
+
+def test_base_mismatch_downloads_full_file(server, tmp_path):
+    serve_dir, url, _ = server
+    jar = install_with_delta(serve_dir, url, tmp_path)
+    with open(jar, "r+b") as f:
+        f.write(b"modificado")
+
+    lines = update(tmp_path, url)
+
+    assert read(jar) == read(NEW)
+    assert any("no coincide con la versión base" in line for line in lines)
+    assert not any(line.startswith("Parche binario aplicado") for line in lines)
+
+
+def test_wrong_result_is_rejected(server, tmp_path, decoder):
+    serve_dir, url, _ = server
+    # El manifest espera otro contenido: el resultado del parche (delta_new.bin) no vale
+    expected = read(NEW) + b"otra build"
+    jar = install_with_delta(serve_dir, url, tmp_path, full_data=expected)
+
+    lines = update(tmp_path, url)
+
+    assert read(jar) == expected
+    assert any("no coincide con el hash esperado" in line for line in lines)
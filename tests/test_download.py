@@ -0,0 +1,120 @@
+"""Pruebas de las descargas: segmentadas, reanudadas y sin soporte de Range."""
+import os
+
+import pytest
+
+import mxd02_engine
+from mxd02_engine import DownloadCancelled, EventSink, load_download_state
+from support import new_updater, sha256
+
+SIZE = 2 * 1024 * 1024
+
+
+class CancelAt(EventSink):
+    """Cancela la descarga de 'updater' al llegar a 'percent' del progreso."""
+    def __init__(self, percent):
+        super().__init__()
+        self.percent = percent
+        self.updater = None
+
+    def progress(self, value):
+        super().progress(value)
+        if value >= self.percent and self.updater:
+            self.updater.cancel()
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setattr(mxd02_engine, "SEGMENT_SIZE", 128 * 1024)
+
+
+def serve_blob(serve_dir):
+    data = os.urandom(SIZE)
+    (serve_dir / "blob.bin").write_bytes(data)
+    return data
+
+
+def requested_bytes(headers):
+    """Bytes pedidos con las cabeceras Range de cada petición ('bytes=a-b' o 'bytes=a-')."""
+    total = 0
+    for header in headers:
+        start, _, end = header["Range"][len("bytes="):].partition("-")
+        total += (int(end) if end else SIZE - 1) - int(start) + 1
+    return total
+
+
+def cancelled_download(tmp_path, url, connections):
+    """Empieza la descarga, la cancela hacia la mitad y devuelve el destino."""
+    events = CancelAt(40)
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json", connections=connections, events=events)
+    events.updater = updater
+    dest = str(tmp_path / "blob.bin")
+    with pytest.raises(DownloadCancelled):
+        updater._download(f"{url}/blob.bin", dest)
+    return dest
+
+
+def resume(tmp_path, url, dest, connections):
+    """Repite la descarga. Devuelve (hash, líneas del log, cabeceras de cada petición)."""
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json", connections=connections)
+    sent = []
+    get = updater.session.get
+
+    def recording_get(url, headers=None, **kwargs):
+        sent.append(dict(headers or {}))
+        return get(url, headers=headers, **kwargs)
+
+    updater.session.get = recording_get
+    digest = updater._download(f"{url}/blob.bin", dest)
+    lines, _ = updater.events.drain()
+    return digest, lines, sent
+
+
+def test_segmented_download(server, tmp_path, small_segments):
+    serve_dir, url, stats = server
+    data = serve_blob(serve_dir)
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json", connections=4)
+    dest = str(tmp_path / "blob.bin")
+
+    assert updater._download(f"{url}/blob.bin", dest) == sha256(data)
+    with open(dest, "rb") as f:
+        assert f.read() == data
+    # Un byte para el sondeo y un Range por trozo
+    assert stats["requests"] == 1 + SIZE // mxd02_engine.SEGMENT_SIZE
+    assert load_download_state(dest) is None
+
+
+@pytest.mark.parametrize("connections", [1, 4])
+def test_resume_after_cancel(server, tmp_path, small_segments, connections):
+    serve_dir, url, _ = server
+    data = serve_blob(serve_dir)
+    dest = cancelled_download(tmp_path, url, connections)
+    state = load_download_state(dest)
+    received = state.get("received", 0) + sum(seg[2] for seg in state.get("segments", []))
+    assert 0 < received < SIZE
+
+    digest, lines, sent = resume(tmp_path, url, dest, connections)
+
+    assert digest == sha256(data)
+    with open(dest, "rb") as f:
+        assert f.read() == data
+    assert any(line.startswith("Reanudando descarga") for line in lines)
+    # Solo se pide lo que faltaba (más el byte del sondeo)
+    assert requested_bytes(sent) == SIZE - received + 1
+
+
+def test_server_without_ranges(server_without_ranges, tmp_path, small_segments):
+    serve_dir, url, _ = server_without_ranges
+    data = serve_blob(serve_dir)
+    dest = cancelled_download(tmp_path, url, 4)
+    assert "segments" not in load_download_state(dest)
+
+    digest, lines, sent = resume(tmp_path, url, dest, 4)
+
+    # Sin Range no se puede reanudar: se descarga de nuevo entero, con una sola conexión
+    assert digest == sha256(data)
+    with open(dest, "rb") as f:
+        assert f.read() == data
+    assert not any(line.startswith("Reanudando descarga") for line in lines)
+    # El sondeo y una única petición sin Range
+    assert [headers.get("Range") for headers in sent] == ["bytes=0-0", None]
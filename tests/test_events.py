@@ -0,0 +1,56 @@
+"""Pruebas del búfer de log y progreso entre el hilo de trabajo y la ventana (EventSink)."""
+import threading
+
+from mxd02_engine import EventSink
+
+
+def test_progress_coalesces_to_latest_value():
+    events = EventSink()
+    for value in range(101):
+        events.progress(value)
+    assert events.drain() == ([], 100)
+    # Sin progreso nuevo desde el último drain() no se repite el valor
+    assert events.drain() == ([], None)
+
+
+def test_logs_keep_their_order():
+    events = EventSink()
+
+    def work(worker):
+        for i in range(200):
+            events.log(f"{worker}:{i}")
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lines, _ = events.drain()
+    assert len(lines) == 800
+    for worker in range(4):
+        assert [line for line in lines if line.startswith(f"{worker}:")] == [f"{worker}:{i}" for i in range(200)]
+
+
+def test_overflow_keeps_the_last_lines():
+    events = EventSink(max_lines=3)
+    for i in range(5):
+        events.log(f"línea {i}")
+    lines, _ = events.drain()
+    assert lines == ["... (2 líneas omitidas, ver el log)", "línea 2", "línea 3", "línea 4"]
+    assert events.drain() == ([], None)
+
+
+def test_drain_after_close(tmp_path):
+    log_path = tmp_path / "logs" / "install.log"
+    events = EventSink(log_path=str(log_path))
+    events.log("primera")
+    events.progress(40)
+    events.log("segunda")
+    events.progress(75)
+    events.close()
+    events.close()  # Cerrar dos veces no falla
+
+    # La ventana recoge lo último tras terminar el hilo de trabajo
+    assert events.drain() == (["primera", "segunda"], 75)
+    assert [line.split("] ", 1)[1] for line in log_path.read_text(encoding="utf-8").splitlines()] == [
+        "primera", "segunda"]
@@ -0,0 +1,96 @@
+"""Pruebas de la extracción de packs en varios hilos (EntryWriter)."""
+import io
+import os
+import tarfile
+
+import pytest
+
+import mxd02_engine
+from mxd02_bench import write_zip
+from support import (expected, extract, file_sha256, installed, new_updater, pack_files, write_manifest,
+                     write_pack)
+
+
+def write_tar(path, members):
+    """Escribe un .tar.gz con 'members' [(nombre, datos)] en ese orden (puede repetir nombres)."""
+    with tarfile.open(path, "w:gz") as tf:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1704067200
+            tf.addfile(info, io.BytesIO(data))
+
+
+@pytest.mark.parametrize("kind", ["zip", "tar"])
+def test_threads_do_not_change_the_result(tmp_path, monkeypatch, kind):
+    monkeypatch.setattr(mxd02_engine, "EXTRACT_INLINE_SIZE", 1500)  # Parte del .tar se escribe sin hilos
+    files = pack_files()
+    archive = tmp_path / f"pack.{'zip' if kind == 'zip' else 'tar.gz'}"
+    if kind == "zip":
+        write_zip(str(archive), files)
+    else:
+        # La misma ruta varias veces (pequeña y grande): gana la última, como al extraer en orden
+        repeated = ".mxd02modpack/mods/mod_0.jar"
+        members = list(files.items()) + [(repeated, b"small"), (repeated, b"x" * 4000), (repeated, b"last")]
+        files[repeated] = b"last"
+        write_tar(str(archive), members)
+
+    _, one = extract(tmp_path / "one", archive, 1)
+    updater, many = extract(tmp_path / "many", archive, 8)
+
+    assert one == many == expected(files)  # Tampoco quedan archivos temporales
+    # El índice tiene el hash de lo que quedó escrito
+    index = updater.open_index()
+    for path in ("mods/mod_0.jar", "config/c_0.toml"):
+        dest = os.path.join(updater.modpack_dir, path)
+        assert index.matches(dest, file_sha256(dest))
+    updater.close()
+
+
+def test_failed_write_leaves_no_partial_files(server, tmp_path, monkeypatch):
+    serve_dir, url, _ = server
+    files = pack_files()
+    pack_hash = write_pack(serve_dir, "full.zip", files)
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": {
+        "version": "1.0", "url": f"{url}/full.zip", "filename": "full.zip", "hash": pack_hash}})
+    base = tmp_path / "instance"
+
+    updater = new_updater(base, f"{url}/manifest.json", extract_threads=8)
+    write_pack_entry = updater._write_pack_entry
+
+    def failing_write(src, dest, mtime, make_dirs=True):
+        if dest.endswith("mod_30.jar"):
+            src = io.BufferedReader(FailingReader(src))
+        return write_pack_entry(src, dest, mtime, make_dirs)
+
+    monkeypatch.setattr(updater, "_write_pack_entry", failing_write)
+    error, info = updater.update()
+    assert error and "disco lleno" in info
+    # Ni temporales ni archivos a medias: lo que se escribió está completo
+    written = installed(updater)
+    assert "mods/mod_30.jar" not in written
+    assert all(expected(files).get(path) == data for path, data in written.items())
+
+    # La siguiente ejecución termina la instalación
+    updater = new_updater(base, f"{url}/manifest.json", extract_threads=8)
+    error, info = updater.update()
+    assert not error, info
+    assert installed(updater) == expected(files)
+
+
+class FailingReader(io.RawIOBase):
+    """Lee unos bytes y después falla como si el disco se hubiera llenado."""
+    def __init__(self, src):
+        self.src = src
+        self.left = 100
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.left <= 0:
+            raise OSError("disco lleno")
+        data = self.src.read(min(len(buffer), self.left))
+        self.left -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
@@ -0,0 +1,76 @@
+"""Pruebas de los argumentos de Java según el equipo (mxd02_jvm.py)."""
+import pytest
+
+from mxd02_jvm import build_jvm_args, region_size_mb, tune_jvm
+
+
+def machine(total_gb, free_gb=None, cores=8):
+    """Equipo fijo para no depender de la máquina que ejecuta las pruebas."""
+    return {
+        "totalMb": total_gb * 1024 if total_gb else None,
+        "freeMb": free_gb * 1024 if free_gb else None,
+        "cpuCores": cores,
+    }
+
+
+@pytest.mark.parametrize("total_gb, mods, recommended, safe", [
+    (None, 300, 10, None),  # Sin saber la memoria: lo que piden los mods
+    (64, 300, 10, 48),
+    (8, 300, 6, 6),         # Se recorta al máximo seguro (8 GB - 2 GB de reserva)
+    (4, 300, 2, 2),
+    (2, 0, 2, 1),           # Nunca por debajo del mínimo para que Forge cargue
+])
+def test_recommended_heap_is_clamped_to_safe_max(total_gb, mods, recommended, safe):
+    tuning = tune_jvm(mod_count=mods, hardware=machine(total_gb))
+    assert tuning["auto"]
+    assert (tuning["recommendedGb"], tuning["heapGb"], tuning["safeMaxGb"]) == (recommended, recommended, safe)
+
+
+@pytest.mark.parametrize("heap_gb, free_gb, initial", [
+    (8, None, 8),  # Sin saber la memoria libre: -Xms igual a -Xmx
+    (8, 16, 8),
+    (8, 8, 8),
+    (8, 4, 4),     # Poca memoria libre: se reserva la mitad al arrancar
+    (1, 0.5, 1),
+])
+def test_initial_heap_is_halved_when_free_memory_is_low(heap_gb, free_gb, initial):
+    java_args, _ = build_jvm_args(heap_gb, {"totalMb": 32768, "freeMb": free_gb and int(free_gb * 1024),
+                                            "cpuCores": 4})
+    assert java_args.split()[:2] == [f"-Xmx{heap_gb}G", f"-Xms{initial}G"]
+
+
+@pytest.mark.parametrize("heap_gb, cores, gc, flag", [
+    (8, 1, "serial", "-XX:+UseSerialGC"),
+    (32, 1, "serial", "-XX:+UseSerialGC"),
+    (16, 8, "zgc", "-XX:+UseZGC"),
+    (16, 4, "g1", "-XX:+UseG1GC"),   # Mucha memoria pero pocos núcleos
+    (8, 16, "g1", "-XX:+UseG1GC"),   # Muchos núcleos pero poca memoria
+])
+def test_gc_choice(heap_gb, cores, gc, flag):
+    java_args, chosen = build_jvm_args(heap_gb, machine(64, 64, cores))
+    assert chosen == gc
+    assert flag in java_args.split()
+    assert ("-XX:G1HeapRegionSize" in java_args) == (gc == "g1")
+
+
+@pytest.mark.parametrize("heap_gb, size", [(1, 4), (2, 4), (8, 4), (9, 8), (16, 8), (32, 16), (64, 32), (1024, 32)])
+def test_region_size_bounds(heap_gb, size):
+    assert region_size_mb(heap_gb) == size
+
+
+@pytest.mark.parametrize("selected, mods, hardware, expected", [
+    ("auto", 100, machine(16, 12), []),
+    (12, 0, machine(8, 8), ["supera el máximo seguro"]),
+    (8, 0, machine(32, 4), ["es más de la memoria libre"]),
+    (4, 300, machine(32, 32), ["puede quedarse corto"]),
+    (32, 300, machine(128, 128), ["punteros comprimidos"]),
+    # Por encima del máximo seguro no se repite el aviso de memoria libre
+    (40, 300, machine(48, 4), ["supera el máximo seguro", "punteros comprimidos"]),
+    # Equipo de 2 GB: el mínimo para Forge ya no es seguro ni suficiente
+    ("auto", 0, machine(2, 1), ["supera el máximo seguro", "puede quedarse corto"]),
+])
+def test_warnings(selected, mods, hardware, expected):
+    warnings = tune_jvm(selected, mod_count=mods, hardware=hardware)["warnings"]
+    assert len(warnings) == len(expected)
+    for warning, text in zip(warnings, expected):
+        assert text in warning
@@ -0,0 +1,125 @@
+"""Pruebas de la caché en red local (LanCacheServer y su uso al descargar)."""
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+import mxd02_engine
+from conftest import ROOT
+from mxd02_engine import BlobCache, LanCacheServer
+from support import file_entries, file_sha256, new_updater, sha256, write_manifest
+
+
+def cache_with_blob(tmp_path, data):
+    cache = BlobCache(str(tmp_path / "cache"), 1024 ** 3)
+    src = tmp_path / "blob"
+    src.write_bytes(data)
+    cache.put(str(src), sha256(data))
+    return cache
+
+
+def test_server_ranges(tmp_path):
+    data = bytes(range(100))
+    server = LanCacheServer(cache_with_blob(tmp_path, data), host="127.0.0.1", port=0, discovery_port=None).start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/blob/{sha256(data)}"
+        resp = requests.get(url, headers={"Range": "bytes=2-4"}, timeout=5)
+        assert resp.status_code == 206 and resp.content == data[2:5]
+        assert resp.headers["Content-Range"] == "bytes 2-4/100"
+        resp = requests.get(url, headers={"Range": "bytes=90-"}, timeout=5)
+        assert resp.status_code == 206 and resp.content == data[90:]
+        for bad in ("bytes=10-5", "bytes=0-100", "bytes=100-"):
+            resp = requests.get(url, headers={"Range": bad}, timeout=5)
+            assert resp.status_code == 416, bad
+            assert resp.headers["Content-Range"] == "bytes */100"
+        assert requests.get(url, timeout=5).content == data
+        assert requests.get(f"http://127.0.0.1:{server.port}/blob/{'0' * 64}", timeout=5).status_code == 404
+    finally:
+        server.stop()
+
+
+def start_peer(tmp_path, cache_dir):
+    """'mxd02_cli.py serve' en otro proceso, con la caché de 'cache_dir'. Devuelve (proceso, url)."""
+    peer_dir = tmp_path / "peer"
+    peer_dir.mkdir()
+    (peer_dir / "user_settings.json").write_text(json.dumps({"cache_dir": str(cache_dir)}))
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "mxd02_cli.py"), "serve",
+                                "--port", str(port), "--no-discovery"],
+                               cwd=str(peer_dir), stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 20
+    while True:
+        try:
+            requests.head(f"{url}/blob/{'0' * 64}", timeout=1)
+            return process, url
+        except requests.RequestException:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("El servidor de caché no arrancó")
+            time.sleep(0.1)
+
+
+def start_dead_peer():
+    """Acepta conexiones y nunca responde. Devuelve (url, conexiones aceptadas, socket)."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    connections = []
+
+    def accept():
+        while True:
+            try:
+                connections.append(listener.accept()[0])
+            except OSError:
+                return
+
+    threading.Thread(target=accept, daemon=True).start()
+    return f"http://127.0.0.1:{listener.getsockname()[1]}", connections, listener
+
+
+def test_update_from_peer_process(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(mxd02_engine, "LAN_PROBE_TIMEOUT", 0.5)
+    serve_dir, url, _ = server
+    files = {f".mxd02modpack/mods/mod_{i}.jar": os.urandom(4096 + i) for i in range(10)}
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": {
+        "version": "1.0", "files": file_entries(serve_dir, url, files)}})
+    # El otro equipo solo tiene la mitad de los mods
+    names = sorted(files)
+    shared = names[:5]
+    peer_cache = BlobCache(str(tmp_path / "peer_cache"), 1024 ** 3)
+    for name in shared:
+        src = tmp_path / "blob"
+        src.write_bytes(files[name])
+        peer_cache.put(str(src), sha256(files[name]))
+        # El servidor de origen ya no los tiene: solo pueden llegar desde el otro equipo
+        os.remove(serve_dir / sha256(files[name]))
+
+    process, peer_url = start_peer(tmp_path, tmp_path / "peer_cache")
+    dead_url, dead_connections, listener = start_dead_peer()
+    try:
+        updater = new_updater(tmp_path / "instance", f"{url}/manifest.json", lan_peers=[dead_url, peer_url])
+        started = time.monotonic()
+        error, info = updater.update()
+        elapsed = time.monotonic() - started
+    finally:
+        process.kill()
+        process.wait()
+        listener.close()
+        for conn in dead_connections:
+            conn.close()
+
+    assert not error, info
+    for name, data in files.items():
+        assert file_sha256(os.path.join(updater.modpack_dir, name.split("/", 1)[1])) == sha256(data)
+    # El servidor que no responde cuesta un solo timeout, no uno por archivo
+    assert len(dead_connections) == 1
+    assert updater.lan_peers == [peer_url]
+    assert elapsed < 10 * 0.5
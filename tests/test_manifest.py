@@ -0,0 +1,44 @@
+"""Pruebas de la copia local del manifest (fetch_manifest)."""
+import threading
+
+from mxd02_engine import MANIFEST_CACHE_FILE, fetch_manifest
+from support import new_updater, write_manifest
+
+
+def test_manifest_is_revalidated_every_time(server, tmp_path):
+    serve_dir, url, stats = server
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0"})
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json")
+    # La comprobación de inicio deja la copia que luego usa la instalación
+    assert fetch_manifest(f"{url}/manifest.json", updater.modpack_dir)["latestVersion"] == "1.0"
+
+    served = stats["bytes"]
+    assert updater.download_json(f"{url}/manifest.json")["latestVersion"] == "1.0"
+    assert stats["bytes"] == served  # 304: no se vuelve a descargar
+
+    # Una versión publicada justo después se ve sin esperar
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.1"})
+    assert updater.download_json(f"{url}/manifest.json")["latestVersion"] == "1.1"
+
+
+def test_concurrent_fetches_keep_a_valid_copy(server, tmp_path):
+    serve_dir, url, stats = server
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0"})
+    cache_dir = tmp_path / "cache"
+    errors = []
+
+    def fetch():
+        try:
+            for _ in range(10):
+                assert fetch_manifest(f"{url}/manifest.json", str(cache_dir))["latestVersion"] == "1.0"
+        except Exception as e:
+            errors.append(e)
+
+    # Como la comprobación de inicio y la instalación a la vez
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert [p.name for p in cache_dir.iterdir()] == [MANIFEST_CACHE_FILE]
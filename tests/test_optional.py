@@ -0,0 +1,49 @@
+"""Pruebas del contenido opcional instalado en segundo plano (install_optional)."""
+import json
+import os
+
+from mxd02_engine import OPTIONAL_STATE_FILE
+from support import file_entries, file_sha256, new_updater, sha256, write_manifest, write_pack
+
+
+def optional_state(updater):
+    with open(os.path.join(updater.modpack_dir, OPTIONAL_STATE_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_deferred_optional_content_is_installed_later(server, tmp_path):
+    serve_dir, url, _ = server
+    required = {f".mxd02modpack/mods/mod_{i}.jar": os.urandom(2048) for i in range(3)}
+    hd = {".mxd02modpack/mods/hd_textures.jar": os.urandom(4096)}
+    shaders = {".mxd02modpack/shaderpacks/shaders.zip": os.urandom(4096)}
+    entries = file_entries(serve_dir, url, required) + file_entries(serve_dir, url, hd)
+    entries[-1]["tier"] = "hd"
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": {
+        "version": "1.0", "files": entries,
+        "optional": [{"tier": "shaders", "url": f"{url}/shaders.zip", "filename": "shaders.zip",
+                      "hash": write_pack(serve_dir, "shaders.zip", shaders)}],
+    }})
+    manifest_url = f"{url}/manifest.json"
+    instance = tmp_path / "instance"
+
+    updater = new_updater(instance, manifest_url, defer_optional=True)
+    error, info = updater.update()
+    assert not error, info
+    # Lo imprescindible ya está y el perfil se puede usar; lo opcional queda pendiente
+    for name in required:
+        assert os.path.isfile(os.path.join(updater.modpack_dir, name.replace(".mxd02modpack/", "", 1)))
+    hd_path = os.path.join(updater.modpack_dir, "mods", "hd_textures.jar")
+    shaders_path = os.path.join(updater.modpack_dir, "shaderpacks", "shaders.zip")
+    assert not os.path.exists(hd_path) and not os.path.exists(shaders_path)
+    assert optional_state(updater) == {"version": "1.0", "installed": []}
+
+    updater = new_updater(instance, manifest_url)
+    error, info = updater.install_optional()
+    assert not error, info
+    assert info == "hd, shaders"
+    assert file_sha256(hd_path) == sha256(hd[".mxd02modpack/mods/hd_textures.jar"])
+    assert file_sha256(shaders_path) == sha256(shaders[".mxd02modpack/shaderpacks/shaders.zip"])
+    assert optional_state(updater) == {"version": "1.0", "installed": ["hd", "shaders"]}
+
+    # Una segunda pasada no tiene nada que hacer
+    assert new_updater(instance, manifest_url).install_optional() == (False, "sin contenido opcional pendiente")
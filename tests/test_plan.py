@@ -0,0 +1,170 @@
+"""Pruebas de la ejecución del plan de actualización (Full Pack y parches)."""
+import os
+import subprocess
+import sys
+import threading
+
+from conftest import ROOT
+from mxd02_engine import plan_update, read_installed_version
+from support import new_updater, write_manifest, write_pack
+
+# Instala el plan en otro proceso que muere sin avisar al empezar a extraer 'crash_at'
+CRASHING_UPDATE = """
+import os, sys
+root, base, manifest_url, crash_at = sys.argv[1:]
+sys.path[:0] = [root, os.path.join(root, "tests")]
+from support import new_updater
+updater = new_updater(base, manifest_url)
+install_archive = updater.install_archive
+
+def crash(archive_path, *args, **kwargs):
+    if os.path.basename(archive_path) == crash_at:
+        os._exit(3)
+    return install_archive(archive_path, *args, **kwargs)
+
+updater.install_archive = crash
+updater.update()
+"""
+
+
+def write_patch_chain(serve_dir, url):
+    """
+    Full Pack 1.0 y tres parches encadenados hasta 1.3. El 1.2 borra un mod
+    que el 1.3 vuelve a añadir: el orden entre borrados y extracción importa.
+    Devuelve los archivos que debe haber al final (ruta en .mxd02modpack: contenido).
+    """
+    packs = [
+        ("full", "1.0", {"mods/a.jar": b"A1", "mods/b.jar": b"B1", "config/c.toml": b"C1"}, []),
+        ("patch_1_1", "1.1", {"mods/a.jar": b"A2", "mods/d.jar": b"D1"}, []),
+        ("patch_1_2", "1.2", {"mods/b.jar": b"B2"}, ["mods/d.jar"]),
+        ("patch_1_3", "1.3", {"mods/d.jar": b"D2"}, ["mods/b.jar"]),
+    ]
+    manifest = {"latestVersion": "1.3"}
+    for key, version, files, removed in packs:
+        filename = f"{key}.zip"
+        pack_hash = write_pack(serve_dir, filename, {f".mxd02modpack/{path}": data for path, data in files.items()})
+        manifest[key] = {"version": version, "url": f"{url}/{filename}", "filename": filename, "hash": pack_hash}
+        if removed:
+            manifest[key]["filesToRemove"] = removed
+    write_manifest(serve_dir, "manifest.json", manifest)
+    return {"mods/a.jar": b"A2", "mods/d.jar": b"D2", "config/c.toml": b"C1"}
+
+
+def plan_keys(manifest, current_version, sizes=None):
+    plan = plan_update(manifest, current_version, sizes)
+    return plan.target_version, [step["key"] for step in plan.steps]
+
+
+def test_versions_are_compared_as_numbers():
+    manifest = {"latestVersion": "1.10",
+                "patch10": {"version": "1.10", "size": 10},
+                "patch2": {"version": "1.2", "size": 10},
+                "full": {"version": "1.1", "size": 1000}}
+    assert plan_keys(manifest, "1.1") == ("1.10", ["patch2", "patch10"])
+    assert plan_keys(manifest, None) == ("1.10", ["full", "patch2", "patch10"])
+
+
+def test_full_pack_when_cheaper_than_the_patches():
+    manifest = {"latestVersion": "1.3",
+                "patch1": {"version": "1.1", "size": 400},
+                "patch2": {"version": "1.2", "size": 400},
+                "patch3": {"version": "1.3", "size": 400},
+                "full": {"version": "1.3", "size": 1000}}
+    assert plan_keys(manifest, "1.0") == ("1.3", ["full"])
+    assert plan_keys(manifest, "1.2") == ("1.3", ["patch3"])
+
+
+def test_unreachable_latest_version():
+    # El parche a 2.0 parte de una versión que no se publicó
+    manifest = {"latestVersion": "2.0",
+                "full": {"version": "1.3", "size": 1000},
+                "patch": {"version": "2.0", "from": "1.5", "size": 10}}
+    assert plan_keys(manifest, None) == ("1.3", ["full"])
+    assert plan_keys(manifest, "1.3") == ("1.3", [])
+
+
+def test_unknown_size_is_not_free():
+    manifest = {"latestVersion": "1.1",
+                "patch": {"version": "1.1", "from": "1.0"},
+                "full": {"version": "1.1", "size": 1000}}
+    assert plan_keys(manifest, "1.0", sizes={"patch": None}) == ("1.1", ["full"])
+    assert plan_keys(manifest, "1.0", sizes={"patch": 50}) == ("1.1", ["patch"])
+
+
+def test_build_plan_skips_entries_without_version_and_unknown_sizes(server, tmp_path):
+    serve_dir, url, _ = server
+    (serve_dir / "full.zip").write_bytes(b"x" * 5000)
+    manifest = {"latestVersion": "1.1",
+                "patch_draft": {"url": f"{url}/draft.zip"},  # Sin "version": se ignora
+                "patch": {"version": "1.1", "from": "1.0", "url": "http://127.0.0.1:9/patch.zip"},  # No responde
+                "full": {"version": "1.1", "url": f"{url}/full.zip"}}
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json")
+    plan = updater.build_plan(manifest, "1.0")
+    assert [step["key"] for step in plan.steps] == ["full"]
+    assert plan.total_bytes == 5000
+
+
+def installed_files(modpack_dir):
+    files = {}
+    for sub in ("mods", "config"):
+        for name in os.listdir(os.path.join(modpack_dir, sub)):
+            with open(os.path.join(modpack_dir, sub, name), "rb") as f:
+                files[f"{sub}/{name}"] = f.read()
+    return files
+
+
+def test_patches_download_while_full_pack_installs(server, tmp_path, monkeypatch):
+    serve_dir, url, _ = server
+    expected = write_patch_chain(serve_dir, url)
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json")
+    fetched = {key: threading.Event() for key in ("patch_1_1", "patch_1_2")}
+    fetch_pack, install_full = updater.fetch_pack, updater.install_full
+
+    def recording_fetch(pack_info, label, key=None):
+        path = fetch_pack(pack_info, label, key)
+        if key in fetched:
+            fetched[key].set()
+        return path
+
+    def waiting_install(*args, **kwargs):
+        # Los dos parches siguientes (PIPELINE_LOOKAHEAD) se descargan mientras se instala el Full Pack
+        for event in fetched.values():
+            assert event.wait(10)
+        return install_full(*args, **kwargs)
+
+    monkeypatch.setattr(updater, "fetch_pack", recording_fetch)
+    monkeypatch.setattr(updater, "install_full", waiting_install)
+    error, info = updater.update()
+
+    assert not error, info
+    assert read_installed_version(updater.modpack_dir) == "1.3"
+    assert installed_files(updater.modpack_dir) == expected
+
+
+def test_resume_after_crash_mid_plan(server, tmp_path):
+    serve_dir, url, _ = server
+    expected = write_patch_chain(serve_dir, url)
+    base = str(tmp_path / "instance")
+    crashed = subprocess.run([sys.executable, "-c", CRASHING_UPDATE, ROOT, base, f"{url}/manifest.json",
+                              "patch_1_2.zip"], cwd=str(tmp_path), timeout=60)
+    assert crashed.returncode == 3
+
+    updater = new_updater(base, f"{url}/manifest.json")
+    # La versión solo se escribe al final: sigue sin haber ninguna instalada
+    assert read_installed_version(updater.modpack_dir) is None
+    journal = updater.pending_journal()
+    assert (journal["from"], journal["target"]) == (None, "1.3")
+    assert "committed" in journal["steps"]["patch_1_1"]
+    assert "removals" in journal["steps"]["patch_1_2"]
+    assert "extracted" not in journal["steps"]["patch_1_2"]
+
+    error, info = updater.update()
+    lines, _ = updater.events.drain()
+
+    assert not error, info
+    for key in ("full", "patch_1_1"):
+        assert any(line.startswith(f"{key} (") and "ya se aplicó" in line for line in lines), key
+    assert "patch_1_2.zip ya estaba descargado y verificado." in lines
+    assert read_installed_version(updater.modpack_dir) == "1.3"
+    assert installed_files(updater.modpack_dir) == expected
+    assert updater.pending_journal() is None
@@ -0,0 +1,74 @@
+"""Pruebas del almacén compartido entre instancias (ContentStore)."""
+import os
+
+from mxd02_engine import BlobCache, ContentStore
+from support import file_entries, new_updater, sha256, write_manifest
+
+
+def test_updating_one_instance_keeps_the_other_and_the_store(server, tmp_path):
+    serve_dir, url, _ = server
+    old, new = b"mod 1.0" * 1000, b"mod 1.1" * 1000
+    config = b"enabled=true"
+    for version, data, name in (("1.0", old, "v1.json"), ("1.1", new, "v2.json")):
+        files = {".mxd02modpack/mods/m.jar": data, ".mxd02modpack/config/c.toml": config}
+        write_manifest(serve_dir, name, {"latestVersion": version,
+                                         "full": {"version": version, "files": file_entries(serve_dir, url, files)}})
+    store = ContentStore(str(tmp_path / "store"))
+    cache = BlobCache(str(tmp_path / "cache"), 1024 ** 3)
+    minecraft_dir = str(tmp_path / "minecraft")
+
+    def update(instance, manifest):
+        updater = new_updater(tmp_path / instance, f"{url}/{manifest}", minecraft_dir, store=store, cache=cache)
+        error, info = updater.update()
+        assert not error, info
+        return os.path.join(updater.modpack_dir, "mods", "m.jar")
+
+    jar_a = update("a", "v1.json")
+    jar_b = update("b", "v1.json")
+    assert os.path.samefile(jar_a, jar_b)
+    assert os.stat(jar_a).st_nlink == 3  # a, b y el almacén
+
+    jar_a = update("a", "v2.json")
+
+    with open(jar_a, "rb") as f:
+        assert f.read() == new
+    with open(jar_b, "rb") as f:
+        assert f.read() == old
+    with open(store.get(sha256(old)), "rb") as f:
+        assert f.read() == old
+    with open(store.get(sha256(new)), "rb") as f:
+        assert f.read() == new
+    assert not os.path.samefile(store.get(sha256(old)), store.get(sha256(new)))
+    # La configuración no se comparte: cada instancia tiene la suya
+    assert os.stat(os.path.join(str(tmp_path / "b"), "mxd02modpack", "config", "c.toml")).st_nlink == 1
+
+
+def test_repair_replaces_a_damaged_shared_file(server, tmp_path):
+    serve_dir, url, _ = server
+    data = b"mod 1.0" * 1000
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": {
+        "version": "1.0", "files": file_entries(serve_dir, url, {".mxd02modpack/mods/m.jar": data})}})
+    store = ContentStore(str(tmp_path / "store"))
+    minecraft_dir = str(tmp_path / "minecraft")
+
+    def updater(instance):
+        return new_updater(tmp_path / instance, f"{url}/manifest.json", minecraft_dir, store=store)
+
+    for instance in ("a", "b"):
+        error, info = updater(instance).update()
+        assert not error, info
+    jar_a, jar_b = (os.path.join(str(tmp_path / instance), "mxd02modpack", "mods", "m.jar") for instance in "ab")
+    # Al escribir dentro del archivo se dañan a la vez las dos instancias y el almacén
+    with open(jar_a, "r+b") as f:
+        f.write(b"\0" * 16)
+
+    error, info = updater("a").repair()
+    assert not error, info
+    with open(jar_a, "rb") as f:
+        assert f.read() == data
+    with open(store.get(sha256(data)), "rb") as f:
+        assert f.read() == data
+    # La otra instancia, al repararse, vuelve a compartir el archivo sano del almacén
+    error, info = updater("b").repair()
+    assert not error, info
+    assert os.path.samefile(jar_b, store.get(sha256(data)))
@@ -0,0 +1,82 @@
+"""Pruebas de la verificación y reparación de la instalación."""
+import os
+
+from mxd02_engine import BlobCache
+from support import file_entries, file_sha256, new_updater, sha256, write_manifest
+
+
+def install(server, tmp_path):
+    serve_dir, url, _ = server
+    files = {f".mxd02modpack/mods/mod_{i}.jar": os.urandom(4096) for i in range(4)}
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": {
+        "version": "1.0", "files": file_entries(serve_dir, url, files)}})
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json")
+    error, info = updater.update()
+    assert not error, info
+    mods = os.path.join(updater.modpack_dir, "mods")
+    return files, mods, f"{url}/manifest.json"
+
+
+def corrupt_keeping_stat(path):
+    """Cambia el contenido sin cambiar tamaño, fecha ni inodo: el índice no lo nota."""
+    st = os.stat(path)
+    with open(path, "r+b") as f:
+        f.write(b"\0" * 16)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def test_repair_rehashes_everything(server, tmp_path):
+    files, mods, manifest_url = install(server, tmp_path)
+    corrupt_keeping_stat(os.path.join(mods, "mod_0.jar"))
+    os.remove(os.path.join(mods, "mod_1.jar"))
+
+    updater = new_updater(tmp_path / "instance", manifest_url)
+    manifest = updater.download_json(manifest_url)
+    # Sin 'full', el índice da por bueno el archivo dañado con el mismo tamaño y fecha
+    assert updater.verify(manifest)["mismatched"] == [".mxd02modpack/mods/mod_1.jar"]
+
+    error, info = new_updater(tmp_path / "instance", manifest_url).repair()
+    assert not error, info
+    for name, data in files.items():
+        assert file_sha256(os.path.join(mods, os.path.basename(name))) == sha256(data)
+    result = new_updater(tmp_path / "instance", manifest_url).verify(manifest, full=True)
+    assert result["mismatched"] == []
+
+
+def test_repair_reports_only_files_that_now_match(server, tmp_path, monkeypatch):
+    _, mods, manifest_url = install(server, tmp_path)
+    corrupt_keeping_stat(os.path.join(mods, "mod_0.jar"))
+    os.remove(os.path.join(mods, "mod_1.jar"))
+
+    updater = new_updater(tmp_path / "instance", manifest_url)
+    manifest = updater.download_json(manifest_url)
+    place_download = updater.place_download
+
+    def place_all_but_mod_0(tmp_path, dest, expected_hash):
+        if os.path.basename(dest) != "mod_0.jar":
+            place_download(tmp_path, dest, expected_hash)
+
+    monkeypatch.setattr(updater, "place_download", place_all_but_mod_0)
+    result = updater.verify(manifest, repair=True, full=True)
+    assert result["repaired"] == [".mxd02modpack/mods/mod_1.jar"]
+    assert result["mismatched"] == [".mxd02modpack/mods/mod_0.jar"]
+
+
+def test_repair_does_not_reuse_the_damaged_cached_copy(server, tmp_path):
+    serve_dir, url, _ = server
+    data = os.urandom(4096)
+    write_manifest(serve_dir, "manifest.json", {"latestVersion": "1.0", "full": {
+        "version": "1.0", "files": file_entries(serve_dir, url, {".mxd02modpack/mods/m.jar": data})}})
+    cache = BlobCache(str(tmp_path / "cache"), 1024 ** 3)
+    updater = new_updater(tmp_path / "instance", f"{url}/manifest.json", cache=cache)
+    error, info = updater.update()
+    assert not error, info
+    jar = os.path.join(updater.modpack_dir, "mods", "m.jar")
+    for path in (jar, cache.get(sha256(data))):
+        corrupt_keeping_stat(path)
+
+    error, info = new_updater(tmp_path / "instance", f"{url}/manifest.json", cache=cache).repair()
+
+    assert not error, info
+    assert file_sha256(jar) == sha256(data)
+    assert file_sha256(cache.get(sha256(data))) == sha256(data)  # La descarga sustituye la copia dañada
@@ -0,0 +1,81 @@
+"""Pruebas de los packs comprimidos con zstd (.tar.zst y entradas zstd dentro de .zip)."""
+import io
+import os
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+import mxd02_engine
+from mxd02_bench import write_tar_zst
+from mxd02_engine import ZIP_ZSTANDARD, ZstdPipeReader
+from support import expected, extract, pack_files
+
+zstandard = pytest.importorskip("zstandard")
+
+
+def write_zstd_zip(path, files):
+    """
+    .zip con las entradas comprimidas con zstd (método 93). zipfile no sabe
+    escribirlo: se guardan los datos ya comprimidos y se corrigen las cabeceras.
+    """
+    compressor = zstandard.ZstdCompressor()
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in sorted(files.items()):
+            zf.writestr(zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0)), compressor.compress(data))
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+        central_offset = zf.start_dir
+    with open(path, "r+b") as f:
+        raw = f.read()
+        pos = central_offset
+        for info in infos:
+            data = files[info.filename]
+            fields = struct.pack("<HHHI", ZIP_ZSTANDARD, *struct.unpack("<HH", raw[info.header_offset + 10:
+                                                                                  info.header_offset + 14]),
+                                 zlib.crc32(data))
+            # Cabecera local: método en +8, CRC en +14 y tamaño sin comprimir en +22
+            f.seek(info.header_offset + 8)
+            f.write(fields)
+            f.seek(info.header_offset + 22)
+            f.write(struct.pack("<I", len(data)))
+            # Directorio central: método en +10, CRC en +16 y tamaño sin comprimir en +24
+            f.seek(pos + 10)
+            f.write(fields)
+            f.seek(pos + 24)
+            f.write(struct.pack("<I", len(data)))
+            name_len, extra_len, comment_len = struct.unpack("<HHH", raw[pos + 28:pos + 34])
+            pos += 46 + name_len + extra_len + comment_len
+
+
+@pytest.mark.parametrize("kind", ["zip", "tar.zst"])
+def test_zstd_packs(tmp_path, kind):
+    files = pack_files()
+    archive = tmp_path / f"pack.{kind}"
+    if kind == "zip":
+        write_zstd_zip(str(archive), files)
+        with zipfile.ZipFile(str(archive)) as zf:
+            assert {info.compress_type for info in zf.infolist()} == {ZIP_ZSTANDARD}
+    else:
+        write_tar_zst(str(archive), files)
+
+    for threads in (1, 8):
+        _, result = extract(tmp_path / f"instance_{threads}", archive, threads)
+        assert result == expected(files)
+
+
+def test_zstd_reader_closed_mid_stream():
+    # Más datos de los que caben en la cola: el hilo se queda esperando a que se lean
+    data = os.urandom(1024) * (3 * mxd02_engine.ZSTD_PIPE_CHUNKS * 1024)
+    reader = ZstdPipeReader(io.BytesIO(zstandard.ZstdCompressor().compress(data)))
+    assert reader.read(4096) == data[:4096]
+    reader.close()
+    assert not reader.thread.is_alive()
+
+
+def test_zstd_reader_reports_corrupt_data():
+    reader = ZstdPipeReader(io.BytesIO(b"esto no es zstd" * 100))
+    with pytest.raises(Exception, match="zstd"):
+        reader.read()
+    reader.close()